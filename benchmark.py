@@ -0,0 +1,323 @@
+"""Benchmark of the parsing and output stages on synthetic results pages, without scraping the site.
+
+Run `python benchmark.py` to measure the stages and compare them to the saved
+baseline, and `python benchmark.py --save-baseline` to record a new baseline.
+Every run also checks the import time of the modules in `IMPORT_BUDGETS`.
+"""
+
+import config, page_store, parse_pages, stream_parse, writers
+from course_data import CourseData
+from page_store import PageStore
+
+import argparse, json, os, random, re, subprocess, sys, tempfile, time, tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from lxml.html import HtmlElement
+
+BASELINE_FILE_NAME: str = "benchmark_baseline.json"  # The default file of the saved baseline
+TOLERANCE: float = 0.2  # Fraction by which a stage can be slower or use more memory than the baseline before it is reported
+IMPORT_BUDGETS: Dict[str, float] = {
+    "config": 0.05,
+    "cli": 0.1,
+    "course_db": 0.05,
+    "writers": 0.1,
+    "parse_pages": 0.3,
+    "search_index": 0.2,
+    "query_service": 0.1,
+    "scrape_http": 0.2,
+}  # Maximal number of seconds to import each module in a fresh interpreter, so `cli.py parse/export/query` and the HTTP scraping engine start fast
+IMPORT_FORBIDDEN_MODULES: Tuple[str, ...] = ("selenium", "pandas", "pyarrow")  # Heavy modules the modules of `IMPORT_BUDGETS` must not import
+
+INSTRUCTORS: Tuple[str, ...] = ("ד\"ר\xa0ישראל ישראלי", "פרופ'\xa0רחל כהן", "מר\xa0דוד לוי", "גב'\xa0מיכל אברהם")
+METHODS: Tuple[str, ...] = ("שיעור", "תרגיל", "סמינר", "מעבדה", "שיעור ותרגיל")
+BUILDINGS: Tuple[str, ...] = ("דן דוד", "גילמן", "שרייבר", "קפלון", "וולפסון הנדסה")
+DAYS: Tuple[str, ...] = ("א", "ב", "ג", "ד", "ה", "ו")
+SEMESTERS: Tuple[str, ...] = ("א'", "ב'", "קיץ", "שנתי")
+FACULTIES: Tuple[str, ...] = ("מדעים מדויקים/מדעי המחשב", "מדעים מדויקים/מתמטיקה", "הנדסה/הנדסת חשמל",
+                              "מדעי הרוח/היסטוריה", "מדעי החיים/ביולוגיה")
+
+
+def attributeFromXPath(xpath: str) -> Tuple[str, str]:
+    """
+    Extracts the attribute a row filter of `config` tests, like `@style='text-align:right'`.
+
+    @param xpath: The XPath condition.
+
+    @return: Tuple of (attribute_name, attribute_value).
+    """
+    match = re.fullmatch(r"@(\w+)='(.*)'", xpath)
+    return match.group(1), match.group(2)
+
+
+def generatePage(yearName: str, pageNumber: int, coursesPerPage: int = 30, sessionsPerCourse: int = 3,
+                 seed: int = 0) -> str:
+    """
+    Generates the HTML source of a results page, with the structure the parsers expect.
+
+    The page has a first <tbody> (the search form) and a second <tbody> holding,
+    for each course, a bold row, a faculty row, up to `sessionsPerCourse` data
+    rows and a metadata row, styled after the constants of `config`.
+
+    @param yearName: Name of the academic year of the page.
+    @param pageNumber: Index of the page inside the year's results.
+    @param coursesPerPage: Number of courses on the page.
+    @param sessionsPerCourse: Maximal number of data rows per course, each course gets between 1 and that many.
+    @param seed: Seed of the random values, the same arguments always generate the same page.
+
+    @return: str The page's HTML source.
+    """
+    generator = random.Random(f"{seed}-{yearName}-{pageNumber}")
+    facultyAttribute, facultyValue = attributeFromXPath(config.COURSE_FACULTY_ROW_CLASS_XPATH)
+    dataAttribute, dataValue = attributeFromXPath(config.COURSE_DATA_ROW_STYLE_XPATH)
+    metadataAttribute, metadataValue = attributeFromXPath(config.COURSE_METADATA_ROW_STYLE_XPATH)
+
+    rows: List[str] = []
+    for _ in range(coursesPerPage):
+        number: str = f"{generator.randint(0, 1999):04d}-{generator.randint(1000, 9999)}"
+        rows.append(f"<tr class=\"{config.COURSE_BOLD_ROW_CLASS}\"><td>{number}&nbsp;&nbsp;קב': {generator.randint(1, 12):02d}</td>"
+                    f"<td>קורס {generator.randint(1, 10 ** 6)} במדעים</td><td></td></tr>")
+        rows.append(f"<tr {facultyAttribute}=\"{facultyValue}\"><td colspan=\"6\"></td>"
+                    f"<td>{generator.choice(FACULTIES)}</td></tr>")
+        for _ in range(generator.randint(1, max(sessionsPerCourse, 1))):
+            startHour: int = generator.randint(8, 18)
+            cells: List[str] = [generator.choice(INSTRUCTORS), generator.choice(METHODS), generator.choice(BUILDINGS),
+                                str(generator.randint(1, 350)), generator.choice(DAYS),
+                                f"{startHour:02d}:00-{startHour + 2:02d}:00", generator.choice(SEMESTERS)]
+            rows.append(f"<tr {dataAttribute}=\"{dataValue}\">" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+        rows.append(f"<tr {metadataAttribute}=\"{metadataValue}\"><td colspan=\"7\">"
+                    f"<a href=\"https://example.com/syllabus/{number}\">{config.SYLLABUS_LINK_TEXT}</a> "
+                    f"<a href=\"https://example.com/exams/{number}/a.pdf\">מועד א'</a></td></tr>")
+
+    return ("<html dir=\"rtl\"><head><meta charset=\"utf-8\"></head><body><form>"
+            f"<table><tbody><tr><td><select id=\"{config.YEAR_DROPDOWN_ID}\"><option>{yearName}</option></select></td></tr></tbody></table>"
+            f"<table><tbody>{''.join(rows)}</tbody></table>"
+            f"<input type=\"submit\" id=\"{config.NEXT_PAGE_BUTTON_ID}\" name=\"{config.NEXT_PAGE_BUTTON_ID}\" value=\"הבא\">"
+            "</form></body></html>")
+
+
+def generatePages(store: PageStore, yearsCount: int = 2, pagesPerYear: int = 20, coursesPerPage: int = 30,
+                  sessionsPerCourse: int = 3, seed: int = 0) -> List[str]:
+    """
+    Generates results pages into a page store, named like the scraped pages.
+
+    @param store: Page store receiving the pages.
+    @param yearsCount: Number of academic years, counting down from 2025.
+    @param pagesPerYear: Number of pages per year.
+    @param coursesPerPage: Number of courses per page.
+    @param sessionsPerCourse: Maximal number of data rows per course.
+    @param seed: Seed of the random values.
+
+    @return: List[str] Names of the generated pages.
+    """
+    names: List[str] = []
+    for yearName in (str(2025 - i) for i in range(yearsCount)):
+        for pageNumber in range(pagesPerYear):
+            name: str = page_store.pageName(yearName, pageNumber)
+            store.save(name, generatePage(yearName, pageNumber, coursesPerPage, sessionsPerCourse, seed))
+            names.append(name)
+    return names
+
+
+def measure(stage: Callable[[], object], repeats: int = 3) -> Tuple[object, float, float]:
+    """
+    Runs a stage `repeats` times to time it, keeping the fastest run, then once more under tracemalloc.
+
+    tracemalloc only sees the memory allocated through Python, not the one of
+    lxml trees for example.
+
+    @param stage: The stage to run.
+    @param repeats: Number of timed runs.
+
+    @return: Tuple of (result, seconds, peak_mib), the peak counts only the memory allocated by the stage.
+    """
+    seconds: float = float("inf")
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        stage()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    startMemory: int = tracemalloc.get_traced_memory()[0]
+    result: object = stage()
+    peakMemory: int = tracemalloc.get_traced_memory()[1] - startMemory
+    tracemalloc.stop()
+    return result, seconds, peakMemory / 2 ** 20
+
+
+def runBenchmark(yearsCount: int = 2, pagesPerYear: int = 20, coursesPerPage: int = 30, sessionsPerCourse: int = 3,
+                 seed: int = 0, repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Measures every parsing and output stage over generated pages.
+
+    The stages run one after the other, each on the output of the previous one:
+    reading the pages into trees, `getCoursesData`, `separateCourses`,
+    `parseCourses`, `convertToPandas` and the CSV writer. The streaming parser
+    is measured on its own from the saved pages.
+
+    @param yearsCount: Number of academic years.
+    @param pagesPerYear: Number of pages per year.
+    @param coursesPerPage: Number of courses per page.
+    @param sessionsPerCourse: Maximal number of data rows per course.
+    @param seed: Seed of the generated pages.
+    @param repeats: Number of timed runs of every stage, the fastest one is kept.
+
+    @return: Dict mapping each stage to its "seconds", "pagesPerSecond", "rowsPerSecond" and "peakMemoryMiB".
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as folder:
+        store = PageStore(folder)
+        names: List[str] = generatePages(store, yearsCount, pagesPerYear, coursesPerPage, sessionsPerCourse, seed)
+        rowsCount: int = len(names) * coursesPerPage
+
+        def record(stageName: str, stage: Callable[[], object]) -> object:
+            result, seconds, peakMemory = measure(stage, repeats)
+            results[stageName] = {"seconds": seconds, "pagesPerSecond": len(names) / seconds,
+                                  "rowsPerSecond": rowsCount / seconds, "peakMemoryMiB": peakMemory}
+            return result
+
+        trees: List = record("readHTMLFile", lambda: [parse_pages.readHTMLFile(store, name) for name in names])
+        rows: List[List[HtmlElement]] = record("getCoursesData", lambda: [parse_pages.getCoursesData(tree) for tree in trees])
+        separated: List[List[List[HtmlElement]]] = record(
+            "separateCourses", lambda: [parse_pages.separateCourses(pageRows) for pageRows in rows])
+        courses: List[CourseData] = record("parseCourses", lambda: [
+            course for name, pageCourses in zip(names, separated) for course in parse_pages.parseCourses(pageCourses, name)
+        ])
+        record("convertToPandas", lambda: parse_pages.convertToPandas(pd.DataFrame(), courses))
+
+        def writeCSV() -> None:
+            with writers.CSVCourseWriter(os.path.join(folder, config.FINAL_CSV_FILE_NAME)) as writer:
+                writer.writeCourses(courses)
+
+        record("csvWrite", writeCSV)
+        record("streamParse", lambda: [stream_parse.parseFile(store, name) for name in names])
+    return results
+
+
+def measureImport(moduleName: str, repeats: int = 3) -> Tuple[float, List[str]]:
+    """
+    Measures the time to import a module in a fresh interpreter.
+
+    @param moduleName: Name of the module, from the project's folder.
+    @param repeats: Number of interpreters started, the best time is kept.
+
+    @return: Tuple of (best_seconds, forbidden_modules), the modules of `IMPORT_FORBIDDEN_MODULES` the import loaded.
+    """
+    code: str = (f"import sys, time\nstart = time.perf_counter()\nimport {moduleName}\n"
+                 f"print(time.perf_counter() - start)\n"
+                 f"print(' '.join(name for name in {IMPORT_FORBIDDEN_MODULES!r} if name in sys.modules))")
+    bestSeconds: float = float("inf")
+    forbiddenModules: List[str] = []
+    for _ in range(repeats):
+        output: str = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                     capture_output=True, text=True, check=True).stdout
+        seconds, modules = (output.splitlines() + [""])[:2]
+        bestSeconds = min(bestSeconds, float(seconds))
+        forbiddenModules = modules.split()
+    return bestSeconds, forbiddenModules
+
+
+def checkImportBudgets(budgets: Optional[Dict[str, float]] = None, repeats: int = 3) -> List[str]:
+    """
+    Checks the import time of the modules against their budgets.
+
+    @param budgets: Maximal import seconds by module name, defaults to `IMPORT_BUDGETS`.
+    @param repeats: Number of interpreters started per module.
+
+    @return: List[str] A description of every module over its budget or loading a forbidden module, empty if there is none.
+    """
+    budgets = budgets if budgets is not None else IMPORT_BUDGETS
+    failures: List[str] = []
+    print(f"{'import':<16}{'seconds':>12}{'budget':>12}")
+    for moduleName, budget in budgets.items():
+        seconds, forbiddenModules = measureImport(moduleName, repeats)
+        print(f"{moduleName:<16}{seconds:>12.3f}{budget:>12.3f}")
+        if seconds > budget:
+            failures.append(f"importing {moduleName} takes {seconds:.3f}s, budget {budget:.3f}s")
+        if forbiddenModules:
+            failures.append(f"importing {moduleName} loads {forbiddenModules}")
+    return failures
+
+
+def compareToBaseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                      tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Lists the stages that regressed compared to a baseline.
+
+    @param results: The measured stages, see `runBenchmark`.
+    @param baseline: The baseline stages, in the same format.
+    @param tolerance: Fraction by which a stage can be worse than the baseline.
+
+    @return: List[str] A description of every regression, empty if there is none.
+    """
+    regressions: List[str] = []
+    for stageName, stage in results.items():
+        if stageName not in baseline:
+            continue
+        expected: Dict[str, float] = baseline[stageName]
+        if stage["rowsPerSecond"] < expected["rowsPerSecond"] * (1 - tolerance):
+            regressions.append(f"{stageName}: {stage['rowsPerSecond']:.0f} rows/sec, baseline {expected['rowsPerSecond']:.0f}")
+        if stage["peakMemoryMiB"] > expected["peakMemoryMiB"] * (1 + tolerance):
+            regressions.append(f"{stageName}: {stage['peakMemoryMiB']:.1f} MiB peak, baseline {expected['peakMemoryMiB']:.1f}")
+    return regressions
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """
+    Runs the benchmark, prints the results and compares them to the baseline,
+    or saves them as the new baseline with `--save-baseline`.
+
+    @param arguments: The command line arguments, defaults to `sys.argv[1:]`.
+
+    @return: int The exit code, 1 on a regression, an exceeded import budget, or a missing `--baseline` file.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=2, help="number of academic years")
+    parser.add_argument("--pages", type=int, default=20, help="number of pages per year")
+    parser.add_argument("--courses", type=int, default=30, help="number of courses per page")
+    parser.add_argument("--sessions", type=int, default=3, help="maximal number of sessions per course")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated pages")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed runs of every stage")
+    parser.add_argument("--baseline", help=f"path of the baseline file, a missing one is an error ({BASELINE_FILE_NAME})")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed regression, as a fraction")
+    args = parser.parse_args(arguments)
+
+    results: Dict[str, Dict[str, float]] = runBenchmark(args.years, args.pages, args.courses, args.sessions, args.seed,
+                                                           args.repeats)
+    print(f"{'stage':<16}{'pages/sec':>12}{'rows/sec':>12}{'peak MiB':>10}")
+    for stageName, stage in results.items():
+        print(f"{stageName:<16}{stage['pagesPerSecond']:>12.1f}{stage['rowsPerSecond']:>12.0f}{stage['peakMemoryMiB']:>10.1f}")
+
+    importFailures: List[str] = checkImportBudgets(repeats=args.repeats)
+    for failure in importFailures:
+        print(f"IMPORT BUDGET EXCEEDED {failure}")
+
+    settings: Dict[str, int] = {"years": args.years, "pages": args.pages, "courses": args.courses,
+                                "sessions": args.sessions, "seed": args.seed}
+    baselinePath: str = args.baseline if args.baseline is not None else BASELINE_FILE_NAME
+    if args.save_baseline:
+        with open(baselinePath, "w", encoding="utf-8") as file:
+            json.dump({"settings": settings, "stages": results}, file, indent=1)
+        print(f"Baseline saved to {baselinePath}")
+        return 1 if importFailures else 0
+
+    if not os.path.exists(baselinePath):
+        print(f"No baseline at {baselinePath}, run with --save-baseline to record one")
+        return 1 if importFailures or args.baseline is not None else 0
+    with open(baselinePath, "r", encoding="utf-8") as file:
+        baseline: Dict = json.load(file)
+    if baseline["settings"] != settings:
+        print(f"The baseline was measured with other settings {baseline['settings']}, not comparing")
+        return 1 if importFailures else 0
+
+    regressions: List[str] = compareToBaseline(results, baseline["stages"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regression compared to the baseline")
+    return 1 if regressions or importFailures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
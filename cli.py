@@ -0,0 +1,292 @@
+"""Command line interface of the CoursesScrape-TLV project.
+
+Every subcommand imports only the modules it needs: parsing saved pages,
+exporting or querying the data never loads Selenium, and pandas is never
+loaded at all.
+
+    python cli.py scrape                                 scrape, parse and write the outputs, like main.py
+    python cli.py parse --formats csv sqlite             parse the pages kept in the temporary folder again
+    python cli.py export --formats parquet               write the courses of the CSV output in other formats
+    python cli.py query --year 2025 --building "דן דוד"  look up sessions in the "sqlite" output
+    python cli.py search "בטיחות כללית"                  search course names and instructors in the "search" output
+    python cli.py serve --port 8080                      serve JSON queries over the CSV output, see query_service.py
+    python cli.py invalidate 2025                        drop the saved pages of years, so the next run scrapes them again
+
+Any setting of `config` can be overridden with `--set KEY=VALUE` (before the
+subcommand), the value is read as a Python literal if it is one, like
+`--set BROWSER_POOL_SIZE=4 --set "YEARS_TO_SCRAPE=['2025']"`.
+"""
+
+import config
+
+import argparse, ast, csv, logging, os, sys
+from typing import Any, List, Optional, Tuple
+
+EXPORT_BATCH_ROWS: int = 1000  # Number of courses read from the CSV file before they are passed to the writers
+
+logger = logging.getLogger(__name__)
+
+
+def parseOverride(override: str) -> Tuple[str, Any]:
+    """
+    Parses a `--set KEY=VALUE` flag.
+
+    The value is read as a Python literal (numbers, booleans, None, lists...)
+    unless the setting is a string, or the value is not a valid literal.
+
+    @param override: The flag's value, like "BROWSER_POOL_SIZE=4".
+
+    @return: Tuple of (setting_name, value).
+    """
+    key, separator, rawValue = override.partition("=")
+    key = key.strip()
+    if not separator:
+        raise argparse.ArgumentTypeError(f"'{override}' is not of the form KEY=VALUE")
+    if not key.isupper() or not hasattr(config, key):
+        raise argparse.ArgumentTypeError(f"'{key}' is not a setting of config.py")
+    if isinstance(getattr(config, key), str):
+        return key, rawValue
+    try:
+        return key, ast.literal_eval(rawValue)
+    except (ValueError, SyntaxError):
+        return key, rawValue
+
+
+def runScrape(arguments: argparse.Namespace) -> int:
+    """
+    Scrapes the site, parses the pages and writes the outputs, see `main.main`.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    import main
+
+    main.main()
+    return 0
+
+
+def runParse(arguments: argparse.Namespace) -> int:
+    """
+    Parses the pages kept in the temporary folder by a previous run and writes the outputs.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    import metrics, parse_pages, writers
+
+    if not os.path.isdir(config.TMP_FOLDER_NAME):
+        logger.error("There is no temporary folder %s to parse", config.TMP_FOLDER_NAME)
+        return 1
+    keepPages: bool = config.KEEP_TMP_FOLDER or not arguments.remove_pages
+
+    runMetrics: metrics.RunMetrics = metrics.resetRunMetrics()
+    try:
+        with runMetrics.phase("parse"), runMetrics.profiled("parse"), writers.createWriter(arguments.formats) as writer:
+            coursesCount: int = parse_pages.fileHandler(writer.writeCourses, arguments.workers, keepPages)
+    finally:
+        runMetrics.writeReports()
+    hitRate: Optional[float] = runMetrics.parseCacheHitRate()
+    logger.info("Parsing finished, %d courses parsed%s", coursesCount,
+                f", {hitRate:.0%} of the pages loaded from the parse cache" if hitRate is not None else "")
+    return 0
+
+
+def runExport(arguments: argparse.Namespace) -> int:
+    """
+    Writes the courses of a CSV output to other output formats, without parsing the pages again.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    import writers
+    from course_data import CourseData
+
+    inputPath: str = arguments.input if arguments.input is not None else config.FINAL_CSV_FILE_NAME
+    formats: List[str] = arguments.formats if arguments.formats is not None else config.OUTPUT_FORMATS
+    if "csv" in formats and os.path.abspath(inputPath) == os.path.abspath(config.FINAL_CSV_FILE_NAME):
+        logger.error("Exporting %s to the csv format would overwrite it, set another FINAL_CSV_FILE_NAME", inputPath)
+        return 1
+
+    coursesCount: int = 0
+    with open(inputPath, "r", encoding="utf-8", newline="") as file, writers.createWriter(formats) as writer:
+        batch: List[CourseData] = []
+        for record in csv.DictReader(file):
+            batch.append(CourseData.fromDict(record))
+            if len(batch) >= EXPORT_BATCH_ROWS:
+                writer.writeCourses(batch)
+                coursesCount += len(batch)
+                batch = []
+        writer.writeCourses(batch)
+        coursesCount += len(batch)
+    logger.info("Exported %d courses from %s to %s", coursesCount, inputPath, formats)
+    return 0
+
+
+def runQuery(arguments: argparse.Namespace) -> int:
+    """
+    Prints the sessions of the "sqlite" output matching the given fields, as tab separated lines.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    import course_db
+
+    path: str = arguments.database if arguments.database is not None else config.SQLITE_FILE_NAME
+    if not os.path.exists(path):
+        logger.error("There is no database %s, write one with the sqlite output format", path)
+        return 1
+
+    connection = course_db.connect(path)
+    try:
+        rows = course_db.findSessions(connection, year=arguments.year, instructor=arguments.instructor,
+                                      building=arguments.building, room=arguments.room, day=arguments.day,
+                                      hour=arguments.hour)
+    finally:
+        connection.close()
+    if rows:
+        print("\t".join(rows[0].keys()))
+    for row in rows[:arguments.limit] if arguments.limit is not None else rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+    logger.info("%d sessions found", len(rows))
+    return 0
+
+
+def runSearch(arguments: argparse.Namespace) -> int:
+    """
+    Prints the course names and instructors of the "search" output matching a query, best first.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    import search_index
+
+    path: str = arguments.index if arguments.index is not None else config.SEARCH_INDEX_FILE_NAME
+    if not os.path.exists(path):
+        logger.error("There is no search index %s, write one with the search output format", path)
+        return 1
+
+    with search_index.SearchIndex(path) as index:
+        results: List[search_index.SearchResult] = index.search(arguments.text, arguments.field, arguments.limit)
+    for result in results:
+        courses: str = ", ".join(f"{year} {number}/{group}" for year, number, group in result.courses[:arguments.courses])
+        more: str = f" and {len(result.courses) - arguments.courses} more" if len(result.courses) > arguments.courses else ""
+        print(f"{result.score:.2f}\t{result.field}\t{result.text}\t{courses}{more}")
+    return 0
+
+
+def runServe(arguments: argparse.Namespace) -> int:
+    """
+    Runs the query service over the CSV output until interrupted, see `query_service`.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    import query_service
+
+    path: str = arguments.input if arguments.input is not None else config.FINAL_CSV_FILE_NAME
+    if not os.path.exists(path):
+        logger.warning("There is no CSV file %s yet, it will be served once it is written", path)
+    query_service.serve(arguments.host, arguments.port, path)
+    return 0
+
+
+def runInvalidate(arguments: argparse.Namespace) -> int:
+    """
+    Drops years from the scraping manifest and deletes their saved pages, see `ScrapeManifest.invalidate`.
+
+    @param arguments: The parsed command line arguments.
+
+    @return: int The exit code.
+    """
+    from scrape_manifest import ScrapeManifest
+
+    if not os.path.isdir(config.TMP_FOLDER_NAME):
+        logger.error("There is no temporary folder %s to invalidate", config.TMP_FOLDER_NAME)
+        return 1
+    ScrapeManifest().invalidate(arguments.years or None)
+    logger.info("Invalidated %s, the next run scrapes them again",
+                ", ".join(arguments.years) if arguments.years else "every year")
+    return 0
+
+
+def buildParser() -> argparse.ArgumentParser:
+    """
+    Builds the parser of the command line arguments.
+
+    @return: argparse.ArgumentParser The parser, each subcommand sets its handler as the `handler` argument.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog="see the module docstring of cli.py")
+    parser.add_argument("--set", dest="overrides", action="append", type=parseOverride, default=[],
+                        metavar="KEY=VALUE", help="override a setting of config.py, can be repeated")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scrapeParser = subparsers.add_parser("scrape", help="scrape the site, parse the pages and write the outputs")
+    scrapeParser.set_defaults(handler=runScrape)
+
+    parseParser = subparsers.add_parser("parse", help="parse the pages kept in the temporary folder")
+    parseParser.add_argument("--folder", help="temporary folder holding the pages (TMP_FOLDER_NAME)")
+    parseParser.add_argument("--formats", nargs="+", help="output formats to write (OUTPUT_FORMATS)")
+    parseParser.add_argument("--workers", type=int, help="number of parsing processes (PARSE_WORKERS)")
+    parseParser.add_argument("--remove-pages", action="store_true",
+                             help="remove the pages once parsed, unless KEEP_TMP_FOLDER is True")
+    parseParser.set_defaults(handler=runParse)
+
+    exportParser = subparsers.add_parser("export", help="write the courses of the CSV output in other formats")
+    exportParser.add_argument("--input", help="CSV file to read (FINAL_CSV_FILE_NAME)")
+    exportParser.add_argument("--formats", nargs="+", help="output formats to write (OUTPUT_FORMATS)")
+    exportParser.set_defaults(handler=runExport)
+
+    queryParser = subparsers.add_parser("query", help="look up sessions in the sqlite output")
+    queryParser.add_argument("--database", help="database file (SQLITE_FILE_NAME)")
+    for field in ("year", "instructor", "building", "room", "day", "hour"):
+        queryParser.add_argument(f"--{field}", help=f"{field} of the sessions")
+    queryParser.add_argument("--limit", type=int, help="maximal number of sessions to print")
+    queryParser.set_defaults(handler=runQuery)
+
+    searchParser = subparsers.add_parser("search", help="search course names and instructors in the search output")
+    searchParser.add_argument("text", help="the searched text, may be partial or misspelled")
+    searchParser.add_argument("--field", choices=("Name", "Instructor"), help="search a single field")
+    searchParser.add_argument("--index", help="search index file (SEARCH_INDEX_FILE_NAME)")
+    searchParser.add_argument("--limit", type=int, default=10, help="maximal number of results")
+    searchParser.add_argument("--courses", type=int, default=5, help="maximal number of courses printed per result")
+    searchParser.set_defaults(handler=runSearch)
+
+    serveParser = subparsers.add_parser("serve", help="serve JSON queries over the CSV output")
+    serveParser.add_argument("--input", help="CSV file to serve, loaded again whenever it changes (FINAL_CSV_FILE_NAME)")
+    serveParser.add_argument("--host", help="address to listen on (QUERY_SERVICE_HOST)")
+    serveParser.add_argument("--port", type=int, help="port to listen on (QUERY_SERVICE_PORT)")
+    serveParser.set_defaults(handler=runServe)
+
+    invalidateParser = subparsers.add_parser("invalidate", help="drop the saved pages of years from the temporary folder")
+    invalidateParser.add_argument("years", nargs="*", help="years to scrape again in the next run, all of them if none given")
+    invalidateParser.add_argument("--folder", help="temporary folder holding the pages (TMP_FOLDER_NAME)")
+    invalidateParser.set_defaults(handler=runInvalidate)
+    return parser
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """
+    Runs the command line interface.
+
+    @param arguments: The command line arguments, defaults to `sys.argv[1:]`.
+
+    @return: int The exit code.
+    """
+    args = buildParser().parse_args(arguments)
+    for key, value in args.overrides:
+        setattr(config, key, value)
+    if getattr(args, "folder", None) is not None:
+        config.TMP_FOLDER_NAME = args.folder
+
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,24 @@ from typing import List, Optional
 CHROME_DRIVER_PATH: str = r"C:\WebDriver\chromedriver-win64\chromedriver.exe"  # The path to the ChromeDriver executable
 
 FINAL_CSV_FILE_NAME: str = "data.csv"  # The name of the final CSV file to store the scraped data
+OUTPUT_FORMATS: List[str] = ["csv"]  # The output formats to write the scraped data to, see `writers.WRITERS`
+PARQUET_FOLDER_NAME: str = "data_parquet"  # The name of the folder of the "parquet" output, partitioned by year
+FEATHER_FOLDER_NAME: str = "data_feather"  # The name of the folder of the "feather" output, partitioned by year
+COLUMNAR_BATCH_ROWS: int = 10000  # Number of courses of a year written at once as a row group by the "parquet" output
+DELTA_INDEX_FILE_NAME: str = "data.fingerprints.jsonl"  # The name of the file keeping the courses of the previous run for the "delta" output
+DELTA_CHANGESET_FILE_NAME: str = "data.changes.jsonl"  # The name of the file listing the courses added, removed or modified since the previous run by the "delta" output
+SQLITE_FILE_NAME: str = "data.sqlite"  # The name of the database file of the "sqlite" output
+XLSX_FILE_NAME: str = "courses.xlsx"  # The name of the Excel workbook of the "xlsx" output, one sheet per year, not data.xlsx which is made by hand from the CSV file
+SEARCH_INDEX_FILE_NAME: str = "data.search"  # The name of the trigram index file of the "search" output, see search_index.py
+LINKS_FOLDER_NAME: str = "documents"  # The name of the folder the "links" output downloads the syllabus and exam documents to, kept between runs as a cache
+LINKS_CONNECTIONS: int = 8  # Maximal number of documents downloaded at the same time by the "links" output
+LINKS_PER_HOST_RATE: float = 4.0  # Maximal number of requests per second sent to a single host by the "links" output
+
+QUERY_SERVICE_HOST: str = "127.0.0.1"  # The address the query service listens on, see query_service.py, "0.0.0.0" to serve other machines too
+QUERY_SERVICE_PORT: int = 8080  # The port the query service listens on
+QUERY_SERVICE_RELOAD_SECONDS: float = 2.0  # Number of seconds between the query service's checks for a new CSV output to load
+QUERY_SERVICE_PAGE_SIZE: int = 50  # Number of courses in a page of the query service's results, unless the query sets its limit
+QUERY_SERVICE_MAX_PAGE_SIZE: int = 1000  # Maximal number of courses in a page of the query service's results
 
 GUI: bool = False  # Weather the browser will be visible or not
 
@@ -15,8 +33,38 @@ YEARS_TO_SCRAPE: Optional[List[str]] = None  # List of years to scrape, If empty
 
 TMP_FOLDER_NAME: str = "tmp_CoursesScrapeTLV"  # The name of the temporary folder to store the HTML files
 KEEP_TMP_FOLDER: bool = False  # Whether to keep the temporary folder after scraping or delete it
+PAGE_STORE: str = "files"  # How pages are kept in the temporary folder, "files" as plain HTML files, "compressed" as compressed blobs stored once per distinct page
+PAGE_STORE_COMPRESSION: str = "gzip"  # The compression of the "compressed" page store, "gzip" or "zstd" (requires the zstandard package)
+
+RESUME_SCRAPING: bool = True  # Whether to record the scraping progress in a manifest, so an interrupted run continues where it stopped
+MANIFEST_FILE_NAME: str = "manifest.jsonl"  # The name of the manifest file inside the temporary folder
+RESCRAPE_YEARS: Optional[List[str]] = None  # Years scraped again on every new run even if kept in the temporary folder, If None only the newest year is, since past years never change
 
 TIMEOUT_FOR_SCRAPING = 60       # Number of seconds to wait for a web page before moving on
+BROWSER_POOL_SIZE: int = 1  # Number of browsers scraping different years at the same time with the "selenium" engine
+SHARD_BY_DEPARTMENT: bool = False  # Whether every department of a year is searched and scraped on its own instead of all of them at once, so the shards can be spread across the browsers and retried cheaply
+SHARD_SKIPPED_DEPARTMENT_OPTIONS: List[int] = [0, 1]  # The indices of the department dropdown options that are not departments, the empty option and "All"
+SCRAPE_RETRIES: int = 2  # Number of times a year (or department shard) that failed is scraped again, continuing from its last saved page
+FAST_BROWSER: bool = False  # Whether the browsers skip images, stylesheets and fonts and turn pages as soon as the new results are loaded
+FAST_BROWSER_BLOCKED_URLS: List[str] = ["*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico"]  # The resources the fast browsers do not load
+
+SCRAPING_ENGINE: str = "selenium"  # The engine used to scrape the site, "selenium" drives a Chrome browser, "http" replays the form postbacks directly
+HTTP_POOL_SIZE: int = 4  # Number of connections kept open by the "http" engine
+HTTP_MAX_RETRIES: int = 3  # Number of times the "http" engine retries a failed connection
+HTTP_USER_AGENT: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"  # The user agent sent by the "http" engine
+
+PARSE_WORKERS: int = 1  # Number of processes used to parse the saved pages, 1 parses them one by one in the main process
+PARSE_CACHE_FILE_NAME: Optional[str] = None  # The name of the cache of the parsed pages (like "parse_cache.sqlite"), pages identical to already parsed ones are not parsed again, None to not cache
+PARSE_CACHE_MAX_MB: float = 64  # Maximal size of the parsed pages in the cache, the least recently used pages are evicted beyond it
+PARSER_ENGINE: str = "stream"  # The engine used to parse the pages, "stream" parses them in a single streaming pass, "classic" builds the whole page tree first
+PIPELINE_PARSING: bool = False  # Whether to parse each page as soon as it is scraped instead of after scraping, pages are then only saved to disk if KEEP_TMP_FOLDER is True
+PIPELINE_QUEUE_SIZE: int = 16  # Maximal number of scraped pages waiting to be parsed, scraping pauses when it is reached
+
+LOG_LEVEL: str = "INFO"  # The level of the messages shown while running, "DEBUG" also shows every parsed course
+METRICS_REPORT_FILE_NAME: Optional[str] = None  # The name of the JSON report of the run's timings and sizes (like "run_report.json"), None to not write it
+METRICS_PROMETHEUS_FILE_NAME: Optional[str] = None  # The path of the Prometheus textfile of the run's metrics (e.g. in the node exporter's textfile folder), None to not write it
+PROFILER: Optional[str] = None  # Profiles the parsing phase, "cprofile" saves its statistics to PROFILE_FILE_NAME, "tracemalloc" adds its memory use to the report
+PROFILE_FILE_NAME: str = "parse.prof"  # The name of the cProfile statistics file
 
 # ============================ Site Elements Constants ============================ #
 SITE_URL: str = 'https://www.ims.tau.ac.il/tal/kr/Search_P.aspx'  # The URL of the site to scrape
@@ -37,4 +85,5 @@ COURSE_BOLD_ROW_CLASS_XPATH: str = f"@class='{COURSE_BOLD_ROW_CLASS}'"  # The cl
 COURSE_FACULTY_ROW_CLASS_XPATH: str = "@class='listtd'"  # The class xpath of the faculty course rows. faculty name
 COURSE_DATA_ROW_STYLE_XPATH: str = "@style='text-align:right'"  # The style attribute xpath of the data course rows. lecturer, type, building, room, day, hour and semester
 COURSE_METADATA_ROW_STYLE_XPATH: str = "@style='border-bottom:solid thin #1398ff;text-align:right;background-color: #ffffff;'"  # The class xpath of the metadata course rows. Syllabus link and exam links.
+SYLLABUS_LINK_TEXT: str = "סילבוס"  # The text of the syllabus link in the metadata course rows, the other links of these rows are exam links
 COURSE_DATA_XPATH: str = f".//tr[{COURSE_BOLD_ROW_CLASS_XPATH} or {COURSE_FACULTY_ROW_CLASS_XPATH} or {COURSE_DATA_ROW_STYLE_XPATH} or {COURSE_METADATA_ROW_STYLE_XPATH}]"  # The combined xpath to select course rows
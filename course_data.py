@@ -0,0 +1,143 @@
+"""Module holding the data structures of the parsed courses."""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class CourseData:
+    """
+    A parsed course, with its session fields (instructor, method, building,
+    room, day, hour, semester and exams) as one value per session.
+
+    The parsers create one per course and the writers consume them page by
+    page, so they are short lived. Collect the courses of a whole run in a
+    `CourseColumns` rather than a list of CourseData.
+    """
+
+    __slots__ = ("Number", "Group", "Name", "Faculty", "School", "Year",
+                 "Instructor", "Method", "Building", "Room", "Day", "Hour", "Semester", "Syllabus", "Exams")
+
+    COLUMNS: Tuple[str, ...] = ("Number", "Group", "Name", "Instructor", "Year", "Semester", "Method", "School",
+                                "Faculty", "Building", "Room", "Day", "Hour", "Syllabus",
+                                "Exams")  # The order of the columns in the output
+
+    def __init__(
+            self,
+            number: Optional[str] = None,
+            group: Optional[str] = None,
+            name: Optional[str] = None,
+            faculty: Optional[str] = None,
+            school: Optional[str] = None,
+            year: Optional[str] = None,
+            instructor: Optional[List[str]] = None,
+            method: Optional[List[str]] = None,
+            building: Optional[List[str]] = None,
+            room: Optional[List[str]] = None,
+            day: Optional[List[str]] = None,
+            hour: Optional[List[str]] = None,
+            semester: Optional[List[str]] = None,
+            syllabus: Optional[str] = None,
+            exams: Optional[List[str]] = None
+    ):
+        self.Number: Optional[str] = number
+        self.Group: Optional[str] = group
+        self.Name: Optional[str] = name
+        self.Faculty: Optional[str] = faculty
+        self.School: Optional[str] = school
+        self.Year: Optional[str] = year
+
+        self.Instructor: List[str] = instructor if instructor is not None else []
+        self.Method: List[str] = method if method is not None else []
+        self.Building: List[str] = building if building is not None else []
+        self.Room: List[str] = room if room is not None else []
+        self.Day: List[str] = day if day is not None else []
+        self.Hour: List[str] = hour if hour is not None else []
+        self.Semester: List[str] = semester if semester is not None else []
+
+        self.Syllabus: Optional[str] = syllabus
+        self.Exams: List[str] = exams if exams is not None else []
+
+    def __repr__(self):
+        return f"{{Number = {self.Number}; Group = {self.Group}; Name = {self.Name}; Faculty = {self.Faculty}; School = {self.School}; Year = {self.Year}; Instructor = {self.Instructor}; Method = {self.Method}; Building = {self.Building}; Room = {self.Room}; Day = {self.Day}; Hour = {self.Hour}; Semester = {self.Semester}; Syllabus = {self.Syllabus}; Exams = {self.Exams}}}"
+
+    def toRow(self) -> Tuple[Optional[str], ...]:
+        """
+        Returns the course's output values in the order of `COLUMNS`, session fields joined by new lines.
+
+        @return: Tuple of the column values.
+        """
+        return (self.Number, self.Group, self.Name, "\n".join(self.Instructor), self.Year, "\n".join(self.Semester),
+                "\n".join(self.Method), self.School, self.Faculty, "\n".join(self.Building), "\n".join(self.Room),
+                "\n".join(self.Day), "\n".join(self.Hour), self.Syllabus, "\n".join(self.Exams))
+
+    def toDict(self) -> dict[str, str]:
+        return dict(zip(self.COLUMNS, self.toRow()))
+
+    @classmethod
+    def fromDict(cls, record: Dict[str, Optional[str]]) -> "CourseData":
+        """
+        Builds a course from its output values, the inverse of `toDict`.
+
+        @param record: Dict of the column values, like a row of the CSV output, missing columns are left empty.
+
+        @return: CourseData The course.
+        """
+        def values(column: str) -> List[str]:
+            value: Optional[str] = record.get(column)
+            return value.split("\n") if value else []
+
+        return cls(number=record.get("Number"), group=record.get("Group"), name=record.get("Name"),
+                   faculty=record.get("Faculty"), school=record.get("School"), year=record.get("Year"),
+                   instructor=values("Instructor"), method=values("Method"), building=values("Building"),
+                   room=values("Room"), day=values("Day"), hour=values("Hour"), semester=values("Semester"),
+                   syllabus=record.get("Syllabus") or None, exams=values("Exams"))
+
+
+class CourseColumns:
+    """
+    Column oriented accumulator of courses.
+
+    Keeps one list of output values per column instead of a CourseData object
+    (or a dict) per course, so the parsed courses can be dropped as soon as
+    they are appended and the DataFrame is built from the columns in one step.
+    """
+
+    __slots__ = ("columns",)
+
+    def __init__(self, coursesData: Iterable[CourseData] = ()):
+        self.columns: Dict[str, List[Optional[str]]] = {column: [] for column in CourseData.COLUMNS}
+        self.writeCourses(coursesData)
+
+    def append(self, course: CourseData) -> None:
+        """
+        Appends a course to the columns.
+
+        @param course: The course.
+
+        @return: None
+        """
+        for values, value in zip(self.columns.values(), course.toRow()):
+            values.append(value)
+
+    def writeCourses(self, coursesData: Iterable[CourseData]) -> None:
+        """
+        Appends courses to the columns, usable as the output sink of `parse_pages.fileHandler`.
+
+        @param coursesData: The courses.
+
+        @return: None
+        """
+        for course in coursesData:
+            self.append(course)
+
+    def __len__(self) -> int:
+        return len(self.columns["Number"])
+
+    def toDataFrame(self):
+        """
+        Builds a DataFrame of the accumulated courses, with the columns in the order of `CourseData.COLUMNS`.
+
+        @return: pd.DataFrame The courses, one row per course.
+        """
+        import pandas as pd  # Only needed by the callers building DataFrames
+
+        return pd.DataFrame(self.columns, columns=list(CourseData.COLUMNS))
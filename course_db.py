@@ -0,0 +1,186 @@
+"""Module for storing the parsed courses in an indexed SQLite database, with one row per course session."""
+
+import config
+from course_data import CourseData
+
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+
+SESSION_COLUMNS: Tuple[str, ...] = ("Instructor", "Method", "Building", "Room", "Day", "Hour", "Semester")  # The fields of a course kept per session
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS courses (
+    Year TEXT NOT NULL,
+    Number TEXT NOT NULL,
+    "Group" TEXT NOT NULL,
+    Occurrence INTEGER NOT NULL,
+    Name TEXT,
+    School TEXT,
+    Faculty TEXT,
+    Syllabus TEXT,
+    Exams TEXT,
+    PRIMARY KEY (Year, Number, "Group", Occurrence)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    Year TEXT NOT NULL,
+    Number TEXT NOT NULL,
+    "Group" TEXT NOT NULL,
+    Occurrence INTEGER NOT NULL,
+    SessionIndex INTEGER NOT NULL,
+    Instructor TEXT,
+    Method TEXT,
+    Building TEXT,
+    Room TEXT,
+    Day TEXT,
+    Hour TEXT,
+    Semester TEXT,
+    PRIMARY KEY (Year, Number, "Group", Occurrence, SessionIndex),
+    FOREIGN KEY (Year, Number, "Group", Occurrence) REFERENCES courses (Year, Number, "Group", Occurrence) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""  # Courses are keyed by (Year, Number, Group) and the occurrence of the key, since a few courses share the same key,
+# missing key fields are stored as empty strings, see `courseKey`
+
+INDEXES: str = """
+CREATE INDEX IF NOT EXISTS sessions_instructor ON sessions (Instructor);
+CREATE INDEX IF NOT EXISTS sessions_building_room ON sessions (Building, Room);
+CREATE INDEX IF NOT EXISTS sessions_day_hour ON sessions (Day, Hour);
+CREATE INDEX IF NOT EXISTS sessions_year ON sessions (Year);
+"""  # Created after the bulk load, the courses' primary key already indexes them by year
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Opens the courses database, creating its tables if needed.
+
+    @param path: Path of the database file, defaults to `config.SQLITE_FILE_NAME`.
+
+    @return: sqlite3.Connection The connection, returning rows as `sqlite3.Row`.
+    """
+    connection = sqlite3.connect(path if path is not None else config.SQLITE_FILE_NAME, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def createIndexes(connection: sqlite3.Connection) -> None:
+    """
+    Creates the lookup indexes of the sessions table.
+
+    @param connection: Connection to the courses database.
+
+    @return: None
+    """
+    connection.executescript(INDEXES)
+    connection.execute("ANALYZE")
+
+
+def courseKey(course: CourseData) -> Tuple[str, str, str]:
+    """
+    Returns the (Year, Number, Group) key of a course.
+
+    The parser leaves the number or the group of a few rows empty, they are
+    stored as empty strings like in the CSV output, since the columns of a
+    WITHOUT ROWID primary key cannot be NULL.
+
+    @param course: The course.
+
+    @return: Tuple of (year, number, group).
+    """
+    return course.Year or "", course.Number or "", course.Group or ""
+
+
+def insertCourse(connection: sqlite3.Connection, course: CourseData, occurrence: int = 0) -> None:
+    """
+    Inserts a course and its sessions, replacing the course if its key is already stored.
+
+    @param connection: Connection to the courses database.
+    @param course: The course.
+    @param occurrence: Index of the course among the courses sharing its `courseKey`.
+
+    @return: None
+    """
+    key: Tuple = courseKey(course) + (occurrence,)
+    connection.execute('DELETE FROM sessions WHERE Year = ? AND Number = ? AND "Group" = ? AND Occurrence = ?', key)
+    connection.execute('INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       key + (course.Name, course.School, course.Faculty, course.Syllabus, "\n".join(course.Exams)))
+
+    sessions: List[List[str]] = [getattr(course, column) for column in SESSION_COLUMNS]
+    sessionsCount: int = max(len(values) for values in sessions)
+    connection.executemany(
+        "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (key + (i,) + tuple(values[i] if i < len(values) else None for values in sessions) for i in range(sessionsCount))
+    )
+
+
+def buildWhere(filters: Iterable[Tuple[str, Optional[str]]]) -> Tuple[str, List[str]]:
+    """
+    Builds the WHERE clause of a lookup, skipping the filters without a value.
+
+    @param filters: Pairs of (column, value).
+
+    @return: Tuple of (clause, parameters), the clause is empty if no filter has a value.
+    """
+    conditions: List[str] = []
+    parameters: List[str] = []
+    for column, value in filters:
+        if value is not None:
+            conditions.append(f'{column} = ?')
+            parameters.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+
+def findSessions(connection: sqlite3.Connection, year: Optional[str] = None, instructor: Optional[str] = None,
+                 building: Optional[str] = None, room: Optional[str] = None, day: Optional[str] = None,
+                 hour: Optional[str] = None) -> List[sqlite3.Row]:
+    """
+    Looks up the sessions matching all the given fields, with the name, school and faculty of their course.
+
+    For example, what is taught in building X on Tuesday:
+    `findSessions(connection, year="2025", building="X", day="ג")`.
+
+    @param connection: Connection to the courses database.
+    @param year: Academic year of the sessions.
+    @param instructor: Instructor of the sessions.
+    @param building: Building of the sessions.
+    @param room: Room of the sessions.
+    @param day: Day of the sessions.
+    @param hour: Hours of the sessions.
+
+    @return: List[sqlite3.Row] The matching sessions, ordered by course and session.
+    """
+    where, parameters = buildWhere([("s.Year", year), ("s.Instructor", instructor), ("s.Building", building),
+                                    ("s.Room", room), ("s.Day", day), ("s.Hour", hour)])
+    return connection.execute(
+        'SELECT s.*, c.Name, c.School, c.Faculty FROM sessions s '
+        'JOIN courses c USING (Year, Number, "Group", Occurrence)' + where +
+        ' ORDER BY s.Year, s.Number, s."Group", s.Occurrence, s.SessionIndex', parameters
+    ).fetchall()
+
+
+def getCourses(connection: sqlite3.Connection, year: Optional[str] = None, number: Optional[str] = None,
+               group: Optional[str] = None) -> List[CourseData]:
+    """
+    Loads the courses matching all the given key fields, with their sessions.
+
+    @param connection: Connection to the courses database.
+    @param year: Academic year of the courses.
+    @param number: Number of the courses.
+    @param group: Group of the courses.
+
+    @return: List[CourseData] The matching courses, ordered by key.
+    """
+    where, parameters = buildWhere([("Year", year), ("Number", number), ('"Group"', group)])
+    courses: List[CourseData] = []
+    for row in connection.execute(f'SELECT * FROM courses{where} ORDER BY Year, Number, "Group", Occurrence', parameters):
+        course = CourseData(number=row["Number"], group=row["Group"], name=row["Name"], faculty=row["Faculty"],
+                            school=row["School"], year=row["Year"], syllabus=row["Syllabus"],
+                            exams=row["Exams"].split("\n") if row["Exams"] else [])
+        for session in connection.execute(
+                'SELECT * FROM sessions WHERE Year = ? AND Number = ? AND "Group" = ? AND Occurrence = ? ORDER BY SessionIndex',
+                (row["Year"], row["Number"], row["Group"], row["Occurrence"])):
+            for column in SESSION_COLUMNS:
+                if session[column] is not None:
+                    getattr(course, column).append(session[column])
+        courses.append(course)
+    return courses
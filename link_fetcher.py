@@ -0,0 +1,201 @@
+"""Module for downloading the syllabus and exam documents linked from the courses, concurrently and with a disk cache."""
+
+import config
+
+import asyncio, hashlib, json, logging, os, time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # The "links" output is optional
+    aiohttp = None
+
+INDEX_FILE_NAME: str = "index.json"  # The cache index inside `config.LINKS_FOLDER_NAME`
+REQUEST_TIMEOUT: float = 60  # Maximal number of seconds a single download may take
+
+logger = logging.getLogger(__name__)
+
+
+class HostRateLimiter:
+    """
+    Spaces the requests sent to each host, so that no host receives more than
+    `rate` requests per second. Requests to different hosts are not delayed.
+    """
+
+    def __init__(self, rate: float):
+        self.interval: float = 1 / rate if rate > 0 else 0.0
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.lastRequests: Dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        """
+        Waits until a request may be sent to a host.
+
+        @param host: The host of the request.
+
+        @return: None
+        """
+        lock: asyncio.Lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay: float = self.lastRequests.get(host, 0.0) + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.lastRequests[host] = time.monotonic()
+
+
+class DocumentCache:
+    """
+    The downloaded documents, stored in a folder and named by the hash of their URL.
+
+    The index maps every URL to its file and to the validators (ETag and
+    Last-Modified) the server sent with it, so the next run can send a
+    conditional request and skip documents that did not change.
+    """
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder: str = folder if folder is not None else config.LINKS_FOLDER_NAME
+        self.indexPath: str = os.path.join(self.folder, INDEX_FILE_NAME)
+        self.entries: Dict[str, Dict[str, Optional[str]]] = {}
+
+        os.makedirs(self.folder, exist_ok=True)
+        if os.path.exists(self.indexPath):
+            with open(self.indexPath, "r", encoding="utf-8") as file:
+                self.entries = json.load(file)
+
+    @staticmethod
+    def fileName(url: str) -> str:
+        """
+        Returns the name of the file a document is stored in, keeping the extension of the URL's path.
+
+        @param url: URL of the document.
+
+        @return: str The file name.
+        """
+        extension: str = os.path.splitext(urlsplit(url).path)[1]
+        return hashlib.sha256(url.encode("utf-8")).hexdigest() + extension[:8]
+
+    def conditionalHeaders(self, url: str) -> Dict[str, str]:
+        """
+        Returns the headers of a conditional request for a cached document.
+
+        @param url: URL of the document.
+
+        @return: Dict The If-None-Match and If-Modified-Since headers, empty if the document is not cached.
+        """
+        entry: Optional[Dict[str, Optional[str]]] = self.entries.get(url)
+        if entry is None or not os.path.exists(os.path.join(self.folder, entry["file"])):
+            return {}
+        headers: Dict[str, str] = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("lastModified"):
+            headers["If-Modified-Since"] = entry["lastModified"]
+        return headers
+
+    def store(self, url: str, content: bytes, etag: Optional[str], lastModified: Optional[str]) -> None:
+        """
+        Saves a downloaded document.
+
+        @param url: URL of the document.
+        @param content: The document's content.
+        @param etag: The ETag header of the response.
+        @param lastModified: The Last-Modified header of the response.
+
+        @return: None
+        """
+        fileName: str = self.fileName(url)
+        path: str = os.path.join(self.folder, fileName)
+        with open(path + ".tmp", "wb") as file:
+            file.write(content)
+        os.replace(path + ".tmp", path)
+        self.entries[url] = {"file": fileName, "etag": etag, "lastModified": lastModified}
+
+    def save(self) -> None:
+        """
+        Writes the index to disk, replacing the previous file atomically.
+
+        @return: None
+        """
+        with open(self.indexPath + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, ensure_ascii=False, indent=1)
+        os.replace(self.indexPath + ".tmp", self.indexPath)
+
+
+async def fetchLink(session: "aiohttp.ClientSession", url: str, cache: DocumentCache, limiter: HostRateLimiter) -> str:
+    """
+    Downloads a single document into the cache, unless the cached copy is still valid.
+
+    @param session: The HTTP session, its connector bounds the number of concurrent downloads.
+    @param url: URL of the document.
+    @param cache: The document cache.
+    @param limiter: The per host rate limiter.
+
+    @return: str "downloaded", "unchanged" (the server answered 304 Not Modified) or "failed".
+    """
+    await limiter.wait(urlsplit(url).netloc)
+    try:
+        async with session.get(url, headers=cache.conditionalHeaders(url)) as response:
+            if response.status == 304:
+                return "unchanged"
+            if response.status != 200:
+                logger.warning("Downloading %s failed with status %d", url, response.status)
+                return "failed"
+            content: bytes = await response.read()
+            cache.store(url, content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            return "downloaded"
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning("Downloading %s failed: %s", url, e)
+        return "failed"
+
+
+async def fetchLinksAsync(urls: List[str], cache: DocumentCache, connections: int, perHostRate: float) -> Counter:
+    """
+    Downloads documents concurrently, see `fetchLinks`.
+
+    @param urls: URLs of the documents.
+    @param cache: The document cache.
+    @param connections: Maximal number of concurrent downloads.
+    @param perHostRate: Maximal number of requests per second sent to a single host.
+
+    @return: Counter The number of documents per result of `fetchLink`.
+    """
+    limiter = HostRateLimiter(perHostRate)
+    connector = aiohttp.TCPConnector(limit=connections)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        results: List[str] = await asyncio.gather(*(fetchLink(session, url, cache, limiter) for url in urls))
+    return Counter(results)
+
+
+def fetchLinks(urls: Iterable[str], folder: Optional[str] = None, connections: Optional[int] = None,
+               perHostRate: Optional[float] = None) -> Dict[str, int]:
+    """
+    Downloads the syllabus and exam documents of the courses into the cache folder.
+
+    At most `connections` documents are downloaded at the same time, and each
+    host receives at most `perHostRate` requests per second. Documents already
+    in the cache are requested conditionally, and kept if the server answers
+    304 Not Modified.
+
+    @param urls: URLs of the documents, duplicates are downloaded once.
+    @param folder: Cache folder, defaults to `config.LINKS_FOLDER_NAME`.
+    @param connections: Maximal number of concurrent downloads, defaults to `config.LINKS_CONNECTIONS`.
+    @param perHostRate: Maximal requests per second per host, defaults to `config.LINKS_PER_HOST_RATE`.
+
+    @return: Dict The number of "downloaded", "unchanged" and "failed" documents.
+    """
+    if aiohttp is None:
+        raise RuntimeError("Downloading the course documents requires aiohttp, install it with `pip install aiohttp`")
+    connections = connections if connections is not None else config.LINKS_CONNECTIONS
+    perHostRate = perHostRate if perHostRate is not None else config.LINKS_PER_HOST_RATE
+
+    cache = DocumentCache(folder)
+    try:
+        results: Counter = asyncio.run(fetchLinksAsync(list(dict.fromkeys(urls)), cache, connections, perHostRate))
+    finally:
+        cache.save()
+    logger.info("Course documents: %d downloaded, %d unchanged, %d failed",
+                results["downloaded"], results["unchanged"], results["failed"])
+    return {result: results[result] for result in ("downloaded", "unchanged", "failed")}
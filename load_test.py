@@ -0,0 +1,182 @@
+"""Load test of the query service, see query_service.py.
+
+Starts the service on a free local port in its own process (or targets a
+running one with --url), then sends a mix of indexed lookups taken from the
+CSV output from several threads over kept alive connections, and prints the
+throughput and the latency percentiles of every kind of query. Exits with an
+error if the p99 latency of a kind exceeds --p99-budget.
+
+    python load_test.py --requests 20000 --concurrency 8
+"""
+
+import config, query_service
+
+import argparse, http.client, os, random, socket, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+QUERY_KINDS: Tuple[str, ...] = ("key", "number", "instructor", "faculty", "room", "revalidate")  # The kinds of queries sent, in equal shares
+STARTUP_TIMEOUT: float = 60  # Maximal number of seconds to wait for the started service to load the CSV file
+
+
+def buildQueries(snapshot: query_service.Snapshot, count: int, seed: int) -> List[Tuple[str, str]]:
+    """
+    Builds random queries for values that exist in the snapshot.
+
+    @param snapshot: The snapshot of the served CSV file.
+    @param count: Number of queries.
+    @param seed: Seed of the random choices.
+
+    @return: List of (kind, path) pairs, "revalidate" queries are sent again with the ETag of their first answer.
+    """
+    randomizer = random.Random(seed)
+    values: Dict[str, list] = {name: list(index) for name, index in snapshot.indexes.items()}
+    queries: List[Tuple[str, str]] = []
+    for _ in range(count):
+        kind: str = randomizer.choice(QUERY_KINDS)
+        if kind in ("key", "revalidate"):
+            year, number, group = randomizer.choice(values["key"])
+            parameters: Dict[str, str] = {"year": year, "number": number, "group": group}
+        elif kind == "number":
+            parameters = {"number": randomizer.choice(values["number"])}
+        elif kind == "instructor":
+            parameters = {"instructor": randomizer.choice(values["instructor"])}
+        elif kind == "faculty":
+            parameters = {"year": randomizer.choice(values["year"]), "faculty": randomizer.choice(values["faculty"])}
+        else:
+            building, room = randomizer.choice(values["room"])
+            parameters = {"building": building, "room": room}
+        queries.append((kind, "/courses?" + urlencode(parameters)))
+    return queries
+
+
+def runQueries(host: str, port: int, queries: List[Tuple[str, str]], acceptGzip: bool) -> List[Tuple[str, float]]:
+    """
+    Sends queries one after the other over a single kept alive connection.
+
+    @param host: Host of the service.
+    @param port: Port of the service.
+    @param queries: The (kind, path) pairs.
+    @param acceptGzip: Whether to ask for gzipped responses.
+
+    @return: List of (kind, seconds) pairs, the latency of every query.
+    """
+    connection = http.client.HTTPConnection(host, port)
+    headers: Dict[str, str] = {"Accept-Encoding": "gzip"} if acceptGzip else {}
+    etags: Dict[str, str] = {}
+    latencies: List[Tuple[str, float]] = []
+    try:
+        for kind, path in queries:
+            requestHeaders: Dict[str, str] = dict(headers)
+            if kind == "revalidate" and path in etags:
+                requestHeaders["If-None-Match"] = etags[path]
+            startTime: float = time.perf_counter()
+            connection.request("GET", path, headers=requestHeaders)
+            response = connection.getresponse()
+            response.read()
+            latencies.append((kind, time.perf_counter() - startTime))
+            if response.status not in (200, 304):
+                raise RuntimeError(f"{path} answered {response.status}")
+            if kind == "revalidate" and response.status == 200:
+                etags[path] = response.getheader("ETag")
+    finally:
+        connection.close()
+    return latencies
+
+
+def percentile(sortedValues: List[float], fraction: float) -> float:
+    return sortedValues[min(len(sortedValues) - 1, int(fraction * len(sortedValues)))]
+
+
+def startService(path: str) -> Tuple[subprocess.Popen, int]:
+    """
+    Starts the query service in its own process on a free local port, and waits until it loaded the CSV file.
+
+    @param path: Path of the CSV file.
+
+    @return: Tuple of (process, port).
+    """
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port: int = probe.getsockname()[1]
+    cliPath: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+    process = subprocess.Popen([sys.executable, cliPath, "--set", "LOG_LEVEL=WARNING", "serve", "--input", path,
+                                "--host", "127.0.0.1", "--port", str(port)])
+    deadline: float = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The query service exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/courses?limit=0")
+            if connection.getresponse().status == 200:
+                connection.close()
+                return process, port
+            connection.close()
+        except OSError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"The query service did not load {path} within {STARTUP_TIMEOUT}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="CSV file the queries are built from, and served unless --url is given (FINAL_CSV_FILE_NAME)")
+    parser.add_argument("--url", help="URL of a running query service, like http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=10000, help="total number of requests")
+    parser.add_argument("--concurrency", type=int, default=2,
+                        help="number of connections sending requests at the same time, the service shares the CPUs with them")
+    parser.add_argument("--no-gzip", action="store_true", help="do not ask for gzipped responses")
+    parser.add_argument("--p99-budget", type=float, default=5.0, help="maximal p99 latency of every kind of query, in milliseconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random queries")
+    args = parser.parse_args()
+
+    path: str = args.input if args.input is not None else config.FINAL_CSV_FILE_NAME
+    snapshot: query_service.Snapshot = query_service.loadSnapshot(path)
+    queries: List[Tuple[str, str]] = buildQueries(snapshot, args.requests, args.seed)
+    print(f"{len(snapshot)} courses in {path}, sending {len(queries)} requests over {args.concurrency} connections")
+
+    process: Optional[subprocess.Popen] = None
+    if args.url is not None:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        process, port = startService(path)
+        host = "127.0.0.1"
+    try:
+        shares: List[List[Tuple[str, str]]] = [queries[worker::args.concurrency] for worker in range(args.concurrency)]
+        startTime: float = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            results = list(executor.map(lambda share: runQueries(host, port, share, not args.no_gzip), shares))
+        elapsed: float = time.perf_counter() - startTime
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies: Dict[str, List[float]] = {}
+    for kind, seconds in (latency for result in results for latency in result):
+        latencies.setdefault(kind, []).append(seconds * 1000)
+        latencies.setdefault("all", []).append(seconds * 1000)
+    print(f"{len(queries) / elapsed:,.0f} requests/sec")
+    print(f"{'kind':<12}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    failed: List[str] = []
+    for kind in QUERY_KINDS + ("all",):
+        values: List[float] = sorted(latencies.get(kind, []))
+        if not values:
+            continue
+        p99: float = percentile(values, 0.99)
+        print(f"{kind:<12}{len(values):>8}{percentile(values, 0.5):>10.2f}{percentile(values, 0.9):>10.2f}"
+              f"{p99:>10.2f}{values[-1]:>10.2f}")
+        if kind != "all" and p99 > args.p99_budget:
+            failed.append(kind)
+    if failed:
+        print(f"p99 latency over the budget of {args.p99_budget}ms: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
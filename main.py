@@ -1,13 +1,15 @@
 """Main module to run the CoursesScrape-TLV project."""
 
-import config, scrape_data, parse_pages
-import os
-import pandas as pd
+import config, metrics, page_store, parse_pages, writers
+from scrape_manifest import ScrapeManifest
+from pipeline import ParsePipeline
+import logging, os
+from typing import TYPE_CHECKING, List, Optional
 
-from selenium.webdriver import Chrome
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.webdriver import WebDriver as WebDriver
+if TYPE_CHECKING:  # Selenium is imported by `setupBrowser`, only when a browser is needed
+    from selenium.webdriver.chrome.webdriver import WebDriver as WebDriver
+
+logger = logging.getLogger(__name__)
 
 
 def createTmpFolder() -> None:
@@ -23,49 +25,136 @@ def createTmpFolder() -> None:
         os.mkdir(config.TMP_FOLDER_NAME)
 
 
-def setupBrowser() -> WebDriver:
+def setupBrowser() -> "WebDriver":
     """
     Sets up and returns a Selenium WebDriver instance for Chrome.
     
     Configuration:
      - If `config.GUI` is False, the browser runs in headless mode.
+     - If `config.FAST_BROWSER` is True, pages are ready once their HTML is
+       loaded (eager page load strategy), and images, stylesheets and fonts
+       (`config.FAST_BROWSER_BLOCKED_URLS`) are not loaded.
      - The ChromeDriver path is specified in `config.CHROME_DRIVER_PATH`.
      - The browser automatically navigates to the site URL defined in
        `config.SITE_URL`.
 
     @return: WebDriver A configured Selenium WebDriver instance.
     """
+    from selenium.webdriver import Chrome
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.chrome.options import Options
+
     chrome_options = Options()
     if not config.GUI:
         chrome_options.add_argument("--headless=new")
+    if config.FAST_BROWSER:
+        chrome_options.page_load_strategy = "eager"
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
     service = ChromeService(executable_path=config.CHROME_DRIVER_PATH)
 
     browser = Chrome(service=service, options=chrome_options)
+    if config.FAST_BROWSER:
+        browser.execute_cdp_cmd("Network.enable", {})
+        browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": config.FAST_BROWSER_BLOCKED_URLS})
     browser.get(config.SITE_URL)
     return browser
 
 
+def scrapeSite(manifest: Optional[ScrapeManifest] = None, pipeline: Optional[ParsePipeline] = None) -> List[str]:
+    """
+    Scrapes the pages with the engine selected by `config.SCRAPING_ENGINE`:
+     - "selenium": initialize a WebDriver instance with `setupBrowser`, run
+       `scrape_data.scrapingHandler` and quit the WebDriver instance. If
+       `config.BROWSER_POOL_SIZE` is above 1, run `scrape_data.concurrentScrapingHandler`
+       with a pool of such instances instead.
+     - "http": run `scrape_http.scrapingHandler`.
+
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: List[str] Names of the years that failed, their pages may be incomplete.
+    """
+    failedYears: List[str] = []
+    if config.SCRAPING_ENGINE == "http":
+        import scrape_http
+
+        scrape_http.scrapingHandler(manifest=manifest, pipeline=pipeline)
+        return failedYears
+
+    import scrape_data
+
+    if config.BROWSER_POOL_SIZE > 1:
+        failedYears = scrape_data.concurrentScrapingHandler(setupBrowser, manifest=manifest, pipeline=pipeline)
+        if failedYears:
+            logger.warning("Scraping failed for the years %s, their data may be incomplete", failedYears)
+    else:
+        browser = setupBrowser()
+        try:
+            scrape_data.scrapingHandler(browser, manifest, pipeline)
+        finally:
+            browser.quit()
+    return failedYears
+
+
+def runScraping(runMetrics: metrics.RunMetrics) -> None:
+    """
+    Runs the steps 1 to 4 of `main`, timing the scraping and parsing phases.
+
+    @param runMetrics: Metrics of the run.
+
+    @return: None
+    """
+    createTmpFolder()
+    manifest: Optional[ScrapeManifest] = ScrapeManifest() if config.RESUME_SCRAPING else None
+
+    with writers.createWriter() as writer:
+        if config.PIPELINE_PARSING:
+            with runMetrics.phase("scrapeAndParse"), ParsePipeline(writer.writeCourses) as pipeline:
+                failedYears: List[str] = scrapeSite(manifest, pipeline)
+        else:
+            with runMetrics.phase("scrape"):
+                failedYears = scrapeSite(manifest)
+            with runMetrics.phase("parse"), runMetrics.profiled("parse"):
+                parse_pages.fileHandler(writer.writeCourses)
+    if manifest is not None and not failedYears:
+        manifest.finishRun()
+
+    if not config.KEEP_TMP_FOLDER:
+        if manifest is not None:
+            manifest.remove()
+        page_store.getPageStore().clear()
+        os.rmdir(config.TMP_FOLDER_NAME)
+
+
 def main() -> None:
     """
     Main entry point for running the scraping process.
     
     Workflow:
-     1. Initialize a Selenium WebDriver instance with `setupBrowser`.
-     2. Create the temporary folder (if needed) with `createTmpFolder`.
-     3. Run the scraping handler via `scrape_data.scrapingHandler`.
-     4. Remove the temporary folder if `config.KEEP_TMP_FOLDER` is False.
-     5. Quit the WebDriver instance.
+     1. Create the temporary folder (if needed) with `createTmpFolder`, and load
+        the scraping manifest from it if `config.RESUME_SCRAPING` is True.
+     2. Scrape the pages with `scrapeSite`. Once all the years were scraped, the
+        run is marked as finished in the manifest.
+     3. Parse the pages and stream them to the output writers:
+        - If `config.PIPELINE_PARSING` is True, every page is parsed by a
+          `pipeline.ParsePipeline` as soon as it is scraped, pages are only
+          written to disk as an archive if `config.KEEP_TMP_FOLDER` is True.
+        - Otherwise, parse the saved pages after scraping via `parse_pages.fileHandler`.
+     4. Remove the manifest, the page store files and the temporary folder if
+        `config.KEEP_TMP_FOLDER` is False.
+     5. Write the run's metrics (see `metrics.RunMetrics`), even if the run failed.
 
     @return: None
     """
-    browser = setupBrowser()
-    createTmpFolder()
-    scrape_data.scrapingHandler(browser)
-    browser.quit()
-    df: pd.DataFrame = parse_pages.fileHandler()
-    if not config.KEEP_TMP_FOLDER:
-        os.rmdir(config.TMP_FOLDER_NAME)
-    df.to_csv(f"{config.FINAL_CSV_FILE_NAME}", index=False)
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    runMetrics: metrics.RunMetrics = metrics.resetRunMetrics()
+    try:
+        runScraping(runMetrics)
+    finally:
+        runMetrics.writeReports()
+    hitRate: Optional[float] = runMetrics.parseCacheHitRate()
+    logger.info("Run finished, %d courses parsed%s", sum(runMetrics.rowsPerYear.values()),
+                f", {hitRate:.0%} of the pages loaded from the parse cache" if hitRate is not None else "")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,294 @@
+"""Module for collecting the timings and sizes of a run, and writing them as a JSON report and a Prometheus textfile."""
+
+import config
+
+import contextlib, cProfile, json, logging, os, threading, time, tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """
+    Summarizes a series of measurements.
+
+    @param values: The measurements.
+
+    @return: Dict with the "count", "sum", "mean" and "max" of the values.
+    """
+    total: float = sum(values)
+    return {"count": len(values), "sum": total, "mean": total / len(values) if values else 0.0,
+            "max": max(values, default=0.0)}
+
+
+class RunMetrics:
+    """
+    Measurements of a single run: the duration of each phase, every wait for a
+    page to render, and for every page its render latency, source size, parse
+    time and number of rows.
+
+    All methods are thread safe, the scrapers and the parsing pipeline record
+    their measurements from their own threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.startedAt: datetime = datetime.now(timezone.utc)
+        self.phases: Dict[str, float] = {}
+        self.waits: Dict[str, List[float]] = {}
+        self.pages: Dict[str, Dict[str, float]] = {}
+        self.rowsPerYear: Counter = Counter()
+        self.parseCache: Counter = Counter()
+        self.profile: Dict = {}
+
+    def getPage(self, name: str) -> Dict[str, float]:
+        """
+        Returns the measurements of a page, creating an empty record if needed.
+
+        Must be called while holding `self.lock`.
+
+        @param name: Name of the page.
+
+        @return: Dict The page's measurements.
+        """
+        return self.pages.setdefault(name, {})
+
+    def waited(self, waitName: str, seconds: float) -> None:
+        """
+        Records the time spent in a wait, like a `WebDriverWait`.
+
+        @param waitName: What was waited for.
+        @param seconds: Time spent waiting.
+
+        @return: None
+        """
+        with self.lock:
+            self.waits.setdefault(waitName, []).append(seconds)
+
+    def pageRendered(self, name: str, waitSeconds: Optional[float], renderSeconds: float) -> None:
+        """
+        Records how long a results page took to show up.
+
+        @param name: Name of the page.
+        @param waitSeconds: Time spent waiting for the page's results, None if the engine does not wait.
+        @param renderSeconds: Time from the click that requested the page until its results were shown.
+
+        @return: None
+        """
+        with self.lock:
+            page: Dict[str, float] = self.getPage(name)
+            if waitSeconds is not None:
+                page["waitSeconds"] = waitSeconds
+            page["renderSeconds"] = renderSeconds
+
+    def pageScraped(self, name: str, sourceBytes: int) -> None:
+        """
+        Records the size of a scraped page.
+
+        @param name: Name of the page.
+        @param sourceBytes: Size of the page's HTML source, UTF-8 encoded.
+
+        @return: None
+        """
+        with self.lock:
+            self.getPage(name)["sourceBytes"] = sourceBytes
+
+    def pageParsed(self, name: str, yearName: str, parseSeconds: float, rows: int) -> None:
+        """
+        Records the parsing of a page.
+
+        @param name: Name of the page.
+        @param yearName: Name of the academic year of the page.
+        @param parseSeconds: Time spent parsing the page.
+        @param rows: Number of courses found on the page.
+
+        @return: None
+        """
+        with self.lock:
+            page: Dict[str, float] = self.getPage(name)
+            page["parseSeconds"] = parseSeconds
+            page["rows"] = rows
+            self.rowsPerYear[yearName] += rows
+
+    def parseCacheLooked(self, hits: int, misses: int) -> None:
+        """
+        Records lookups of pages in the parse cache.
+
+        @param hits: Number of pages found in the cache.
+        @param misses: Number of pages that had to be parsed.
+
+        @return: None
+        """
+        with self.lock:
+            self.parseCache["hits"] += hits
+            self.parseCache["misses"] += misses
+
+    def parseCacheHitRate(self) -> Optional[float]:
+        """
+        Returns the fraction of the pages found in the parse cache.
+
+        @return: float The hit rate, or None if the cache was not used.
+        """
+        with self.lock:
+            lookups: int = self.parseCache["hits"] + self.parseCache["misses"]
+            return self.parseCache["hits"] / lookups if lookups else None
+
+    @contextlib.contextmanager
+    def phase(self, phaseName: str) -> Iterator[None]:
+        """
+        Times a phase of the run, like scraping or parsing.
+
+        @param phaseName: Name of the phase.
+
+        @return: Context manager timing its body.
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[phaseName] = self.phases.get(phaseName, 0.0) + time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def profiled(self, phaseName: str, profiler: Optional[str] = None) -> Iterator[None]:
+        """
+        Profiles a phase of the run, in the calling thread.
+
+        With "cprofile" the statistics are saved to `config.PROFILE_FILE_NAME`
+        (open them with `python -m pstats`). With "tracemalloc" the peak memory
+        and the lines that allocated the most are added to the report.
+
+        @param phaseName: Name of the phase.
+        @param profiler: "cprofile", "tracemalloc" or None to not profile, defaults to `config.PROFILER`.
+
+        @return: Context manager profiling its body.
+        """
+        profiler = profiler if profiler is not None else config.PROFILER
+        if profiler == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                profile.dump_stats(config.PROFILE_FILE_NAME)
+                self.profile[phaseName] = {"profiler": profiler, "statsFile": config.PROFILE_FILE_NAME}
+                logger.info("Profile of the %s phase saved to %s", phaseName, config.PROFILE_FILE_NAME)
+        elif profiler == "tracemalloc":
+            tracemalloc.start()
+            try:
+                yield
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                peakBytes: int = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.profile[phaseName] = {
+                    "profiler": profiler,
+                    "peakBytes": peakBytes,
+                    "topAllocations": [{"line": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                                       for stat in snapshot.statistics("lineno")[:20]],
+                }
+        else:
+            yield
+
+    def toReport(self) -> Dict:
+        """
+        Builds the JSON run report.
+
+        @return: Dict The report.
+        """
+        hitRate: Optional[float] = self.parseCacheHitRate()
+        with self.lock:
+            pages: Dict[str, Dict[str, float]] = {name: dict(page) for name, page in self.pages.items()}
+            return {
+                "startedAt": self.startedAt.isoformat(),
+                "finishedAt": datetime.now(timezone.utc).isoformat(),
+                "phasesSeconds": dict(self.phases),
+                "waits": {waitName: summarize(seconds) for waitName, seconds in self.waits.items()},
+                "pagesSummary": {
+                    field: summarize([page[field] for page in pages.values() if field in page])
+                    for field in ("waitSeconds", "renderSeconds", "sourceBytes", "parseSeconds", "rows")
+                },
+                "rowsPerYear": dict(sorted(self.rowsPerYear.items())),
+                "parseCache": {"hits": self.parseCache["hits"], "misses": self.parseCache["misses"], "hitRate": hitRate},
+                "pages": pages,
+                "profile": dict(self.profile),
+            }
+
+    def toPrometheus(self) -> str:
+        """
+        Formats the run's metrics in the Prometheus text exposition format, for the node exporter's textfile collector.
+
+        @return: str The metrics.
+        """
+        report: Dict = self.toReport()
+        lines: List[str] = []
+
+        def addMetric(name: str, metricType: str, description: str, samples: Dict[str, float]) -> None:
+            lines.append(f"# HELP coursescrape_{name} {description}")
+            lines.append(f"# TYPE coursescrape_{name} {metricType}")
+            for suffix, value in samples.items():
+                lines.append(f"coursescrape_{name}{suffix} {value}")
+
+        addMetric("phase_seconds", "gauge", "Duration of each phase of the run.",
+                  {f'{{phase="{phaseName}"}}': seconds for phaseName, seconds in report["phasesSeconds"].items()})
+        for waitName, stats in report["waits"].items():
+            addMetric(f"{waitName}_wait_seconds", "summary", f"Time spent waiting for {waitName}.",
+                      {"_sum": stats["sum"], "_count": stats["count"]})
+        for field, name, description in (("renderSeconds", "page_render_seconds", "Time from a click until the requested page is shown."),
+                                         ("sourceBytes", "page_source_bytes", "Size of the scraped pages' HTML source."),
+                                         ("parseSeconds", "page_parse_seconds", "Time spent parsing a page."),
+                                         ("rows", "page_rows", "Number of courses on a page.")):
+            stats: Dict[str, float] = report["pagesSummary"][field]
+            addMetric(name, "summary", description, {"_sum": stats["sum"], "_count": stats["count"]})
+        addMetric("year_rows", "gauge", "Number of courses of each academic year.",
+                  {f'{{year="{yearName}"}}': rows for yearName, rows in report["rowsPerYear"].items()})
+        addMetric("parse_cache_lookups", "gauge", "Number of pages looked up in the parse cache.",
+                  {f'{{result="{result}"}}': report["parseCache"][result] for result in ("hits", "misses")})
+        addMetric("last_run_timestamp_seconds", "gauge", "Time the run finished.", {"": time.time()})
+        return "\n".join(lines) + "\n"
+
+    def writeReports(self, reportPath: Optional[str] = None, prometheusPath: Optional[str] = None) -> None:
+        """
+        Writes the JSON run report and the Prometheus textfile, each replaced atomically.
+
+        @param reportPath: Path of the JSON report, defaults to `config.METRICS_REPORT_FILE_NAME`.
+        @param prometheusPath: Path of the textfile, defaults to `config.METRICS_PROMETHEUS_FILE_NAME`.
+                               A file whose path (or configured path) is None is not written.
+
+        @return: None
+        """
+        reportPath = reportPath if reportPath is not None else config.METRICS_REPORT_FILE_NAME
+        prometheusPath = prometheusPath if prometheusPath is not None else config.METRICS_PROMETHEUS_FILE_NAME
+        for path, content in ((reportPath, lambda: json.dumps(self.toReport(), ensure_ascii=False, indent=1)),
+                              (prometheusPath, self.toPrometheus)):
+            if path is None:
+                continue
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(content())
+            os.replace(path + ".tmp", path)
+
+
+runMetrics: RunMetrics = RunMetrics()
+
+
+def getRunMetrics() -> RunMetrics:
+    """
+    Returns the metrics of the current run, shared by every module of the process.
+
+    @return: RunMetrics The current run's metrics.
+    """
+    return runMetrics
+
+
+def resetRunMetrics() -> RunMetrics:
+    """
+    Starts recording the metrics of a new run.
+
+    @return: RunMetrics The new run's metrics.
+    """
+    global runMetrics
+    runMetrics = RunMetrics()
+    return runMetrics
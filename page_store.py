@@ -0,0 +1,411 @@
+"""Module for storing the scraped pages inside the temporary folder, as plain HTML files or as compressed content-addressed blobs."""
+
+import config
+
+import gzip, hashlib, io, json, os, re, threading
+from collections import Counter
+from typing import Dict, IO, List, Optional, Tuple, Type
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional, gzip is always available
+    zstandard = None
+
+HIDDEN_INPUT_REGEX = re.compile(r"<input[^>]*type=\"hidden\"[^>]*>")  # ASP.NET state fields, they change on every postback
+
+
+def pageName(yearName: str, pageNumber: int) -> str:
+    """
+    Returns the name of a page, following the naming convention `{year}-{pageNumber}.html`.
+
+    @param yearName: Name of the academic year of the page.
+    @param pageNumber: Index of the page inside the year's results.
+
+    @return: str The page's name.
+    """
+    return f"{yearName}-{pageNumber}.html"
+
+
+def shardName(yearName: str, departmentIndex: int) -> str:
+    """
+    Returns the name under which the pages of a department shard of a year are
+    saved and tracked, used in place of the year's name: `{year}-d{departmentIndex}`.
+
+    @param yearName: Name of the academic year.
+    @param departmentIndex: Index of the department in the department dropdown.
+
+    @return: str The shard's name.
+    """
+    return f"{yearName}-d{departmentIndex:02d}"
+
+
+def unitYear(name: str) -> str:
+    """
+    Returns the academic year of a year or shard name, see `shardName`.
+
+    @param name: Name of a year or of a shard.
+
+    @return: str The name of the academic year.
+    """
+    return name.split("-", 1)[0]
+
+
+def pageSortKey(name: str) -> Tuple[str, int]:
+    """
+    Builds the sort key of a page from its name.
+
+    Names follow the naming convention `{year}-{pageNumber}.html`, so the key
+    orders pages by year and then numerically by page number (page 2 comes
+    before page 10).
+
+    @param name: Name of a page.
+
+    @return: Tuple of (year, page_number).
+    """
+    stem: str = name[:-len(".html")] if name.endswith(".html") else name
+    year, _, pageNumber = stem.rpartition("-")
+    return year, int(pageNumber) if pageNumber.isdigit() else -1
+
+
+def pageHash(html: str) -> str:
+    """
+    Hashes the content of a page, leaving out its hidden form fields, so the
+    same results shown twice get the same hash.
+
+    @param html: HTML source of the page.
+
+    @return: str Hex digest of the page's content.
+    """
+    return hashlib.sha256(HIDDEN_INPUT_REGEX.sub("", html).encode("utf-8")).hexdigest()
+
+
+class PageStore:
+    """
+    Stores every page as a plain UTF-8 HTML file named after the page, directly
+    inside the folder.
+
+    Stores are thread safe and can be sent to worker processes.
+    """
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder: str = folder if folder is not None else config.TMP_FOLDER_NAME
+        self.lock = threading.Lock()
+
+    def __getstate__(self) -> Dict:
+        state: Dict = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def save(self, name: str, html: str) -> None:
+        """
+        Saves a page, replacing any previous page with the same name.
+
+        @param name: Name of the page, see `pageName`.
+        @param html: HTML source of the page.
+
+        @return: None
+        """
+        with open(os.path.join(self.folder, name), "w", encoding="utf-8") as file:
+            file.write(html)
+
+    def open(self, name: str) -> IO[str]:
+        """
+        Opens a saved page for reading.
+
+        @param name: Name of the page.
+
+        @return: IO[str] Text stream of the page's HTML source, to be closed by the caller.
+        """
+        return open(os.path.join(self.folder, name), "r", encoding="utf-8")
+
+    def read(self, name: str) -> str:
+        """
+        Reads a saved page.
+
+        @param name: Name of the page.
+
+        @return: str The page's HTML source.
+        """
+        with self.open(name) as file:
+            return file.read()
+
+    def digest(self, name: str) -> str:
+        """
+        Hashes the content of a saved page, without its hidden form fields.
+
+        @param name: Name of the page.
+
+        @return: str The page's `pageHash`.
+        """
+        return pageHash(self.read(name))
+
+    def exists(self, name: str) -> bool:
+        """
+        Checks whether a page is saved.
+
+        @param name: Name of the page.
+
+        @return: bool True if the page is saved.
+        """
+        return os.path.exists(os.path.join(self.folder, name))
+
+    def names(self) -> List[str]:
+        """
+        Lists the saved pages, ordered by year and page number.
+
+        @return: List[str] Names of the saved pages.
+        """
+        return sorted((name for name in os.listdir(self.folder) if name.endswith(".html")), key=pageSortKey)
+
+    def remove(self, name: str) -> None:
+        """
+        Deletes a saved page.
+
+        @param name: Name of the page.
+
+        @return: None
+        """
+        os.remove(os.path.join(self.folder, name))
+
+    def clear(self) -> None:
+        """
+        Deletes the files the store keeps besides the pages themselves, once all pages were removed.
+
+        @return: None
+        """
+
+
+class CompressedPageStore(PageStore):
+    """
+    Stores pages compressed (see `config.PAGE_STORE_COMPRESSION`) and content
+    addressed: every distinct page is a single blob named after its `pageHash`,
+    under `blobs/` inside the folder, so the same results saved by different
+    runs are stored once. The hidden form fields differ on every scrape and are
+    left out of the hash, so a blob keeps the ones of the first page saved with
+    its content (they are never parsed).
+
+    An index maps each page name to its blob. It is an append-only log of JSON
+    lines, replayed (and compacted) when the store is opened.
+    """
+
+    INDEX_FILE_NAME: str = "pages-index.jsonl"
+    BLOBS_FOLDER_NAME: str = "blobs"
+
+    def __init__(self, folder: Optional[str] = None, compression: Optional[str] = None):
+        super().__init__(folder)
+        self.compression: str = compression if compression is not None else config.PAGE_STORE_COMPRESSION
+        if self.compression == "zstd" and zstandard is None:
+            raise ImportError("zstd page compression requires the 'zstandard' package")
+        self.indexPath: str = os.path.join(self.folder, self.INDEX_FILE_NAME)
+        self.index: Dict[str, str] = {}
+        self.references: Counter = Counter()
+        self.writingBlobs: Dict[str, threading.Event] = {}  # Set once the blob of the digest was written
+        self.loadIndex()
+
+    def loadIndex(self) -> None:
+        """
+        Replays the index log, and rewrites it without the overridden entries if it grew too long.
+
+        @return: None
+        """
+        if not os.path.exists(self.indexPath):
+            return
+
+        linesCount: int = 0
+        with open(self.indexPath, "r", encoding="utf-8") as file:
+            for line in file:
+                entry: Dict[str, Optional[str]] = json.loads(line)
+                if entry["blob"] is None:
+                    self.index.pop(entry["page"], None)
+                else:
+                    self.index[entry["page"]] = entry["blob"]
+                linesCount += 1
+        self.references = Counter(self.index.values())
+
+        if linesCount > 2 * len(self.index):
+            tmpPath: str = self.indexPath + ".tmp"
+            with open(tmpPath, "w", encoding="utf-8") as file:
+                for name, digest in self.index.items():
+                    file.write(json.dumps({"page": name, "blob": digest}) + "\n")
+            os.replace(tmpPath, self.indexPath)
+
+    def appendIndex(self, name: str, digest: Optional[str]) -> None:
+        """
+        Appends an entry to the index log.
+
+        Must be called while holding `self.lock`.
+
+        @param name: Name of the page.
+        @param digest: Blob of the page, None if the page was removed.
+
+        @return: None
+        """
+        with open(self.indexPath, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"page": name, "blob": digest}) + "\n")
+
+    def blobPath(self, digest: str) -> str:
+        """
+        Returns the path of a blob, blobs are spread over sub folders by the first two characters of their hash.
+
+        @param digest: `pageHash` of the page.
+
+        @return: str The blob's path.
+        """
+        extension: str = "zst" if self.compression == "zstd" else "gz"
+        return os.path.join(self.folder, self.BLOBS_FOLDER_NAME, digest[:2], f"{digest}.html.{extension}")
+
+    def writeBlob(self, path: str, data: bytes) -> None:
+        """
+        Compresses a page into its blob, through a temporary file so readers never see a partly written blob.
+
+        @param path: Path of the blob, see `blobPath`.
+        @param data: The page's HTML, UTF-8 encoded.
+
+        @return: None
+        """
+        if self.compression == "zstd":
+            compressed: bytes = zstandard.ZstdCompressor().compress(data)
+        else:
+            compressed: bytes = gzip.compress(data, mtime=0)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmpPath: str = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmpPath, "wb") as file:
+            file.write(compressed)
+        os.replace(tmpPath, path)
+
+    def save(self, name: str, html: str) -> None:
+        data: bytes = html.encode("utf-8")
+        digest: str = pageHash(html)
+
+        with self.lock:
+            previousDigest: Optional[str] = self.index.get(name)
+            if previousDigest == digest:
+                return
+            isNewBlob: bool = self.references[digest] == 0
+            if isNewBlob:
+                self.writingBlobs[digest] = threading.Event()
+            writing: Optional[threading.Event] = self.writingBlobs.get(digest)
+            self.references[digest] += 1  # Taken before writing, so a concurrent removal keeps the blob
+
+        path: str = self.blobPath(digest)
+        try:
+            if isNewBlob:
+                try:
+                    if not os.path.exists(path):
+                        self.writeBlob(path, data)
+                finally:
+                    with self.lock:
+                        del self.writingBlobs[digest]
+                    writing.set()
+            else:
+                if writing is not None:  # Another saver is writing the blob, the entry must not point to it before
+                    writing.wait()
+                if not os.path.exists(path):  # The other saver failed
+                    self.writeBlob(path, data)
+        except BaseException:
+            with self.lock:
+                self.releaseBlob(digest)
+            raise
+
+        with self.lock:
+            self.index[name] = digest
+            self.appendIndex(name, digest)
+            if previousDigest is not None:
+                self.releaseBlob(previousDigest)
+
+    def releaseBlob(self, digest: str) -> None:
+        """
+        Drops a reference to a blob, deleting it once no page points to it.
+
+        Must be called while holding `self.lock`.
+
+        @param digest: `pageHash` of the blob.
+
+        @return: None
+        """
+        self.references[digest] -= 1
+        if self.references[digest] <= 0:
+            del self.references[digest]
+            if os.path.exists(self.blobPath(digest)):
+                os.remove(self.blobPath(digest))
+
+    def open(self, name: str) -> IO[str]:
+        with self.lock:
+            digest: str = self.index[name]
+        if self.compression == "zstd":
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(self.blobPath(digest), "rb"),
+                                                                            closefd=True), encoding="utf-8")
+        return gzip.open(self.blobPath(digest), "rt", encoding="utf-8")
+
+    def read(self, name: str) -> str:
+        with self.lock:
+            digest: str = self.index[name]
+        with open(self.blobPath(digest), "rb") as file:
+            compressed: bytes = file.read()
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompress(compressed).decode("utf-8")
+        return gzip.decompress(compressed).decode("utf-8")
+
+    def digest(self, name: str) -> str:
+        with self.lock:
+            return self.index[name]
+
+    def exists(self, name: str) -> bool:
+        with self.lock:
+            return name in self.index
+
+    def names(self) -> List[str]:
+        with self.lock:
+            return sorted(self.index, key=pageSortKey)
+
+    def remove(self, name: str) -> None:
+        with self.lock:
+            digest: str = self.index.pop(name)
+            self.appendIndex(name, None)
+            self.releaseBlob(digest)
+
+    def clear(self) -> None:
+        with self.lock:
+            if self.index:
+                return
+            if os.path.exists(self.indexPath):
+                os.remove(self.indexPath)
+            blobsFolder: str = os.path.join(self.folder, self.BLOBS_FOLDER_NAME)
+            if os.path.exists(blobsFolder):
+                for subFolder in os.listdir(blobsFolder):
+                    os.rmdir(os.path.join(blobsFolder, subFolder))
+                os.rmdir(blobsFolder)
+
+
+PAGE_STORES: Dict[str, Type[PageStore]] = {
+    "files": PageStore,
+    "compressed": CompressedPageStore,
+}  # The available page stores, by the name used in `config.PAGE_STORE`
+
+openStores: Dict[Tuple[str, str], PageStore] = {}
+openStoresLock = threading.Lock()
+
+
+def getPageStore(folder: Optional[str] = None) -> PageStore:
+    """
+    Returns the page store of a folder, of the kind selected by `config.PAGE_STORE`.
+
+    A single store is kept per folder and kind, so every module of the process
+    shares the same index.
+
+    @param folder: Folder of the store, defaults to `config.TMP_FOLDER_NAME`.
+
+    @return: PageStore The page store.
+    """
+    folder = folder if folder is not None else config.TMP_FOLDER_NAME
+    key: Tuple[str, str] = (config.PAGE_STORE, os.path.abspath(folder))
+    with openStoresLock:
+        if key not in openStores:
+            if config.PAGE_STORE not in PAGE_STORES:
+                raise ValueError(f"Unknown page store {config.PAGE_STORE}, available stores are {list(PAGE_STORES)}")
+            openStores[key] = PAGE_STORES[config.PAGE_STORE](folder)
+        return openStores[key]
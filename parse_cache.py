@@ -0,0 +1,169 @@
+"""Module for caching the parsed courses of every page, so pages that did not change since a previous run are not parsed again."""
+
+import config
+from course_data import CourseData
+
+import hashlib, json, sqlite3, time, zlib
+from typing import List, Optional, Tuple
+
+PARSER_VERSION: int = 1  # Version of the parsers' output, bump it whenever `parse_pages` or `stream_parse` change what they extract
+PARSER_CONFIG_NAMES: Tuple[str, ...] = (
+    "SITE_URL", "BODY_ELEMENTS_TAG_NAME", "COURSE_BOLD_ROW_CLASS", "COURSE_BOLD_ROW_CLASS_XPATH",
+    "COURSE_FACULTY_ROW_CLASS_XPATH", "COURSE_DATA_ROW_STYLE_XPATH", "COURSE_METADATA_ROW_STYLE_XPATH",
+    "SYLLABUS_LINK_TEXT", "COURSE_DATA_XPATH",
+)  # The settings of `config` the parsers depend on, changing any of them invalidates the cache
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS pages (
+    Key TEXT PRIMARY KEY,
+    Courses BLOB NOT NULL,
+    Size INTEGER NOT NULL,
+    LastUsed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_last_used ON pages (LastUsed);
+"""
+
+
+def configHash() -> str:
+    """
+    Hashes the settings of `config` the parsers depend on, see `PARSER_CONFIG_NAMES`.
+
+    @return: str The hex digest of the settings.
+    """
+    settings: List = [getattr(config, name, None) for name in PARSER_CONFIG_NAMES]
+    return hashlib.sha256(json.dumps(settings, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def encodeCourses(coursesData: List[CourseData]) -> bytes:
+    """
+    Encodes the courses of a page compactly: the values of their fields as compressed JSON arrays.
+
+    @param coursesData: The courses.
+
+    @return: bytes The encoded courses.
+    """
+    values: List[list] = [[getattr(course, field) for field in CourseData.__slots__] for course in coursesData]
+    return zlib.compress(json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decodeCourses(data: bytes) -> List[CourseData]:
+    """
+    Decodes courses encoded by `encodeCourses`.
+
+    @param data: The encoded courses.
+
+    @return: List[CourseData] The courses.
+    """
+    coursesData: List[CourseData] = []
+    for values in json.loads(zlib.decompress(data)):
+        course = CourseData()
+        for field, value in zip(CourseData.__slots__, values):
+            setattr(course, field, value)
+        coursesData.append(course)
+    return coursesData
+
+
+class ParseCache:
+    """
+    Maps the content of a page to its parsed courses, in an SQLite database.
+
+    Entries are keyed by the `page_store.pageHash` of the page (its HTML
+    without the hidden form fields, which change on every scrape), its year
+    (which the parsers take from the page's name), the parsing engine,
+    `PARSER_VERSION` and `configHash`, so a change of any of them misses the cache.
+
+    The cache is capped to `config.PARSE_CACHE_MAX_MB`, the least recently
+    used entries are evicted when it is closed.
+    """
+
+    def __init__(self, path: Optional[str] = None, maxMegabytes: Optional[float] = None):
+        self.path: str = path if path is not None else config.PARSE_CACHE_FILE_NAME
+        self.maxBytes: int = int((maxMegabytes if maxMegabytes is not None else config.PARSE_CACHE_MAX_MB) * 1024 * 1024)
+        self.configHash: str = configHash()
+        self.usedKeys: List[str] = []
+
+        self.connection: Optional[sqlite3.Connection] = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Only applies when the database is created
+        self.connection.executescript(SCHEMA)
+
+    def key(self, pageDigest: str, yearName: str, engine: Optional[str] = None) -> str:
+        """
+        Builds the cache key of a page.
+
+        @param pageDigest: The `page_store.pageHash` of the page, see `page_store.PageStore.digest`.
+        @param yearName: Name of the page's academic year.
+        @param engine: The parsing engine, defaults to `config.PARSER_ENGINE`.
+
+        @return: str The key.
+        """
+        engine = engine if engine is not None else config.PARSER_ENGINE
+        return hashlib.sha256(f"{pageDigest}|{yearName}|{engine}|{PARSER_VERSION}|{self.configHash}".encode("utf-8")).hexdigest()
+
+    def contains(self, key: str) -> bool:
+        """
+        Checks whether a page is cached.
+
+        @param key: The page's key, see `key`.
+
+        @return: bool True if the page is cached.
+        """
+        return self.connection.execute("SELECT 1 FROM pages WHERE Key = ?", (key,)).fetchone() is not None
+
+    def get(self, key: str) -> Optional[List[CourseData]]:
+        """
+        Returns the cached courses of a page.
+
+        @param key: The page's key, see `key`.
+
+        @return: List[CourseData] The page's courses, or None if the page is not cached.
+        """
+        row: Optional[tuple] = self.connection.execute("SELECT Courses FROM pages WHERE Key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.usedKeys.append(key)
+        return decodeCourses(row[0])
+
+    def put(self, key: str, coursesData: List[CourseData]) -> None:
+        """
+        Caches the courses of a page.
+
+        @param key: The page's key, see `key`.
+        @param coursesData: The page's courses.
+
+        @return: None
+        """
+        data: bytes = encodeCourses(coursesData)
+        self.connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used entries until the cache fits in its size cap.
+
+        @return: int Number of entries deleted.
+        """
+        totalBytes: int = self.connection.execute("SELECT COALESCE(SUM(Size), 0) FROM pages").fetchone()[0]
+        evictedKeys: List[tuple] = []
+        for key, size in self.connection.execute("SELECT Key, Size FROM pages ORDER BY LastUsed"):
+            if totalBytes <= self.maxBytes:
+                break
+            evictedKeys.append((key,))
+            totalBytes -= size
+        self.connection.executemany("DELETE FROM pages WHERE Key = ?", evictedKeys)
+        return len(evictedKeys)
+
+    def close(self) -> None:
+        """
+        Records the entries used by this run, evicts the least recently used entries and closes the database.
+
+        @return: None
+        """
+        if self.connection is None:
+            return
+        now: float = time.time()
+        self.connection.executemany("UPDATE pages SET LastUsed = ? WHERE Key = ?", ((now, key) for key in self.usedKeys))
+        evicted: int = self.evict()
+        self.connection.commit()
+        if evicted:
+            self.connection.executescript("PRAGMA incremental_vacuum;")  # Run to completion, shrinking the file
+        self.connection.close()
+        self.connection = None
@@ -1,75 +1,21 @@
 """Module for parsing and creating CSV file from locally saved HTML pages."""
 
-import config
+import config, metrics, page_store, parse_cache, stream_parse
+from course_data import CourseColumns, CourseData
+from page_store import PageStore
+from parse_cache import ParseCache
 
-import os, re
-from typing import Generator, List, Optional, Tuple, Set, Dict
-import pandas as pd
+import logging, os, re, time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Callable, Generator, Iterator, List, Optional, Tuple, Set, Dict
+from urllib.parse import urljoin
 
 from lxml import etree, html
 from lxml.etree import _ElementTree as ElementTree
 from lxml.html import HtmlElement
 
-
-class CourseData:
-    def __init__(
-            self,
-            number: Optional[str] = None,
-            group: Optional[str] = None,
-            name: Optional[str] = None,
-            faculty: Optional[str] = None,
-            school: Optional[str] = None,
-            year: Optional[str] = None,
-            instructor: Optional[List[str]] = None,
-            method: Optional[List[str]] = None,
-            building: Optional[List[str]] = None,
-            room: Optional[List[str]] = None,
-            day: Optional[List[str]] = None,
-            hour: Optional[List[str]] = None,
-            semester: Optional[List[str]] = None
-    ):
-        self.Number: Optional[str] = number
-        self.Group: Optional[str] = group
-        self.Name: Optional[str] = name
-        self.Faculty: Optional[str] = faculty
-        self.School: Optional[str] = school
-        self.Year: Optional[str] = year
-
-        self.Instructor: List[str] = instructor if instructor is not None else []
-        self.Method: List[str] = method if method is not None else []
-        self.Building: List[str] = building if building is not None else []
-        self.Room: List[str] = room if room is not None else []
-        self.Day: List[str] = day if day is not None else []
-        self.Hour: List[str] = hour if hour is not None else []
-        self.Semester: List[str] = semester if semester is not None else []
-
-    def __repr__(self):
-        return f"{{Number = {self.Number}; Group = {self.Group}; Name = {self.Name}; Faculty = {self.Faculty}; School = {self.School}; Year = {self.Year}; Instructor = {self.Instructor}; Method = {self.Method}; Building = {self.Building}; Room = {self.Room}; Day = {self.Day}; Hour = {self.Hour}; Semester = {self.Semester}}}"
-
-    def toDict(self) -> dict[str, str]:
-        instructorStr = "\n".join(self.Instructor)
-        methodStr = "\n".join(self.Method)
-        buildingStr = "\n".join(self.Building)
-        roomStr = "\n".join(self.Room)
-        dayStr = "\n".join(self.Day)
-        hourStr = "\n".join(self.Hour)
-        semesterStr = "\n".join(self.Semester)
-
-        return {
-            "Number": self.Number,
-            "Group": self.Group,
-            "Name": self.Name,
-            "Instructor": instructorStr,
-            "Year": self.Year,
-            "Semester": semesterStr,
-            "Method": methodStr,
-            "School": self.School,
-            "Faculty": self.Faculty,
-            "Building": buildingStr,
-            "Room": roomStr,
-            "Day": dayStr,
-            "Hour": hourStr
-        }
+logger = logging.getLogger(__name__)
 
 
 def element_to_html_str(element: HtmlElement) -> str:
@@ -82,20 +28,42 @@ def element_to_html_str(element: HtmlElement) -> str:
     return etree.tostring(element, encoding="unicode", method="html")
 
 
+def listHTMLFiles(folder: Optional[str] = None) -> List[str]:
+    """
+    Lists all saved HTML pages inside the temporary folder, in a deterministic
+    order: by year, then by page number.
+
+    @param folder: Folder to list, defaults to `config.TMP_FOLDER_NAME`.
+
+    @return: List[str] Sorted list of HTML page names.
+    """
+    return page_store.getPageStore(folder).names()
+
+
+def readHTMLFile(store: PageStore, filename: str) -> ElementTree:
+    """
+    Reads a saved HTML page from the page store and parses it.
+
+    @param store: Page store holding the page.
+    @param filename: Name of the page.
+
+    @return: ElementTree Parsed HTML tree of the page.
+    """
+    return html.fromstring(store.read(filename))
+
+
 def openHTMLFileGenerator() -> Generator[Tuple[ElementTree, str], None, None]:
     """
-    Generator that iterates over all HTML files inside `config.TMP_FOLDER_NAME`
-    and yields them as parsed `ElementTree` objects using UTF-8 encoding.
+    Generator that iterates over all HTML pages inside `config.TMP_FOLDER_NAME`
+    ordered by year and page number, and yields them as parsed `ElementTree`
+    objects. Pages are read through the page store selected by `config.PAGE_STORE`,
+    so compressed pages are read transparently.
 
     @yield: ElementTree Parsed HTML tree for each file.
     """
-    for filename in os.listdir(config.TMP_FOLDER_NAME):
-        if filename.endswith(".html"):
-            filepath = os.path.join(config.TMP_FOLDER_NAME, filename)
-            file = open(filepath, "r", encoding="utf-8")
-            fileContent: str = file.read()
-            file.close()
-            yield html.fromstring(fileContent), filename
+    store: PageStore = page_store.getPageStore()
+    for filename in store.names():
+        yield readHTMLFile(store, filename), filename
 
 
 def getCoursesData(pageTree: ElementTree) -> List[HtmlElement]:
@@ -169,16 +137,39 @@ def parseFacultyRow(facultyRow: HtmlElement) -> Tuple[Optional[str], Optional[st
     return school_name, faculty_name
 
 
+def parseMetadataRow(metadataRow: HtmlElement) -> Tuple[Optional[str], List[str]]:
+    """
+    Parses a metadata row <tr> and extracts the syllabus and exam links.
+
+    The link whose text contains `config.SYLLABUS_LINK_TEXT` is the syllabus,
+    all the other links are exam links. Links are made absolute against `config.SITE_URL`.
+
+    @param metadataRow: HtmlElement representing the <tr> metadata row.
+
+    @return: Tuple of (syllabus_link, exam_links), the syllabus link is None if the row has none.
+    """
+    syllabus: Optional[str] = None
+    exams: List[str] = []
+    for link in metadataRow.iter("a"):
+        href: Optional[str] = link.get("href")
+        if not href or href.startswith("javascript:"):
+            continue
+        if syllabus is None and config.SYLLABUS_LINK_TEXT in "".join(link.itertext()):
+            syllabus = urljoin(config.SITE_URL, href.strip())
+        else:
+            exams.append(urljoin(config.SITE_URL, href.strip()))
+    return syllabus, exams
+
+
 def parseDataRows(dataRows: List[HtmlElement], lecturers: List[str], methods: List[str], buildings: List[str],
                   rooms: List[str], days: List[str], hours: List[str], semesters: List[str]) -> None:
     """
-    Recursively parses data rows corresponding to a single course instance,
+    Parses data rows corresponding to a single course instance,
     extracting lecturer, method, building, room, day, hour, and semester
     information from <td> cells.
 
-    Each recursive call consumes one row (the first in the list) and
-    appends its data into the given lists, then continues parsing
-    the remaining rows until none are left.
+    Rows are consumed in order and their data is appended into the given
+    lists, parsing stops at the first row with fewer than 7 <td> elements.
 
     @param dataRows:    List of HtmlElement rows (<tr>) to be parsed.
                         Each row is expected to contain at least 7 <td> elements.
@@ -192,24 +183,20 @@ def parseDataRows(dataRows: List[HtmlElement], lecturers: List[str], methods: Li
 
     @return: None
     """
-    if not dataRows:
-        return
-    dataRow = dataRows[0]
-    tds = dataRow.xpath("./td")
-    if (not tds) or (len(tds) < 7):
-        return
-
-    lecturer: str = tds[0].text_content().strip()
-    lecturer = lecturer.replace(u"\xa0", " ")
-    lecturers.append(lecturer)
-    methods.append(tds[1].text_content().strip())
-    buildings.append(tds[2].text_content().strip())
-    rooms.append(tds[3].text_content().strip())
-    days.append(tds[4].text_content().strip())
-    hours.append(tds[5].text_content().strip())
-    semesters.append(tds[6].text_content().strip())
-
-    parseDataRows(dataRows[1::], lecturers, methods, buildings, rooms, days, hours, semesters)
+    for dataRow in dataRows:
+        tds = dataRow.xpath("./td")
+        if (not tds) or (len(tds) < 7):
+            return
+
+        lecturer: str = tds[0].text_content().strip()
+        lecturer = lecturer.replace(u"\xa0", " ")
+        lecturers.append(lecturer)
+        methods.append(tds[1].text_content().strip())
+        buildings.append(tds[2].text_content().strip())
+        rooms.append(tds[3].text_content().strip())
+        days.append(tds[4].text_content().strip())
+        hours.append(tds[5].text_content().strip())
+        semesters.append(tds[6].text_content().strip())
 
 
 def parseYear(filename: str) -> str:
@@ -235,14 +222,16 @@ def parseCourses(coursesSeparated: List[List[HtmlElement]], filename: str) -> Li
     - Extracts number, group, and name from the bold row.
     - Extracts faculty and school from the faculty row.
     - Derives the academic year from the filename.
-    - Recursively parses schedule rows into Instructor, Method, Building,
+    - Parses schedule rows into Instructor, Method, Building,
       Room, Day, Hour, and Semester lists.
+    - Extracts the syllabus and exam links from the last (metadata) row.
 
     @param coursesSeparated:    List of course groups, where each group is a list of
                                 HtmlElements representing rows (<tr>) for a single course.
                                 The first row contains bold data (course number, group, name),
                                 the second row contains faculty/school info, and the
-                                subsequent rows contain schedule data.
+                                subsequent rows contain schedule data, up to the last row
+                                which contains the metadata (syllabus and exam links).
     @param filename:            Name of the file being parsed (used to derive the year).
 
     @return: List of fully populated CourseData objects for all parsed courses.
@@ -250,12 +239,14 @@ def parseCourses(coursesSeparated: List[List[HtmlElement]], filename: str) -> Li
     li: List[CourseData] = []
     for courseGroup in coursesSeparated:
         Number, Group, Name = parseBoldRow(courseGroup[0])
-        print(Number, Group, Name)
+        logger.debug("Parsed course %s %s %s", Number, Group, Name)
         School, Faculty = parseFacultyRow(courseGroup[1])
         Year = parseYear(filename)
         courseData = CourseData(number=Number, group=Group, name=Name, faculty=Faculty, school=School, year=Year)
         parseDataRows(courseGroup[2:-1:], courseData.Instructor, courseData.Method, courseData.Building,
                       courseData.Room, courseData.Day, courseData.Hour, courseData.Semester)
+        if len(courseGroup) > 2:
+            courseData.Syllabus, courseData.Exams = parseMetadataRow(courseGroup[-1])
         li.append(courseData)
     return li
 
@@ -291,7 +282,7 @@ def separateCourses(coursesDataList: List[HtmlElement]) -> List[List[HtmlElement
     return result
 
 
-def convertToPandas(df: pd.DataFrame, coursesData: List[CourseData]) -> pd.DataFrame:
+def convertToPandas(df: "pd.DataFrame", coursesData: List[CourseData]) -> "pd.DataFrame":
     """
     Append a list of course data objects to an existing Pandas DataFrame.
 
@@ -300,37 +291,183 @@ def convertToPandas(df: pd.DataFrame, coursesData: List[CourseData]) -> pd.DataF
 
     @return: A new DataFrame combining the input DataFrame and the converted course data.
     """
-    coursesDataSet: List[Dict[str, Optional[str] | List[str]]] = [course.toDict() for course in coursesData]
-    coursesDataPandas: pd.DataFrame = pd.DataFrame(coursesDataSet)
+    import pandas as pd
+
+    coursesDataPandas: pd.DataFrame = CourseColumns(coursesData).toDataFrame()
 
     return pd.concat([df, coursesDataPandas], ignore_index=True, sort=False)
 
 
-def fileHandler() -> pd.DataFrame:
+def parsePage(pageTree: ElementTree, filename: str) -> List[CourseData]:
     """
-    Process all temporary HTML files and extract course data into a Pandas DataFrame.
-    - Iterates through the HTML file generator.
-    - Extracts course elements.
-    - Splits and parses them into CourseData objects.
-    - Appends them to a cumulative DataFrame.
-    - Optionally deletes temporary files after processing.
+    Parses a single page tree into CourseData objects.
 
-    @return: pd.DataFrame DataFrame containing all parsed course data.
+    @param pageTree: Parsed HTML tree `ElementTree` of a page.
+    @param filename: Name of the file being parsed (used to derive the year).
+
+    @return: List of CourseData objects found on the page.
+    """
+    coursesList: List[HtmlElement] = getCoursesData(pageTree)
+    separatedCourses: List[List[HtmlElement]] = separateCourses(coursesList)
+    return parseCourses(separatedCourses, filename)
+
+
+def parseHTML(pageSource: str, filename: str, engine: Optional[str] = None) -> List[CourseData]:
     """
-    htmlFiles: Generator[Tuple[ElementTree, str], None, None] = openHTMLFileGenerator()
-    df: pd.DataFrame = pd.DataFrame()
+    Parses the HTML source of a single page into CourseData objects.
+
+    Module level function so it can be sent to worker processes.
 
-    for file, filename in htmlFiles:
-        coursesList: List[HtmlElement] = getCoursesData(file)
-        separatedCourses: List[List[HtmlElement]] = separateCourses(coursesList)
-        coursesData: List[CourseData] = parseCourses(separatedCourses, filename)
-        df = convertToPandas(df, coursesData)
+    @param pageSource: HTML source of the page.
+    @param filename: Name of the page's file (used to derive the year).
+    @param engine: The parsing engine, "stream" for `stream_parse` or "classic" for
+                   the tree based parser of this module, defaults to `config.PARSER_ENGINE`.
 
-        if not config.KEEP_TMP_FOLDER:
-            os.remove(config.TMP_FOLDER_NAME + "/" + filename)
+    @return: List of CourseData objects found on the page.
+    """
+    engine = engine if engine is not None else config.PARSER_ENGINE
+    if engine == "stream":
+        return stream_parse.parseHTML(pageSource, filename)
+    return parsePage(html.fromstring(pageSource), filename)
 
-    return df
+
+def parseFile(store: PageStore, filename: str, engine: Optional[str] = None) -> List[CourseData]:
+    """
+    Reads and parses a single saved HTML page.
+
+    Module level function so it can be sent to worker processes; the store and
+    the engine are passed explicitly since workers do not share the parent's runtime config.
+
+    @param store: Page store holding the page.
+    @param filename: Name of the page.
+    @param engine: The parsing engine, see `parseHTML`.
+
+    @return: List of CourseData objects found on the page.
+    """
+    engine = engine if engine is not None else config.PARSER_ENGINE
+    if engine == "stream":
+        return stream_parse.parseFile(store, filename)
+    return parsePage(readHTMLFile(store, filename), filename)
+
+
+def timed(function: Callable, *args) -> Tuple[Any, float]:
+    """
+    Calls a function and measures how long it took, in the process running it.
+
+    @param function: The function, module level so it can be sent to worker processes.
+    @param args: The function's arguments.
+
+    @return: Tuple of (result, seconds).
+    """
+    start: float = time.perf_counter()
+    result: Any = function(*args)
+    return result, time.perf_counter() - start
+
+
+def parsedFilesGenerator(workers: int, cache: Optional[ParseCache] = None) -> Generator[Tuple[List[CourseData], str, float], None, None]:
+    """
+    Generator that parses all HTML files inside `config.TMP_FOLDER_NAME` and
+    yields their CourseData objects, ordered by year and page number.
+
+    With more than one worker the pages are parsed in a process pool, results
+    are still yielded in the same order as the serial path.
+
+    With a cache, the courses of the pages found in it are loaded instead of
+    parsed, and the courses of the other pages are added to it. Every lookup
+    is recorded in the run's metrics.
+
+    @param workers: Number of worker processes, 1 parses in the current process.
+    @param cache: Cache of the parsed pages, if any.
+
+    @yield: Tuple of (courses_data, filename, parse_seconds) for each file,
+            parse_seconds being the time to load the courses from the cache for cached pages.
+    """
+    store: PageStore = page_store.getPageStore()
+    filenames: List[str] = store.names()
+    keys: Dict[str, str] = {}
+    missedFilenames: List[str] = filenames
+    if cache is not None:
+        keys = {filename: cache.key(store.digest(filename), parseYear(filename)) for filename in filenames}
+        missedFilenames = [filename for filename in filenames if not cache.contains(keys[filename])]
+        metrics.getRunMetrics().parseCacheLooked(len(filenames) - len(missedFilenames), len(missedFilenames))
+
+    if workers <= 1:
+        results = (timed(parseFile, store, filename, config.PARSER_ENGINE) for filename in missedFilenames)
+        yield from cachedResults(filenames, set(missedFilenames), results, keys, cache)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(timed, repeat(parseFile), repeat(store), missedFilenames, repeat(config.PARSER_ENGINE))
+        yield from cachedResults(filenames, set(missedFilenames), results, keys, cache)
+
+
+def cachedResults(filenames: List[str], missedFilenames: Set[str], results: Iterator[Tuple[List[CourseData], float]],
+                  keys: Dict[str, str], cache: Optional[ParseCache]) -> Generator[Tuple[List[CourseData], str, float], None, None]:
+    """
+    Merges the parsed pages with the pages found in the cache, see `parsedFilesGenerator`.
+
+    @param filenames: Names of all the pages, in order.
+    @param missedFilenames: Names of the pages that missed the cache, all of them without a cache.
+    @param results: The (courses_data, parse_seconds) of the missed pages, in order.
+    @param keys: The cache key of every page, empty without a cache.
+    @param cache: Cache of the parsed pages, if any.
+
+    @yield: Tuple of (courses_data, filename, parse_seconds) for each file.
+    """
+    for filename in filenames:
+        if filename not in missedFilenames:
+            coursesData, seconds = timed(cache.get, keys[filename])
+            yield coursesData, filename, seconds
+            continue
+        coursesData, seconds = next(results)
+        if cache is not None:
+            cache.put(keys[filename], coursesData)
+        yield coursesData, filename, seconds
+
+
+def fileHandler(writeCourses: Callable[[List[CourseData]], None], workers: Optional[int] = None,
+                keepPages: Optional[bool] = None) -> int:
+    """
+    Process all temporary HTML files and stream the extracted course data to a sink.
+    - Parses the HTML files, in parallel if more than one worker is configured.
+      Pages identical to already parsed ones are loaded from the parse cache
+      (`config.PARSE_CACHE_FILE_NAME`) instead.
+    - Hands each page's CourseData objects to `writeCourses`, ordered by year and page number.
+    - Records every page's parse time and number of rows in the run's metrics.
+    - Optionally deletes temporary files after they were parsed.
+
+    Nothing is accumulated between pages, so memory use does not grow with the
+    number of pages parsed.
+
+    @param writeCourses: Sink receiving the CourseData objects of every page,
+                         usually `writers.CourseWriter.writeCourses`.
+    @param workers: Number of parsing worker processes, defaults to `config.PARSE_WORKERS`.
+    @param keepPages: Whether to keep the pages once parsed, defaults to `config.KEEP_TMP_FOLDER`.
+
+    @return: int Number of courses parsed.
+    """
+    workers = workers if workers is not None else config.PARSE_WORKERS
+    keepPages = keepPages if keepPages is not None else config.KEEP_TMP_FOLDER
+    coursesCount: int = 0
+    cache: Optional[ParseCache] = ParseCache() if config.PARSE_CACHE_FILE_NAME is not None else None
+
+    try:
+        for coursesData, filename, seconds in parsedFilesGenerator(workers, cache):
+            metrics.getRunMetrics().pageParsed(filename, parseYear(filename), seconds, len(coursesData))
+            writeCourses(coursesData)
+            coursesCount += len(coursesData)
+
+            if not keepPages:
+                page_store.getPageStore().remove(filename)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return coursesCount
 
 
 if __name__ == "__main__":
-    fileHandler()
+    import writers
+
+    with writers.createWriter() as writer:
+        fileHandler(writer.writeCourses)
@@ -0,0 +1,220 @@
+"""Module for parsing pages while they are being scraped, instead of reading them back from disk afterwards."""
+
+import config, metrics, page_store, parse_pages
+from course_data import CourseData
+from parse_cache import ParseCache
+
+import queue, threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, List, Optional, Set, Tuple
+
+
+class ParsePipeline:
+    """
+    Producer/consumer pipeline between the scrapers and the output writers.
+
+    Scrapers hand every page's HTML to `submitPage`, which puts it in a bounded
+    queue (blocking the scraper when the parsers fall behind). A consumer thread
+    takes the pages from the queue right away, parses them (in a process pool if
+    more than one worker is configured) and hands the CourseData objects to the
+    output sink, in the order the pages were submitted.
+
+    Every page is parsed once: a page submitted again, like the first pages of
+    a year that failed and is scraped again, is skipped. Pages found in the parse
+    cache (`config.PARSE_CACHE_FILE_NAME`) are loaded from it instead, the cache
+    is opened by the consumer thread, since SQLite connections stay in their thread.
+    """
+
+    def __init__(self, writeCourses: Callable[[List[CourseData]], None], workers: Optional[int] = None,
+                 queueSize: Optional[int] = None):
+        self.writeCourses: Callable[[List[CourseData]], None] = writeCourses
+        self.workers: int = workers if workers is not None else config.PARSE_WORKERS
+        self.engine: str = config.PARSER_ENGINE
+        self.pagesQueue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue(
+            maxsize=queueSize if queueSize is not None else config.PIPELINE_QUEUE_SIZE)
+        self.submittedPages: Set[str] = set()
+        self.submittedLock = threading.Lock()
+        self.coursesCount: int = 0
+        self.error: Optional[BaseException] = None
+        self.consumer = threading.Thread(target=self.consume, name="ParsePipeline", daemon=True)
+        self.consumer.start()
+
+    def submitPage(self, yearName: str, pageNumber: int, pageSource: str) -> None:
+        """
+        Hands a scraped page to the parsers, blocking while the queue is full.
+        Pages already submitted are skipped.
+
+        Thread safe, several scrapers can submit pages at once.
+
+        @param yearName: Name of the academic year of the page.
+        @param pageNumber: Index of the page inside the year's results.
+        @param pageSource: HTML source of the page.
+
+        @return: None
+        """
+        if self.error is not None:
+            raise RuntimeError("The parsing pipeline failed") from self.error
+        if self.markSubmitted(yearName, pageNumber):
+            self.pagesQueue.put((pageSource, page_store.pageName(yearName, pageNumber)))
+
+    def submitSavedPage(self, yearName: str, pageNumber: int) -> None:
+        """
+        Hands a page that was saved by a previous run (or by an earlier attempt
+        of this run) to the parsers, unless it was already submitted.
+
+        @param yearName: Name of the academic year of the page.
+        @param pageNumber: Index of the page inside the year's results.
+
+        @return: None
+        """
+        if self.error is not None:
+            raise RuntimeError("The parsing pipeline failed") from self.error
+        if self.markSubmitted(yearName, pageNumber):
+            name: str = page_store.pageName(yearName, pageNumber)
+            self.pagesQueue.put((page_store.getPageStore().read(name), name))
+
+    def markSubmitted(self, yearName: str, pageNumber: int) -> bool:
+        """
+        Records that a page is submitted.
+
+        @param yearName: Name of the academic year of the page.
+        @param pageNumber: Index of the page inside the year's results.
+
+        @return: bool False if the page was already submitted.
+        """
+        name: str = page_store.pageName(yearName, pageNumber)
+        with self.submittedLock:
+            if name in self.submittedPages:
+                return False
+            self.submittedPages.add(name)
+            return True
+
+    def consume(self) -> None:
+        """
+        Consumer thread loop, parses the queued pages until `close` is called.
+
+        At most twice the number of workers pages are parsed at once, results are
+        written as soon as all the pages submitted before them were written. After
+        an error the remaining pages are drained and dropped, so scrapers never
+        block on a full queue.
+
+        @return: None
+        """
+        executor: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        cache: Optional[ParseCache] = None
+        pending: Deque[Tuple[Future, str, Optional[str]]] = deque()
+        try:
+            if config.PARSE_CACHE_FILE_NAME is not None:
+                cache = ParseCache()
+            while True:
+                item: Optional[Tuple[str, str]] = self.pagesQueue.get()
+                if item is None:
+                    break
+                if self.error is not None:
+                    continue
+
+                try:
+                    pending.append((*self.parse(item[0], item[1], executor, cache), item[1]))
+                    while pending and (pending[0][0].done() or len(pending) > 2 * self.workers):
+                        self.writeParsed(*pending.popleft(), cache)
+                except BaseException as e:
+                    self.error = e
+
+            while pending and self.error is None:
+                try:
+                    self.writeParsed(*pending.popleft(), cache)
+                except BaseException as e:
+                    self.error = e
+        except BaseException as e:
+            self.error = e
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if cache is not None:
+                cache.close()
+
+    def parse(self, pageSource: str, name: str, executor: Optional[ProcessPoolExecutor],
+              cache: Optional[ParseCache]) -> Tuple[Future, Optional[str]]:
+        """
+        Starts parsing a page, in the pool if there is one, or loads its courses from the cache.
+
+        Must be called from the consumer thread.
+
+        @param pageSource: HTML source of the page.
+        @param name: Name of the page.
+        @param executor: Pool of the parsing processes, None to parse in this thread.
+        @param cache: Cache of the parsed pages, if any.
+
+        @return: Tuple of (future, key), the future resolving to the (courses_data, parse_seconds)
+                 of the page, and key being the cache key to store the parsed courses under,
+                 None if they were loaded from the cache or without a cache.
+        """
+        future: Future = Future()
+        key: Optional[str] = None
+        if cache is not None:
+            key = cache.key(page_store.pageHash(pageSource), parse_pages.parseYear(name), self.engine)
+            cached: Tuple[Optional[List[CourseData]], float] = parse_pages.timed(cache.get, key)
+            metrics.getRunMetrics().parseCacheLooked(int(cached[0] is not None), int(cached[0] is None))
+            if cached[0] is not None:
+                future.set_result(cached)
+                return future, None
+
+        if executor is not None:
+            return executor.submit(parse_pages.timed, parse_pages.parseHTML, pageSource, name, self.engine), key
+        future.set_result(parse_pages.timed(parse_pages.parseHTML, pageSource, name, self.engine))
+        return future, key
+
+    def writeParsed(self, future: Future, key: Optional[str], name: str, cache: Optional[ParseCache]) -> None:
+        """
+        Writes the courses of a page once parsed, and adds them to the cache if they missed it.
+
+        Must be called from the consumer thread.
+
+        @param future: The future returned by `parse`.
+        @param key: The cache key returned by `parse`.
+        @param name: Name of the page.
+        @param cache: Cache of the parsed pages, if any.
+
+        @return: None
+        """
+        coursesData, parseSeconds = future.result()
+        if key is not None:
+            cache.put(key, coursesData)
+        self.write(coursesData, parseSeconds, name)
+
+    def write(self, coursesData: List[CourseData], parseSeconds: float, name: str) -> None:
+        """
+        Hands the courses of a parsed page to the output sink, and records the page in the run's metrics.
+
+        @param coursesData: List of CourseData objects of the page.
+        @param parseSeconds: Time spent parsing the page.
+        @param name: Name of the page.
+
+        @return: None
+        """
+        metrics.getRunMetrics().pageParsed(name, parse_pages.parseYear(name), parseSeconds, len(coursesData))
+        self.writeCourses(coursesData)
+        self.coursesCount += len(coursesData)
+
+    def close(self) -> int:
+        """
+        Waits for all the submitted pages to be parsed and written.
+
+        @return: int Number of courses parsed.
+        """
+        self.pagesQueue.put(None)
+        self.consumer.join()
+        if self.error is not None:
+            raise RuntimeError("The parsing pipeline failed") from self.error
+        return self.coursesCount
+
+    def __enter__(self) -> "ParsePipeline":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.pagesQueue.put(None)
+            self.consumer.join()
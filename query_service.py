@@ -0,0 +1,336 @@
+"""Module for the read only HTTP service answering JSON queries over the courses of the CSV output, from in-memory indexes.
+
+The CSV output is loaded once into a `Snapshot`, and loaded again into a new
+snapshot whenever the file changes; the new snapshot replaces the old one in a
+single assignment, so every request is answered from one consistent version.
+
+    GET /courses?year=2025&number=0321-1100&group=01   the groups of a course
+    GET /courses?instructor=...&offset=50&limit=50     filters can be combined, results are paged
+    GET /courses?building=...&room=...                 a room requires its building
+    GET /status                                        the loaded snapshot
+
+Responses carry an ETag (the snapshot version and the query), answered by
+304 Not Modified on a matching If-None-Match, and are gzipped for clients
+accepting it.
+"""
+
+import config
+from course_data import CourseData
+
+import csv, gzip, hashlib, io, json, logging, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FILTERS: Tuple[str, ...] = ("year", "number", "group", "faculty", "school", "instructor", "building", "room")  # The query parameters selecting courses
+GZIP_MIN_BYTES: int = 1024  # Responses smaller than this are sent uncompressed
+GZIP_LEVEL: int = 1  # Compression level of the gzipped responses, higher levels cost more time than they save on a local network
+
+logger = logging.getLogger(__name__)
+
+
+class QueryError(ValueError):
+    """An invalid query, answered by 400 Bad Request."""
+
+
+class Snapshot:
+    """
+    The courses of one version of the CSV output, each encoded to JSON once,
+    with an index per filter mapping each value to the courses holding it.
+
+    Besides the single field indexes, courses are indexed by their
+    (Year, Number, Group) key and by the (Building, Room) of their sessions,
+    so the most common lookups only touch the courses they return.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Optional[str]]], version: str):
+        self.version: str = version
+        self.loadedAt: float = time.time()
+        self.courses: List[bytes] = []
+        self.tokens: List[FrozenSet[Tuple[str, object]]] = []  # For every course, its (filter, value) pairs
+        self.indexes: Dict[str, Dict[object, List[int]]] = {name: {} for name in FILTERS + ("key",)}
+
+        for record in records:
+            course: CourseData = CourseData.fromDict(record)
+            courseIndex: int = len(self.courses)
+            self.courses.append(json.dumps({column: getattr(course, column) for column in CourseData.COLUMNS},
+                                           ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            tokens: FrozenSet[Tuple[str, object]] = frozenset(
+                [(name, value.strip()) for name, value in (("year", course.Year), ("number", course.Number),
+                                                           ("group", course.Group), ("faculty", course.Faculty),
+                                                           ("school", course.School)) if value and value.strip()]
+                + [("instructor", value.strip()) for value in course.Instructor if value.strip()]
+                + [("building", value.strip()) for value in course.Building if value.strip()]
+                + [("room", (building.strip(), room.strip())) for building, room in zip(course.Building, course.Room)
+                   if building.strip() and room.strip()]
+            )
+            self.tokens.append(tokens)
+            for name, value in tokens:
+                self.indexes[name].setdefault(value, []).append(courseIndex)
+            self.indexes["key"].setdefault(self.key(course.Year, course.Number, course.Group), []).append(courseIndex)
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    @staticmethod
+    def key(year: Optional[str], number: Optional[str], group: Optional[str]) -> Tuple[str, str, str]:
+        return (year or "").strip(), (number or "").strip(), (group or "").strip()
+
+    def find(self, filters: Dict[str, str]) -> Sequence[int]:
+        """
+        Finds the courses matching all the given filters.
+
+        The candidates are taken from the smallest index list of the filters,
+        then checked against the remaining filters. A "room" filter already
+        implies its building, so the building is not checked again. Without
+        filters, or with a single one, the result is a range or the index list
+        itself rather than a copy, since only the requested page of it is read.
+
+        @param filters: The filter values by name, see `FILTERS`, a "room" filter requires a "building" filter.
+
+        @return: Sequence[int] Indices of the matching courses, in the order of the CSV file, not to be modified.
+        """
+        filters = {name: value.strip() for name, value in filters.items()}
+        if "room" in filters and "building" not in filters:
+            raise QueryError("the room filter requires the building filter")
+        if not filters:
+            return range(len(self.courses))
+
+        required: List[Tuple[str, object]] = [(name, (filters["building"], value) if name == "room" else value)
+                                              for name, value in filters.items() if name != "building" or "room" not in filters]
+        candidateLists: List[List[int]] = [self.indexes[name].get(value, []) for name, value in required]
+        if "year" in filters and "number" in filters and "group" in filters:
+            candidateLists.append(self.indexes["key"].get((filters["year"], filters["number"], filters["group"]), []))
+        candidates: List[int] = min(candidateLists, key=len)
+        if len(required) == 1:
+            return candidates
+        requiredSet: FrozenSet[Tuple[str, object]] = frozenset(required)
+        return [courseIndex for courseIndex in candidates if requiredSet <= self.tokens[courseIndex]]
+
+    def page(self, courseIndices: Sequence[int], offset: int, limit: int) -> bytes:
+        """
+        Encodes a page of courses as the JSON body of a response.
+
+        @param courseIndices: Indices of all the matching courses.
+        @param offset: Index of the page's first course among the matching courses.
+        @param limit: Maximal number of courses in the page.
+
+        @return: bytes The JSON object, with the snapshot version, the total number of matching courses and the page's courses.
+        """
+        header: str = json.dumps({"version": self.version, "total": len(courseIndices), "offset": offset, "limit": limit})
+        courses: bytes = b",".join(self.courses[courseIndex] for courseIndex in courseIndices[offset:offset + limit])
+        return header[:-1].encode("utf-8") + b',"courses":[' + courses + b"]}"
+
+
+def loadSnapshot(path: Optional[str] = None) -> Snapshot:
+    """
+    Loads the courses of the CSV output, its version is the hash of its content.
+
+    @param path: Path of the CSV file, defaults to `config.FINAL_CSV_FILE_NAME`.
+
+    @return: Snapshot The snapshot of the file.
+    """
+    path = path if path is not None else config.FINAL_CSV_FILE_NAME
+    with open(path, "rb") as file:
+        content: bytes = file.read()
+    version: str = hashlib.sha256(content).hexdigest()[:16]
+    return Snapshot(csv.DictReader(io.StringIO(content.decode("utf-8"), newline="")), version)
+
+
+def parseQuery(query: str) -> Tuple[Dict[str, str], int, int]:
+    """
+    Parses the query string of a /courses request, checking it can be answered
+    before any course is looked up.
+
+    @param query: The query string.
+
+    @return: Tuple of (filters, offset, limit), the filter values stripped like in `Snapshot.find`.
+    """
+    parameters: Dict[str, List[str]] = parse_qs(query, keep_blank_values=False)
+    unknown: List[str] = [name for name in parameters if name not in FILTERS + ("offset", "limit")]
+    if unknown:
+        raise QueryError(f"unknown parameters {', '.join(sorted(unknown))}, the filters are {', '.join(FILTERS)}")
+    repeated: List[str] = [name for name, values in parameters.items() if len(values) > 1]
+    if repeated:
+        raise QueryError(f"parameters {', '.join(sorted(repeated))} are given more than once")
+    if "room" in parameters and "building" not in parameters:
+        raise QueryError("the room filter requires the building filter")
+
+    try:
+        offset: int = int(parameters.get("offset", ["0"])[0])
+        limit: int = int(parameters.get("limit", [str(config.QUERY_SERVICE_PAGE_SIZE)])[0])
+    except ValueError:
+        raise QueryError("offset and limit must be integers")
+    if offset < 0 or not 0 <= limit <= config.QUERY_SERVICE_MAX_PAGE_SIZE:
+        raise QueryError(f"offset must not be negative and limit must be between 0 and {config.QUERY_SERVICE_MAX_PAGE_SIZE}")
+    return {name: values[0].strip() for name, values in parameters.items() if name in FILTERS}, offset, limit
+
+
+def acceptsGzip(acceptEncoding: Optional[str]) -> bool:
+    """
+    Checks whether a client accepts gzipped responses.
+
+    @param acceptEncoding: The Accept-Encoding header of the request.
+
+    @return: bool True if gzip is listed and not refused with q=0.
+    """
+    for coding in (acceptEncoding or "").split(","):
+        name, _, parameters = coding.partition(";")
+        if name.strip().lower() in ("gzip", "x-gzip"):
+            return parameters.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Answers the requests of the query service, see the module docstring."""
+
+    protocol_version = "HTTP/1.1"  # Keeps the connections alive between requests
+    disable_nagle_algorithm = True  # The headers and the body are sent by separate writes, Nagle's algorithm would delay the body
+    server: "QueryServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        snapshot: Optional[Snapshot] = self.server.snapshot  # Read once, a swap during the request does not affect it
+        if url.path == "/status":
+            self.sendJson(200, {"version": snapshot.version if snapshot else None,
+                                "courses": len(snapshot) if snapshot else 0,
+                                "loadedAt": snapshot.loadedAt if snapshot else None, "path": self.server.dataPath})
+        elif url.path != "/courses":
+            self.sendJson(404, {"error": f"unknown path {url.path}, use /courses or /status"})
+        elif snapshot is None:
+            self.sendJson(503, {"error": f"{self.server.dataPath} is not loaded yet"})
+        else:
+            self.sendCourses(snapshot, url.query)
+
+    def sendCourses(self, snapshot: Snapshot, query: str) -> None:
+        """
+        Answers a /courses request.
+
+        @param snapshot: The snapshot the request is answered from.
+        @param query: The query string of the request.
+
+        @return: None
+        """
+        try:
+            filters, offset, limit = parseQuery(query)
+        except QueryError as e:
+            self.sendJson(400, {"error": str(e)})
+            return
+        canonicalQuery: str = json.dumps([sorted(filters.items()), offset, limit], ensure_ascii=False)
+        etag: str = f'W/"{snapshot.version}-{hashlib.sha256(canonicalQuery.encode("utf-8")).hexdigest()[:16]}"'
+        headers: Dict[str, str] = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+        ifNoneMatch: Optional[str] = self.headers.get("If-None-Match")
+        if ifNoneMatch is not None:
+            candidates: List[str] = [tag.strip().removeprefix("W/") for tag in ifNoneMatch.split(",")]
+            if "*" in candidates or etag.removeprefix("W/") in candidates:
+                self.sendBody(304, b"", headers)
+                return
+        self.sendBody(200, snapshot.page(snapshot.find(filters), offset, limit), headers)
+
+    def sendJson(self, status: int, value: object) -> None:
+        self.sendBody(status, json.dumps(value, ensure_ascii=False).encode("utf-8"), {"Cache-Control": "no-cache"})
+
+    def sendBody(self, status: int, body: bytes, headers: Dict[str, str]) -> None:
+        """
+        Sends a response, gzipping its body if it is large enough and the client accepts it.
+
+        @param status: The status code.
+        @param body: The JSON body, empty for 304 Not Modified.
+        @param headers: Additional headers.
+
+        @return: None
+        """
+        self.send_response(status)
+        if body and len(body) >= GZIP_MIN_BYTES and acceptsGzip(self.headers.get("Accept-Encoding")):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    The query service: answers every request on its own thread, and checks
+    the CSV output every `reloadSeconds` seconds, loading it into a new
+    snapshot when it changed. The new snapshot is built aside and replaces the
+    current one in a single assignment, and a file that fails to load keeps the
+    current snapshot.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, path: Optional[str] = None,
+                 reloadSeconds: Optional[float] = None):
+        self.dataPath: str = path if path is not None else config.FINAL_CSV_FILE_NAME
+        self.reloadSeconds: float = reloadSeconds if reloadSeconds is not None else config.QUERY_SERVICE_RELOAD_SECONDS
+        self.snapshot: Optional[Snapshot] = None
+        self.fileState: Optional[Tuple[int, int, int]] = None
+        self.stopped = threading.Event()
+        self.reload()
+        super().__init__((host if host is not None else config.QUERY_SERVICE_HOST,
+                          port if port is not None else config.QUERY_SERVICE_PORT), QueryHandler)
+        self.watcher = threading.Thread(target=self.watch, name="snapshot-watcher", daemon=True)
+        self.watcher.start()
+
+    def reload(self) -> bool:
+        """
+        Loads the CSV output into a new snapshot if the file changed since the last load.
+
+        @return: bool True if a new snapshot was loaded.
+        """
+        try:
+            stat: os.stat_result = os.stat(self.dataPath)
+        except FileNotFoundError:
+            return False
+        fileState: Tuple[int, int, int] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if fileState == self.fileState:
+            return False
+        startTime: float = time.perf_counter()
+        try:
+            snapshot: Snapshot = loadSnapshot(self.dataPath)
+        except Exception:  # Whatever is wrong with the file, the watcher must keep running
+            logger.exception("Loading %s failed, still serving the previous snapshot", self.dataPath)
+            return False
+        self.fileState = fileState
+        if self.snapshot is not None and snapshot.version == self.snapshot.version:
+            return False
+        self.snapshot = snapshot
+        logger.info("Loaded %d courses of %s (version %s) in %.2fs", len(snapshot), self.dataPath, snapshot.version,
+                    time.perf_counter() - startTime)
+        return True
+
+    def watch(self) -> None:
+        while not self.stopped.wait(self.reloadSeconds):
+            self.reload()
+
+    def server_close(self) -> None:
+        self.stopped.set()
+        super().server_close()
+
+
+def serve(host: Optional[str] = None, port: Optional[int] = None, path: Optional[str] = None) -> None:
+    """
+    Runs the query service until interrupted.
+
+    @param host: The address to listen on, defaults to `config.QUERY_SERVICE_HOST`.
+    @param port: The port to listen on, defaults to `config.QUERY_SERVICE_PORT`.
+    @param path: Path of the CSV file, defaults to `config.FINAL_CSV_FILE_NAME`.
+
+    @return: None
+    """
+    with QueryServer(host, port, path) as server:
+        logger.info("Serving %s on http://%s:%d", server.dataPath, *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
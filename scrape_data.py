@@ -1,14 +1,23 @@
 """Module for scraping and saving locally pages data from the website."""
 
-import config
-import re
-from typing import List
+import config, metrics, page_store, scrape_units
+from scrape_manifest import ScrapeManifest
+from scrape_units import ScrapeUnit
+from pipeline import ParsePipeline
+import logging, queue, re, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
 from selenium.webdriver.chrome.webdriver import WebDriver as WebDriver
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (ElementNotInteractableException, NoSuchElementException,
+                                        StaleElementReferenceException, TimeoutException)
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+logger = logging.getLogger(__name__)
+
 
 def getPossibleYears(browser: WebDriver) -> List[str]:
     """
@@ -28,7 +37,52 @@ def getPossibleYears(browser: WebDriver) -> List[str]:
     return yearNames
 
 
-def scrapeYear(browser: WebDriver, yearName: str) -> None:
+def getResultsElement(browser: WebDriver) -> WebElement:
+    """
+    Returns an element replaced by every postback of the page, the results
+    <tbody> on a results page (see `parse_pages.getCoursesData`), or the whole
+    document on the search page.
+
+    @param browser: Selenium WebDriver instance used to control the browser.
+
+    @return: WebElement The element.
+    """
+    bodies: List[WebElement] = browser.find_elements(By.XPATH, config.BODY_ELEMENTS_TAG_NAME)
+    return bodies[1] if len(bodies) >= 2 else browser.find_element(By.TAG_NAME, "html")
+
+
+def waitForResults(browser: WebDriver, previousResults: Optional[WebElement] = None) -> None:
+    """
+    Waits until a results page is shown.
+
+    If the results element of the previous page is given (see `getResultsElement`),
+    waits for it to be replaced and then for the next or prev button to be in
+    the page, which does not depend on stylesheets being loaded. Otherwise
+    waits for the next or prev button to be visible, which may happen before
+    the previous results were replaced.
+
+    @param browser: Selenium WebDriver instance used to control the browser.
+    @param previousResults: The results element of the page shown before the last click, if any.
+
+    @return: None
+    """
+    wait = WebDriverWait(browser, config.TIMEOUT_FOR_SCRAPING)
+    if previousResults is None:
+        wait.until(EC.any_of(
+            EC.visibility_of_element_located((By.ID, config.NEXT_PAGE_BUTTON_ID)),
+            EC.visibility_of_element_located((By.ID, config.PREV_PAGE_BUTTON_ID))
+        ))
+        return
+
+    wait.until(EC.staleness_of(previousResults))
+    wait.until(EC.any_of(
+        EC.presence_of_element_located((By.ID, config.NEXT_PAGE_BUTTON_ID)),
+        EC.presence_of_element_located((By.ID, config.PREV_PAGE_BUTTON_ID))
+    ))
+
+
+def scrapeYear(browser: WebDriver, yearName: str, manifest: Optional[ScrapeManifest] = None,
+               pipeline: Optional[ParsePipeline] = None, previousResults: Optional[WebElement] = None) -> None:
     """
     Scrapes all pages for a given academic year and saves the HTMLs locally.
 
@@ -39,30 +93,67 @@ def scrapeYear(browser: WebDriver, yearName: str) -> None:
     The function repeatedly clicks the "next page" button (configured in
     `config.NEXT_PAGE_BUTTON_ID`) until no further page is available.
 
+    If a manifest is given, pages it already holds are passed through without
+    being saved again, and the year is marked as finished once its last page
+    was saved. Errors other than a missing next page button (a timeout or a
+    crashed browser) are raised, leaving the year unfinished in the manifest.
+
+    If a parsing pipeline is given, every page is handed to it, the pages
+    already held by the manifest are read back from disk.
+
+    The time spent waiting for every page, and the time from the click that
+    requested it (the search button for the first page, which is clicked right
+    before this function is called) are recorded in the run's metrics.
+
+    If `config.FAST_BROWSER` is True, every page turn waits for the previous
+    results to be replaced (see `waitForResults`), and a page showing the same
+    content as an earlier page of the year raises a RuntimeError, leaving the
+    year unfinished, instead of saving it twice.
+
     @param browser: Selenium WebDriver instance used to control the browser.
     @param yearName: Name of the academic year, used for naming saved HTML files.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+    @param previousResults: With `config.FAST_BROWSER`, the results element of the search page before the search
+                            button was clicked, see `getResultsElement`.
 
     @return: None
     """
+    startPage: int = manifest.savedPages(yearName) if manifest is not None else 0
     pageNumber = 0
+    pagesHashes: Dict[str, int] = {}
+    clickedAt: float = time.perf_counter()
     while True:
-        WebDriverWait(browser, config.TIMEOUT_FOR_SCRAPING).until(
-            EC.any_of(
-                EC.visibility_of_element_located((By.ID, config.NEXT_PAGE_BUTTON_ID)),
-                EC.visibility_of_element_located((By.ID, config.PREV_PAGE_BUTTON_ID))
-            )
-        )
-
-        html = browser.page_source
-        with open(f"{config.TMP_FOLDER_NAME}/{yearName}-{pageNumber}.html", "w", encoding="utf-8") as file:
-            file.write(html)
+        waitStart: float = time.perf_counter()
+        waitForResults(browser, previousResults)
+        renderedAt: float = time.perf_counter()
+        metrics.getRunMetrics().waited("results", renderedAt - waitStart)
+        metrics.getRunMetrics().pageRendered(page_store.pageName(yearName, pageNumber), renderedAt - waitStart,
+                                             renderedAt - clickedAt)
+
+        if pageNumber >= startPage:
+            pageSource: str = browser.page_source
+            if config.FAST_BROWSER:
+                digest: str = page_store.pageHash(pageSource)
+                if digest in pagesHashes:
+                    raise RuntimeError(f"Page {pageNumber} of year {yearName} repeats page {pagesHashes[digest]}")
+                pagesHashes[digest] = pageNumber
+            scrape_units.savePage(yearName, pageNumber, pageSource, manifest, pipeline)
+        elif pipeline is not None:
+            pipeline.submitSavedPage(yearName, pageNumber)
 
         try:
+            previousResults = getResultsElement(browser) if config.FAST_BROWSER else None
             browser.find_element(By.ID, config.NEXT_PAGE_BUTTON_ID).click()
-        except:
-            return
+            clickedAt = time.perf_counter()
+        except (NoSuchElementException, ElementNotInteractableException, StaleElementReferenceException,
+                TimeoutException):  # The last page
+            break
         pageNumber += 1
 
+    if manifest is not None:
+        manifest.yearFinished(yearName, pageNumber + 1)
+
 
 def yearSwitcher(browser: WebDriver, yearIndex: int) -> None:
     """
@@ -81,21 +172,39 @@ def yearSwitcher(browser: WebDriver, yearIndex: int) -> None:
     years[yearIndex].click()
 
 
-def setFaculty(browser: WebDriver) -> None:
+def setFaculty(browser: WebDriver, departmentIndex: Optional[int] = None) -> None:
     """
     Sets the faculty/department filter to the desired option.
 
-    Opens the department dropdown and selects the option at the index defined
-    in `config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX`.
+    Opens the department dropdown and selects the option at the given index.
 
     @param browser: Selenium WebDriver instance used to control the browser.
+    @param departmentIndex: Index of the option, defaults to `config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX`.
 
     @return: None
     """
+    departmentIndex = departmentIndex if departmentIndex is not None else config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX
     depPop = browser.find_element(By.ID, config.DEPARTMENT_DROPDOWN_ID)
     depPop.click()
     departments = depPop.find_elements(By.TAG_NAME, "option")
-    departments[config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX].click()
+    departments[departmentIndex].click()
+
+
+def getDepartmentsIndices(browser: WebDriver, yearIndex: int) -> List[int]:
+    """
+    Lists the departments of a year, by switching the search form to the year
+    and reading the department dropdown.
+
+    @param browser: Selenium WebDriver instance used to control the browser.
+    @param yearIndex: Index of the year in the dropdown options.
+
+    @return: List[int] Indices of the department options, without `config.SHARD_SKIPPED_DEPARTMENT_OPTIONS`
+             and the options without a value.
+    """
+    yearSwitcher(browser, yearIndex)
+    options = browser.find_element(By.ID, config.DEPARTMENT_DROPDOWN_ID).find_elements(By.TAG_NAME, "option")
+    return [i for i, option in enumerate(options)
+            if i not in config.SHARD_SKIPPED_DEPARTMENT_OPTIONS and option.get_attribute("value")]
 
 
 def reset(browser: WebDriver) -> None:
@@ -112,7 +221,30 @@ def reset(browser: WebDriver) -> None:
     browser.find_element(By.CLASS_NAME, config.NEW_SEARCH_BUTTON_CLASS_NAME).click()
 
 
-def scrapingHandler(browser: WebDriver) -> None:
+def searchAndScrapeYear(browser: WebDriver, unit: ScrapeUnit, manifest: Optional[ScrapeManifest] = None,
+                        pipeline: Optional[ParsePipeline] = None) -> None:
+    """
+    Runs the whole search sequence of a single unit (a year, or a department
+    of a year): switches the year, sets the faculty, starts the search, scrapes
+    all pages and resets the form.
+
+    @param browser: Selenium WebDriver instance used to control the browser.
+    @param unit: The unit to scrape, its name is used for naming saved HTML files.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: None
+    """
+    yearSwitcher(browser, unit.yearIndex)
+    setFaculty(browser, unit.departmentIndex)
+    searchPage: Optional[WebElement] = getResultsElement(browser) if config.FAST_BROWSER else None
+    browser.find_element(By.ID, config.SEARCH_BUTTON_ID).click()
+    scrapeYear(browser, unit.name, manifest, pipeline, searchPage)
+    reset(browser)
+
+
+def scrapingHandler(browser: WebDriver, manifest: Optional[ScrapeManifest] = None,
+                    pipeline: Optional[ParsePipeline] = None) -> None:
     """
     Main handler function for scraping and saving pages.
 
@@ -130,17 +262,134 @@ def scrapingHandler(browser: WebDriver) -> None:
         - Scrape pages
         - Reset search
     
+    Years already saved according to the manifest are skipped, and an
+    unfinished year pages through its saved pages (the site has no way to
+    jump to a page) without saving them again. With
+    `config.SHARD_BY_DEPARTMENT` every department of a year is searched and
+    scraped on its own instead (see `scrape_units.getWantedUnits`).
+
+    A unit that fails is searched again from a fresh search page, up to
+    `config.SCRAPE_RETRIES` times, only saving the pages after its last saved
+    one if a manifest is given.
+
     @param browser: Selenium WebDriver instance used to control the browser.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
 
     @return: None
     """
     possibleYears: List[str] = getPossibleYears(browser)
-    wantedYears: List[str] = config.YEARS_TO_SCRAPE if config.YEARS_TO_SCRAPE is not None else possibleYears
-    yearsIndices: List[int] = [i for i in range(len(possibleYears)) if possibleYears[i] in wantedYears]
-
-    for i in yearsIndices:
-        yearSwitcher(browser, i)
-        setFaculty(browser)
-        browser.find_element(By.ID, config.SEARCH_BUTTON_ID).click()
-        scrapeYear(browser, possibleYears[i])
-        reset(browser)
+    yearsIndices: List[int] = scrape_units.getWantedYearsIndices(possibleYears, manifest)
+    scrape_units.submitCachedYears(possibleYears, yearsIndices, manifest, pipeline)
+    units: List[ScrapeUnit] = scrape_units.getWantedUnits(
+        possibleYears, yearsIndices, lambda i: getDepartmentsIndices(browser, i), manifest, pipeline)
+    scrape_units.scrapeUnits(units, lambda unit: searchAndScrapeYear(browser, unit, manifest, pipeline),
+                             lambda: browser.get(config.SITE_URL))
+
+
+def browserWorker(browserFactory: Callable[[], WebDriver], unitsQueue: "queue.Queue[Tuple[ScrapeUnit, int]]",
+                  failedYears: List[str], browser: Optional[WebDriver] = None,
+                  manifest: Optional[ScrapeManifest] = None, pipeline: Optional[ParsePipeline] = None) -> None:
+    """
+    Scrapes units (years or department shards) taken from a shared work queue
+    with its own browser session, until the queue is empty.
+
+    A unit that raises has its browser session discarded, a new session is
+    created for the next unit, so a crash does not affect the other units. The
+    unit is put back in the queue until it failed `config.SCRAPE_RETRIES` + 1
+    times, it is then recorded in `failedYears`.
+
+    @param browserFactory: Callable creating a new WebDriver instance on the search page.
+    @param unitsQueue: Queue of (unit, attempt) pairs left to scrape, the attempt counts from 0.
+    @param failedYears: List collecting the names of the units that failed.
+    @param browser: An already open WebDriver instance to start with, created with `browserFactory` if None.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: None
+    """
+    try:
+        while True:
+            try:
+                unit, attempt = unitsQueue.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                if browser is None:
+                    browser = browserFactory()
+                searchAndScrapeYear(browser, unit, manifest, pipeline)
+            except Exception as e:
+                if attempt < config.SCRAPE_RETRIES:
+                    logger.warning("Failed scraping %s, retrying: %r", unit.name, e)
+                    unitsQueue.put((unit, attempt + 1))
+                else:
+                    logger.error("Failed scraping %s: %r", unit.name, e)
+                    failedYears.append(unit.name)
+                if browser is not None:
+                    quitBrowser(browser)
+                    browser = None
+    finally:
+        if browser is not None:
+            quitBrowser(browser)
+
+
+def quitBrowser(browser: WebDriver) -> None:
+    """
+    Quits a WebDriver instance, ignoring errors of sessions that already crashed.
+
+    @param browser: Selenium WebDriver instance to quit.
+
+    @return: None
+    """
+    try:
+        browser.quit()
+    except Exception:
+        pass
+
+
+def concurrentScrapingHandler(browserFactory: Callable[[], WebDriver], poolSize: Optional[int] = None,
+                              manifest: Optional[ScrapeManifest] = None,
+                              pipeline: Optional[ParsePipeline] = None) -> List[str]:
+    """
+    Handler function for scraping and saving pages with several browsers at once.
+
+    Works like `scrapingHandler`, but the selected units (years, or department
+    shards with `config.SHARD_BY_DEPARTMENT`) are put in a work queue consumed
+    by a bounded pool of independent browser sessions, each one running the
+    whole search sequence of a unit (see `searchAndScrapeYear`). Pages are
+    saved under the same {unitName}-{pageNumber}.html naming.
+
+    @param browserFactory: Callable creating a new WebDriver instance on the search page,
+                           usually `main.setupBrowser`.
+    @param poolSize: Maximal number of browser sessions, defaults to `config.BROWSER_POOL_SIZE`.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: List[str] Names of the years (or shards) that failed, their pages may be incomplete.
+    """
+    poolSize = poolSize if poolSize is not None else config.BROWSER_POOL_SIZE
+
+    firstBrowser: WebDriver = browserFactory()
+    try:
+        possibleYears: List[str] = getPossibleYears(firstBrowser)
+        yearsIndices: List[int] = scrape_units.getWantedYearsIndices(possibleYears, manifest)
+        scrape_units.submitCachedYears(possibleYears, yearsIndices, manifest, pipeline)
+        units: List[ScrapeUnit] = scrape_units.getWantedUnits(possibleYears, yearsIndices,
+                                                 lambda i: getDepartmentsIndices(firstBrowser, i), manifest, pipeline)
+    except Exception:
+        quitBrowser(firstBrowser)
+        raise
+
+    unitsQueue: "queue.Queue[Tuple[ScrapeUnit, int]]" = queue.Queue()
+    for unit in units:
+        unitsQueue.put((unit, 0))
+
+    failedYears: List[str] = []
+    workersCount: int = max(1, min(poolSize, len(units)))
+    with ThreadPoolExecutor(max_workers=workersCount) as executor:
+        executor.submit(browserWorker, browserFactory, unitsQueue, failedYears, firstBrowser, manifest, pipeline)
+        for _ in range(workersCount - 1):
+            executor.submit(browserWorker, browserFactory, unitsQueue, failedYears, None, manifest, pipeline)
+
+    return failedYears
@@ -0,0 +1,373 @@
+"""Module for scraping and saving locally pages data by replaying the website's form postbacks over HTTP, without a browser."""
+
+import config, metrics, page_store, scrape_units
+from scrape_manifest import ScrapeManifest
+from scrape_units import ScrapeUnit
+from pipeline import ParsePipeline
+import logging, re, time
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html
+from lxml.html import FormElement, HtmlElement
+
+POSTBACK_REGEX = re.compile(r"__doPostBack\('([^']*)',\s*'([^']*)'\)")  # ASP.NET javascript postback call
+
+FormFields = List[Tuple[str, str]]
+
+logger = logging.getLogger(__name__)
+
+
+class FormPage:
+    """
+    A page returned by the website, with its parsed document and the state of its form.
+    """
+
+    def __init__(self, response: requests.Response):
+        self.url: str = response.url
+        if "charset" in response.headers.get("Content-Type", "").lower():
+            self.document: HtmlElement = html.fromstring(response.text, base_url=self.url)
+        else:  # Let lxml detect the encoding from the page's meta tag
+            self.document: HtmlElement = html.fromstring(response.content, base_url=self.url)
+
+    def getElement(self, elementId: str) -> Optional[HtmlElement]:
+        """
+        Finds an element of the page by its id.
+
+        @param elementId: The id attribute of the wanted element.
+
+        @return: The element, or None if the page does not contain it.
+        """
+        elements: List[HtmlElement] = self.document.xpath("//*[@id=$elementId]", elementId=elementId)
+        return elements[0] if elements else None
+
+    def getForm(self) -> FormElement:
+        """
+        Returns the page's form, ASP.NET pages wrap all their controls in a single form.
+
+        @return: FormElement The first form of the page.
+        """
+        return self.document.forms[0]
+
+
+def createSession() -> requests.Session:
+    """
+    Creates the HTTP session used for all the requests of a scraping run.
+
+    The session keeps the site cookies between postbacks and reuses its
+    connections, up to `config.HTTP_POOL_SIZE` of them, retrying failed
+    connections `config.HTTP_MAX_RETRIES` times.
+
+    @return: requests.Session A configured session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=config.HTTP_POOL_SIZE, max_retries=config.HTTP_MAX_RETRIES)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = config.HTTP_USER_AGENT
+    return session
+
+
+def openSearchPage(session: requests.Session, siteUrl: str) -> FormPage:
+    """
+    Loads a fresh search page.
+
+    @param session: HTTP session used for the request.
+    @param siteUrl: The URL of the search page.
+
+    @return: FormPage The search page.
+    """
+    response = session.get(siteUrl, timeout=config.TIMEOUT_FOR_SCRAPING)
+    response.raise_for_status()
+    return FormPage(response)
+
+
+def setField(fields: FormFields, name: str, value: str) -> FormFields:
+    """
+    Sets the value of a form field, replacing any previous value of it.
+
+    @param fields: The form fields to update.
+    @param name: The name of the field.
+    @param value: The new value of the field.
+
+    @return: FormFields The updated form fields.
+    """
+    return [(fieldName, fieldValue) for fieldName, fieldValue in fields if fieldName != name] + [(name, value)]
+
+
+def getOptions(select: HtmlElement) -> List[HtmlElement]:
+    """
+    Returns the option elements of a dropdown, in their display order.
+
+    @param select: The select element of the dropdown.
+
+    @return: List[HtmlElement] The option elements.
+    """
+    return select.xpath(".//option")
+
+
+def getOptionValue(option: HtmlElement) -> str:
+    """
+    Returns the value a dropdown option submits, which is its text if it has no value attribute.
+
+    @param option: The option element.
+
+    @return: str The submitted value.
+    """
+    value: Optional[str] = option.get("value")
+    return value if value is not None else option.text_content().strip()
+
+
+def isClickable(element: HtmlElement) -> bool:
+    """
+    Checks whether a button would be clickable in a browser, meaning it is not disabled or hidden.
+
+    @param element: The button element.
+
+    @return: bool True if the button can be clicked.
+    """
+    style: str = (element.get("style") or "").replace(" ", "").lower()
+    return element.get("disabled") is None and "display:none" not in style and "visibility:hidden" not in style
+
+
+def submit(session: requests.Session, page: FormPage, fields: FormFields) -> FormPage:
+    """
+    Posts the page's form with the given fields, like the browser does on a postback.
+
+    @param session: HTTP session used for the request.
+    @param page: The page whose form is submitted.
+    @param fields: The fields to post.
+
+    @return: FormPage The page returned by the postback.
+    """
+    form: FormElement = page.getForm()
+    action: str = form.action or page.url
+    response = session.post(action, data=fields, timeout=config.TIMEOUT_FOR_SCRAPING)
+    response.raise_for_status()
+    return FormPage(response)
+
+
+def click(session: requests.Session, page: FormPage, button: HtmlElement, fields: Optional[FormFields] = None) -> FormPage:
+    """
+    Replays a click on a button of the page's form.
+
+    Submit buttons add their own name and value to the posted fields, buttons
+    and links that call `__doPostBack` set the hidden `__EVENTTARGET` and
+    `__EVENTARGUMENT` fields instead.
+
+    @param session: HTTP session used for the request.
+    @param page: The page containing the button.
+    @param button: The clicked button element.
+    @param fields: The form fields to post, defaults to the current state of the page's form.
+
+    @return: FormPage The page returned by the postback.
+    """
+    fields = fields if fields is not None else list(page.getForm().form_values())
+    postback = POSTBACK_REGEX.search((button.get("href") or "") + (button.get("onclick") or ""))
+    if postback:
+        fields = setField(fields, "__EVENTTARGET", postback.group(1))
+        fields = setField(fields, "__EVENTARGUMENT", postback.group(2))
+    elif button.get("type", "").lower() == "image":
+        fields = fields + [(f"{button.get('name')}.x", "1"), (f"{button.get('name')}.y", "1")]
+    elif button.get("name"):
+        fields = fields + [(button.get("name"), button.get("value", ""))]
+    return submit(session, page, fields)
+
+
+def selectOption(session: requests.Session, page: FormPage, selectId: str, optionIndex: int,
+                 fields: Optional[FormFields] = None) -> Tuple[FormPage, FormFields]:
+    """
+    Selects an option of a dropdown in the page's form.
+
+    If the dropdown posts back on change (ASP.NET AutoPostBack) the postback is
+    replayed and the returned page is the new state, otherwise only the form
+    fields are updated.
+
+    @param session: HTTP session used for the request.
+    @param page: The page containing the dropdown.
+    @param selectId: The id of the dropdown.
+    @param optionIndex: Index of the wanted option in the dropdown.
+    @param fields: The form fields to update, defaults to the current state of the page's form.
+
+    @return: Tuple of (page, fields), the current page and its form fields with the option selected.
+    """
+    select: HtmlElement = page.getElement(selectId)
+    value: str = getOptionValue(getOptions(select)[optionIndex])
+    fields = fields if fields is not None else list(page.getForm().form_values())
+    fields = setField(fields, select.name, value)
+
+    if POSTBACK_REGEX.search(select.get("onchange") or ""):
+        fields = setField(fields, "__EVENTTARGET", select.name)
+        fields = setField(fields, "__EVENTARGUMENT", "")
+        page = submit(session, page, fields)
+        fields = list(page.getForm().form_values())
+    return page, fields
+
+
+def normalizeTables(document: HtmlElement) -> None:
+    """
+    Wraps table rows that are direct children of a table in a <tbody>, in place.
+
+    Browsers insert the <tbody> while building the DOM, so `browser.page_source`
+    always contains it and `parse_pages` relies on it. The raw HTML served by the
+    site may omit it, so it is added here to save the same structure.
+
+    @param document: The parsed page.
+
+    @return: None
+    """
+    for table in list(document.iter("table")):
+        tbody: Optional[HtmlElement] = None
+        for child in list(table):
+            if child.tag == "tr":
+                if tbody is None:
+                    tbody = html.Element("tbody")
+                    child.addprevious(tbody)
+                tbody.append(child)
+            elif child.tag in ("tbody", "thead", "tfoot"):
+                tbody = None
+
+
+def savePage(page: FormPage, yearName: str, pageNumber: int, manifest: Optional[ScrapeManifest] = None,
+             pipeline: Optional[ParsePipeline] = None) -> None:
+    """
+    Saves a results page under the same naming and structure as the browser engine.
+
+    @param page: The results page.
+    @param yearName: Name of the academic year of the page.
+    @param pageNumber: Index of the page inside the year's results.
+    @param manifest: Manifest recording the saved page, if any.
+    @param pipeline: Parsing pipeline receiving the page, if any.
+
+    @return: None
+    """
+    normalizeTables(page.document)
+    pageSource: str = html.tostring(page.document, encoding="unicode", method="html")
+    scrape_units.savePage(yearName, pageNumber, pageSource, manifest, pipeline)
+
+
+def getPossibleYears(page: FormPage) -> List[str]:
+    """
+    Retrieves all possible academic years available on the website.
+
+    @param page: The search page.
+
+    @return: List[str] List of available academic years.
+    """
+    years: List[HtmlElement] = getOptions(page.getElement(config.YEAR_DROPDOWN_ID))
+    return [''.join(re.findall(r'\d', year.text_content()))[4::] for year in years]
+
+
+def scrapeYear(session: requests.Session, page: FormPage, yearName: str, manifest: Optional[ScrapeManifest] = None,
+               pipeline: Optional[ParsePipeline] = None) -> None:
+    """
+    Scrapes all pages for a given academic year and saves the HTMLs locally.
+
+    Replays the "next page" button (configured in `config.NEXT_PAGE_BUTTON_ID`)
+    postback until the button is no longer available. Like `scrape_data.scrapeYear`,
+    pages the manifest already holds are not saved again (but read back for the
+    pipeline) and the year is marked as finished once its last page was saved.
+    The time every "next page" postback took is recorded in the run's metrics.
+
+    @param session: HTTP session used for the requests.
+    @param page: The first results page of the year.
+    @param yearName: Name of the academic year, used for naming saved HTML files.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: None
+    """
+    startPage: int = manifest.savedPages(yearName) if manifest is not None else 0
+    pageNumber = 0
+    while True:
+        if pageNumber >= startPage:
+            savePage(page, yearName, pageNumber, manifest, pipeline)
+        elif pipeline is not None:
+            pipeline.submitSavedPage(yearName, pageNumber)
+
+        nextButton: Optional[HtmlElement] = page.getElement(config.NEXT_PAGE_BUTTON_ID)
+        if nextButton is None or not isClickable(nextButton):
+            break
+        clickedAt: float = time.perf_counter()
+        page = click(session, page, nextButton)
+        pageNumber += 1
+        metrics.getRunMetrics().pageRendered(page_store.pageName(yearName, pageNumber), None,
+                                             time.perf_counter() - clickedAt)
+
+    if manifest is not None:
+        manifest.yearFinished(yearName, pageNumber + 1)
+
+
+def searchYear(session: requests.Session, page: FormPage, yearIndex: int, departmentIndex: Optional[int] = None) -> FormPage:
+    """
+    Selects the year and the faculty in the search form and submits the search.
+
+    @param session: HTTP session used for the requests.
+    @param page: A fresh search page.
+    @param yearIndex: Index of the desired year in the dropdown options.
+    @param departmentIndex: Index of the desired department option, defaults to `config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX`.
+
+    @return: FormPage The first results page of the year.
+    """
+    departmentIndex = departmentIndex if departmentIndex is not None else config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX
+    page, fields = selectOption(session, page, config.YEAR_DROPDOWN_ID, yearIndex)
+    page, fields = selectOption(session, page, config.DEPARTMENT_DROPDOWN_ID, departmentIndex, fields)
+    return click(session, page, page.getElement(config.SEARCH_BUTTON_ID), fields)
+
+
+def getDepartmentsIndices(session: requests.Session, siteUrl: str, yearIndex: int) -> List[int]:
+    """
+    Lists the departments of a year, like `scrape_data.getDepartmentsIndices`.
+
+    @param session: HTTP session used for the requests.
+    @param siteUrl: The URL of the search page.
+    @param yearIndex: Index of the year in the dropdown options.
+
+    @return: List[int] Indices of the department options, without `config.SHARD_SKIPPED_DEPARTMENT_OPTIONS`
+             and the options without a value.
+    """
+    page, _ = selectOption(session, openSearchPage(session, siteUrl), config.YEAR_DROPDOWN_ID, yearIndex)
+    options: List[HtmlElement] = getOptions(page.getElement(config.DEPARTMENT_DROPDOWN_ID))
+    return [i for i, option in enumerate(options)
+            if i not in config.SHARD_SKIPPED_DEPARTMENT_OPTIONS and option.get("value")]
+
+
+def scrapingHandler(siteUrl: Optional[str] = None, manifest: Optional[ScrapeManifest] = None,
+                    pipeline: Optional[ParsePipeline] = None) -> None:
+    """
+    Main handler function for scraping and saving pages over HTTP.
+
+    Works like `scrape_data.scrapingHandler` but posts the search form fields
+    (year, department, next page and the hidden ASP.NET state fields) directly
+    instead of driving a browser.
+
+    Workflow:
+     1. Collect possible years from the search page.
+     2. Filter them according to config settings, and split them into
+        department shards if `config.SHARD_BY_DEPARTMENT` is True.
+     3. For each selected year (or shard):
+        - Load a fresh search page
+        - Select year and faculty and search
+        - Scrape pages, retrying up to `config.SCRAPE_RETRIES` times
+
+    @param siteUrl: The URL of the search page, defaults to `config.SITE_URL`.
+                    Can point to a local stand-in of the site, like `tests/fake_site.py`.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: None
+    """
+    siteUrl = siteUrl if siteUrl is not None else config.SITE_URL
+    with createSession() as session:
+        possibleYears: List[str] = getPossibleYears(openSearchPage(session, siteUrl))
+        yearsIndices: List[int] = scrape_units.getWantedYearsIndices(possibleYears, manifest)
+        scrape_units.submitCachedYears(possibleYears, yearsIndices, manifest, pipeline)
+        units: List[ScrapeUnit] = scrape_units.getWantedUnits(
+            possibleYears, yearsIndices, lambda i: getDepartmentsIndices(session, siteUrl, i), manifest, pipeline)
+
+        def scrapeUnit(unit: ScrapeUnit) -> None:
+            page: FormPage = searchYear(session, openSearchPage(session, siteUrl), unit.yearIndex, unit.departmentIndex)
+            scrapeYear(session, page, unit.name, manifest, pipeline)
+
+        scrape_units.scrapeUnits(units, scrapeUnit)
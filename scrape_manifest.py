@@ -0,0 +1,238 @@
+"""Module for tracking the scraping progress of every year, so interrupted runs can be resumed and past years reused."""
+
+import config, page_store
+import json, os, threading
+from typing import Dict, List, Optional
+
+
+class ScrapeManifest:
+    """
+    Records, for each year, the pages saved into `config.TMP_FOLDER_NAME`, the
+    expected page count and whether the year finished.
+
+    The manifest is stored inside the temporary folder as an append-only log of
+    JSON lines, so it survives a crash of the browser or of the whole run: a
+    snapshot of the whole manifest, followed by an entry per saved page and
+    finished year. The log is replayed and compacted into a single snapshot
+    when the manifest is opened. All methods are thread safe.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path: str = path if path is not None else os.path.join(config.TMP_FOLDER_NAME, config.MANIFEST_FILE_NAME)
+        self.lock = threading.Lock()
+        self.runFinished: bool = False
+        self.years: Dict[str, Dict] = {}
+
+        if os.path.exists(self.path):
+            self.load()
+
+    def load(self) -> None:
+        """
+        Replays the log, and rewrites it as a single snapshot if it has entries after the snapshot.
+
+        @return: None
+        """
+        linesCount: int = 0
+        truncated: bool = False
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry: Dict = json.loads(line)
+                except json.JSONDecodeError:  # The last line of a run killed while appending it
+                    truncated = True
+                    break
+                if entry["type"] == "snapshot":
+                    self.runFinished = entry["runFinished"]
+                    self.years = entry["years"]
+                elif entry["type"] == "page":
+                    year: Dict = self.getYear(entry["year"])
+                    if entry["page"] not in year["pages"]:
+                        year["pages"].append(entry["page"])
+                elif entry["type"] == "year":
+                    year: Dict = self.getYear(entry["year"])
+                    year["expectedPages"] = entry["pages"]
+                    year["complete"] = True
+                elif entry["type"] == "runFinished":
+                    self.runFinished = True
+                linesCount += 1
+
+        if linesCount != 1 or truncated:
+            self.save()
+
+    def save(self) -> None:
+        """
+        Writes a snapshot of the manifest to disk, replacing the previous log atomically.
+
+        Must be called while holding `self.lock`, except from `load`.
+
+        @return: None
+        """
+        tmpPath: str = self.path + ".tmp"
+        with open(tmpPath, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"type": "snapshot", "runFinished": self.runFinished, "years": self.years},
+                                  ensure_ascii=False) + "\n")
+        os.replace(tmpPath, self.path)
+
+    def appendEntry(self, entry: Dict) -> None:
+        """
+        Appends an entry to the log.
+
+        Must be called while holding `self.lock`.
+
+        @param entry: The entry, its "type" is "page", "year" or "runFinished".
+
+        @return: None
+        """
+        if not os.path.exists(self.path):  # The log starts with a snapshot
+            self.save()
+            return
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def getYear(self, yearName: str) -> Dict:
+        """
+        Returns the record of a year, creating an empty one if needed.
+
+        Must be called while holding `self.lock`.
+
+        @param yearName: Name of the academic year.
+
+        @return: Dict The year's record, with the keys "pages", "expectedPages" and "complete".
+        """
+        return self.years.setdefault(yearName, {"pages": [], "expectedPages": None, "complete": False})
+
+    def startRun(self, possibleYears: List[str]) -> None:
+        """
+        Prepares the manifest for a scraping run.
+
+        If the previous run did not finish, it is resumed as is. Otherwise this is a
+        new run, and the years in `config.RESCRAPE_YEARS` are invalidated (by default
+        only the newest year available, since past academic years never change),
+        with all their department shards, see `invalidate`.
+
+        @param possibleYears: List of the academic years available on the website.
+
+        @return: None
+        """
+        with self.lock:
+            if self.runFinished:
+                rescrapeYears: List[str] = config.RESCRAPE_YEARS
+                if rescrapeYears is None:
+                    rescrapeYears = [max(possibleYears)] if possibleYears else []
+                self.removeYears(rescrapeYears)
+            self.runFinished = False
+            self.save()
+
+    def finishRun(self) -> None:
+        """
+        Marks the scraping run as finished, the next run will be a new one.
+
+        @return: None
+        """
+        with self.lock:
+            self.runFinished = True
+            self.appendEntry({"type": "runFinished"})
+
+    def invalidate(self, years: Optional[List[str]] = None) -> None:
+        """
+        Forgets the cached pages of the given years and of their department
+        shards and deletes them from the page store, so they are scraped again
+        (and a year that lost pages on the site does not keep its old last pages).
+
+        @param years: Names of the years to invalidate, all of them if None.
+
+        @return: None
+        """
+        with self.lock:
+            self.removeYears(years)
+            self.save()
+
+    def removeYears(self, years: Optional[List[str]]) -> None:
+        """
+        Drops the records of the given years and of their department shards, and deletes their saved pages.
+
+        Must be called while holding `self.lock`.
+
+        @param years: Names of the years, all of them if None.
+
+        @return: None
+        """
+        for name in list(self.years):
+            if years is None or page_store.unitYear(name) in years:
+                del self.years[name]
+        store: page_store.PageStore = page_store.getPageStore()
+        for name in store.names():
+            if years is None or page_store.unitYear(name) in years:
+                store.remove(name)
+
+    def pageSaved(self, yearName: str, pageNumber: int) -> None:
+        """
+        Records that a page of a year was saved.
+
+        @param yearName: Name of the academic year.
+        @param pageNumber: Index of the saved page.
+
+        @return: None
+        """
+        with self.lock:
+            year: Dict = self.getYear(yearName)
+            if pageNumber not in year["pages"]:
+                year["pages"].append(pageNumber)
+            self.appendEntry({"type": "page", "year": yearName, "page": pageNumber})
+
+    def yearFinished(self, yearName: str, pagesCount: int) -> None:
+        """
+        Records that all the pages of a year were saved.
+
+        @param yearName: Name of the academic year.
+        @param pagesCount: Number of pages the year has.
+
+        @return: None
+        """
+        with self.lock:
+            year: Dict = self.getYear(yearName)
+            year["expectedPages"] = pagesCount
+            year["complete"] = True
+            self.appendEntry({"type": "year", "year": yearName, "pages": pagesCount})
+
+    def savedPages(self, yearName: str) -> int:
+        """
+        Counts the pages of a year that were saved and are still on disk,
+        contiguously from the first page.
+
+        @param yearName: Name of the academic year.
+
+        @return: int Index of the first page that has to be scraped again.
+        """
+        with self.lock:
+            pages: List[int] = self.years.get(yearName, {}).get("pages", [])
+        store: page_store.PageStore = page_store.getPageStore()
+        pageNumber: int = 0
+        while pageNumber in pages and store.exists(page_store.pageName(yearName, pageNumber)):
+            pageNumber += 1
+        return pageNumber
+
+    def isYearComplete(self, yearName: str) -> bool:
+        """
+        Checks whether all the pages of a year were saved and are still on disk.
+
+        @param yearName: Name of the academic year.
+
+        @return: bool True if the year does not need to be scraped.
+        """
+        with self.lock:
+            year: Dict = self.years.get(yearName, {})
+            if not year.get("complete"):
+                return False
+            expectedPages: int = year["expectedPages"]
+        return self.savedPages(yearName) >= expectedPages
+
+    def remove(self) -> None:
+        """
+        Deletes the manifest file.
+
+        @return: None
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
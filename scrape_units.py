@@ -0,0 +1,173 @@
+"""Module for the parts of scraping shared by the scraping engines: the units of work, saving the pages and retrying.
+
+It does not depend on Selenium, so the HTTP engine (`scrape_http`) runs without it.
+"""
+
+import config, metrics, page_store
+from scrape_manifest import ScrapeManifest
+from pipeline import ParsePipeline
+import logging
+from typing import Callable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeUnit(NamedTuple):
+    """
+    A unit of scraping work: all the results of a year, or with `config.SHARD_BY_DEPARTMENT`
+    the results of a single department of a year.
+    """
+    yearIndex: int  # Index of the year in the year dropdown
+    yearName: str  # Name of the academic year
+    departmentIndex: int  # Index of the option selected in the department dropdown
+    name: str  # Name under which the unit's pages are saved and tracked by the manifest, the year's name or `page_store.shardName`
+
+
+def savePage(yearName: str, pageNumber: int, html: str, manifest: Optional[ScrapeManifest] = None,
+             pipeline: Optional[ParsePipeline] = None) -> None:
+    """
+    Saves a page's HTML source into the temporary folder defined by
+    `config.TMP_FOLDER_NAME`, through the page store selected by `config.PAGE_STORE`,
+    under the name:
+        {yearName}-{pageNumber}.html
+
+    If a parsing pipeline is given, the page is handed to it instead, and only
+    saved as an archive when `config.KEEP_TMP_FOLDER` is True.
+
+    The page's size is recorded in the run's metrics.
+
+    @param yearName: Name of the academic year of the page.
+    @param pageNumber: Index of the page inside the year's results.
+    @param html: HTML source of the page.
+    @param manifest: Manifest recording the saved page, if any.
+    @param pipeline: Parsing pipeline receiving the page, if any.
+
+    @return: None
+    """
+    metrics.getRunMetrics().pageScraped(page_store.pageName(yearName, pageNumber), len(html.encode("utf-8")))
+    if pipeline is not None:
+        pipeline.submitPage(yearName, pageNumber, html)
+        if not config.KEEP_TMP_FOLDER:
+            return
+
+    page_store.getPageStore().save(page_store.pageName(yearName, pageNumber), html)
+    if manifest is not None:
+        manifest.pageSaved(yearName, pageNumber)
+
+
+def getWantedYearsIndices(possibleYears: List[str], manifest: Optional[ScrapeManifest] = None) -> List[int]:
+    """
+    Filters the possible years according to `config.YEARS_TO_SCRAPE`.
+
+    If a manifest is given, the scraping run is started on it and years whose
+    pages are all already saved are left out.
+
+    @param possibleYears: List of the academic years available on the website,
+                          in the order of the year dropdown.
+    @param manifest: Manifest recording the scraping progress, if any.
+
+    @return: List[int] Indices in the year dropdown of the years to scrape.
+    """
+    wantedYears: List[str] = config.YEARS_TO_SCRAPE if config.YEARS_TO_SCRAPE is not None else possibleYears
+    yearsIndices: List[int] = [i for i in range(len(possibleYears)) if possibleYears[i] in wantedYears]
+    if manifest is None:
+        return yearsIndices
+
+    manifest.startRun(possibleYears)
+    return [i for i in yearsIndices if not manifest.isYearComplete(possibleYears[i])]
+
+
+def submitCachedYears(possibleYears: List[str], yearsIndices: List[int], manifest: Optional[ScrapeManifest],
+                      pipeline: Optional[ParsePipeline]) -> None:
+    """
+    Hands the saved pages of the wanted years that are not scraped again (see
+    `getWantedYearsIndices`) to the parsing pipeline.
+
+    @param possibleYears: List of the academic years available on the website.
+    @param yearsIndices: Indices of the years that are scraped.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: None
+    """
+    if manifest is None or pipeline is None:
+        return
+    for i in getWantedYearsIndices(possibleYears):
+        if i not in yearsIndices:
+            submitSavedPages(possibleYears[i], manifest, pipeline)
+
+
+def submitSavedPages(name: str, manifest: ScrapeManifest, pipeline: Optional[ParsePipeline]) -> None:
+    """
+    Hands the saved pages of a year or shard to the parsing pipeline.
+
+    @param name: Name of the year or shard.
+    @param manifest: Manifest recording the scraping progress.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: None
+    """
+    if pipeline is None:
+        return
+    for pageNumber in range(manifest.savedPages(name)):
+        pipeline.submitSavedPage(name, pageNumber)
+
+
+def getWantedUnits(possibleYears: List[str], yearsIndices: List[int], listDepartments: Callable[[int], List[int]],
+                   manifest: Optional[ScrapeManifest] = None, pipeline: Optional[ParsePipeline] = None) -> List[ScrapeUnit]:
+    """
+    Splits the years to scrape into units of work.
+
+    Without `config.SHARD_BY_DEPARTMENT` every year is a single unit, searched
+    with `config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX`. Otherwise every
+    department of a year is its own unit, with its own pages (see
+    `page_store.shardName`), and shards whose pages are all already saved are
+    left out (their pages are handed to the pipeline, if any).
+
+    @param possibleYears: List of the academic years available on the website.
+    @param yearsIndices: Indices of the years to scrape, see `getWantedYearsIndices`.
+    @param listDepartments: Callable returning the department option indices of a year index,
+                            like `scrape_data.getDepartmentsIndices`, only called when sharding.
+    @param manifest: Manifest recording the scraping progress, if any.
+    @param pipeline: Parsing pipeline receiving the pages, if any.
+
+    @return: List[ScrapeUnit] The units to scrape.
+    """
+    if not config.SHARD_BY_DEPARTMENT:
+        return [ScrapeUnit(i, possibleYears[i], config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX, possibleYears[i])
+                for i in yearsIndices]
+
+    units: List[ScrapeUnit] = []
+    for i in yearsIndices:
+        for departmentIndex in listDepartments(i):
+            unit = ScrapeUnit(i, possibleYears[i], departmentIndex, page_store.shardName(possibleYears[i], departmentIndex))
+            if manifest is not None and manifest.isYearComplete(unit.name):
+                submitSavedPages(unit.name, manifest, pipeline)
+            else:
+                units.append(unit)
+    return units
+
+
+def scrapeUnits(units: List[ScrapeUnit], scrapeUnit: Callable[[ScrapeUnit], None],
+                restart: Optional[Callable[[], None]] = None) -> None:
+    """
+    Scrapes units one after the other. A unit that fails is scraped again, up
+    to `config.SCRAPE_RETRIES` times, before its error is raised.
+
+    @param units: The units to scrape, see `getWantedUnits`.
+    @param scrapeUnit: Callable running the whole search sequence of a unit.
+    @param restart: Callable bringing the scraper back to the search page after a failure, if needed.
+
+    @return: None
+    """
+    for unit in units:
+        for attempt in range(config.SCRAPE_RETRIES + 1):
+            try:
+                scrapeUnit(unit)
+                break
+            except Exception as e:
+                if attempt == config.SCRAPE_RETRIES:
+                    raise
+                logger.warning("Failed scraping %s, retrying: %r", unit.name, e)
+                if restart is not None:
+                    restart()
@@ -0,0 +1,264 @@
+"""Module for the trigram search index over the course names and instructors, answering fuzzy Hebrew queries."""
+
+import config
+from course_data import CourseData
+
+import mmap, os, re, struct
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+MAGIC: bytes = b"CSTRGM01"  # The first bytes of an index file, with the version of the format
+FIELDS: Tuple[str, ...] = ("Name", "Instructor")  # The indexed fields of the courses
+SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ("trigrams", "<u8"),            # The sorted trigram codes, see `trigrams`
+    ("postingStarts", "<u4"),       # For every trigram, the start of its entries in "postings" (plus the end)
+    ("postings", "<u4"),            # The entries containing every trigram
+    ("entryFields", "u1"),          # For every entry, the index of its field in `FIELDS`
+    ("entryTrigramCounts", "<u2"),  # For every entry, its number of distinct trigrams
+    ("entryTextStarts", "<u4"),     # For every entry, the start of its text in "strings" (plus the end)
+    ("entryCourseStarts", "<u4"),   # For every entry, the start of its courses in "entryCourses" (plus the end)
+    ("entryCourses", "<u4"),        # The courses of every entry
+    ("courseTextStarts", "<u4"),    # For every course, the start of its key in "strings" (plus the end)
+    ("strings", "u1"),              # The UTF-8 texts of the entries and the keys of the courses
+)  # The arrays stored in an index file, in order
+HEADER = struct.Struct(f"<8s{2 * len(SECTIONS)}Q")  # The magic, then the offset and length of every section
+
+NORMALIZE_TABLE: Dict[int, Optional[str]] = {
+    **{codePoint: None for codePoint in range(0x0591, 0x05C8)},  # Niqqud and cantillation marks
+    0x05BE: " ", 0x05C0: " ", 0x05C3: " ", 0x05C6: " ",  # Maqaf, paseq, sof pasuq and nun hafukha
+    **{ord(character): None for character in "׳״'\"`´‘’“”"},  # Geresh, gershayim and the quotes typed instead
+    **{ord(final): regular for final, regular in zip("ךםןףץ", "כמנפצ")},  # Final letters
+    0xA0: " ",
+}
+NON_WORD_REGEX = re.compile(r"[\W_]+")
+
+
+class SearchResult(NamedTuple):
+    """A text matching a query, with the courses it belongs to."""
+    score: float  # Fraction of the query's trigrams found in the text
+    field: str
+    text: str
+    courses: List[Tuple[str, str, str]]  # The (Year, Number, Group) of the courses
+
+
+def normalizeText(text: str) -> str:
+    """
+    Normalizes Hebrew text for searching: removes niqqud, geresh, gershayim and
+    quotes, replaces final letters by regular ones, lower cases the text and
+    keeps only words separated by single spaces.
+
+    @param text: The text.
+
+    @return: str The normalized text.
+    """
+    return NON_WORD_REGEX.sub(" ", text.translate(NORMALIZE_TABLE).lower()).strip()
+
+
+def trigrams(text: str, prefix: bool = False) -> Set[int]:
+    """
+    Returns the trigrams of a text, each packed into an int of three 21 bit code points.
+
+    Every word of the normalized text is padded by two spaces at its start and
+    one at its end, so short words and word boundaries have trigrams too.
+
+    @param text: The text.
+    @param prefix: Whether the last word may be incomplete, like in a query typed so far, it is then not padded at its end.
+
+    @return: Set[int] The trigram codes.
+    """
+    codes: Set[int] = set()
+    words: List[str] = normalizeText(text).split()
+    for index, word in enumerate(words):
+        padded: str = "  " + word + ("" if prefix and index == len(words) - 1 else " ")
+        for position in range(len(padded) - 2):
+            codes.add(ord(padded[position]) << 42 | ord(padded[position + 1]) << 21 | ord(padded[position + 2]))
+    return codes
+
+
+class SearchIndexBuilder:
+    """
+    Collects the names and instructors of the courses and writes them as a search index file.
+
+    An entry of the index is a distinct text of a field, like a course name,
+    with the list of the courses it appears in.
+    """
+
+    def __init__(self):
+        self.entries: Dict[Tuple[int, str], List[int]] = {}
+        self.courseKeys: List[str] = []
+
+    def addCourses(self, coursesData: Iterable[CourseData]) -> None:
+        """
+        Adds courses to the index.
+
+        @param coursesData: The courses.
+
+        @return: None
+        """
+        for course in coursesData:
+            courseIndex: int = len(self.courseKeys)
+            self.courseKeys.append(f"{course.Year or ''}\t{course.Number or ''}\t{course.Group or ''}")
+            for fieldIndex, texts in enumerate(([course.Name] if course.Name else [], course.Instructor)):
+                for text in dict.fromkeys(texts):
+                    if text and text.strip():
+                        self.entries.setdefault((fieldIndex, text.strip()), []).append(courseIndex)
+
+    def write(self, path: Optional[str] = None) -> None:
+        """
+        Writes the index file, replacing the previous one atomically.
+
+        @param path: Path of the index file, defaults to `config.SEARCH_INDEX_FILE_NAME`.
+
+        @return: None
+        """
+        path = path if path is not None else config.SEARCH_INDEX_FILE_NAME
+        strings = bytearray()
+        entryFields: List[int] = []
+        entryTrigramCounts: List[int] = []
+        entryTextStarts: List[int] = []
+        entryCourseStarts: List[int] = [0]
+        entryCourses: List[int] = []
+        postingLists: Dict[int, List[int]] = {}
+
+        for entryIndex, ((fieldIndex, text), courses) in enumerate(self.entries.items()):
+            codes: Set[int] = trigrams(text)
+            for code in codes:
+                postingLists.setdefault(code, []).append(entryIndex)
+            entryFields.append(fieldIndex)
+            entryTrigramCounts.append(min(len(codes), 0xFFFF))
+            entryTextStarts.append(len(strings))
+            strings += text.encode("utf-8")
+            entryCourses.extend(courses)
+            entryCourseStarts.append(len(entryCourses))
+        entryTextStarts.append(len(strings))
+        courseTextStarts: List[int] = []
+        for courseKey in self.courseKeys:
+            courseTextStarts.append(len(strings))
+            strings += courseKey.encode("utf-8")
+        courseTextStarts.append(len(strings))
+
+        codes: List[int] = sorted(postingLists)
+        postingStarts: List[int] = [0]
+        postings: List[int] = []
+        for code in codes:
+            postings.extend(postingLists[code])
+            postingStarts.append(len(postings))
+
+        arrays: Dict[str, list] = {
+            "trigrams": codes, "postingStarts": postingStarts, "postings": postings, "entryFields": entryFields,
+            "entryTrigramCounts": entryTrigramCounts, "entryTextStarts": entryTextStarts,
+            "entryCourseStarts": entryCourseStarts, "entryCourses": entryCourses, "courseTextStarts": courseTextStarts,
+        }
+        sections: List[bytes] = [bytes(strings) if name == "strings" else np.array(arrays[name], dtype=dtype).tobytes()
+                                 for name, dtype in SECTIONS]
+        header: List[int] = []
+        offset: int = HEADER.size
+        for (name, dtype), section in zip(SECTIONS, sections):
+            offset += -offset % 8  # Aligned, so the sections can be viewed in place
+            header += [offset, len(section) // np.dtype(dtype).itemsize]
+            offset += len(section)
+
+        with open(path + ".tmp", "wb") as file:
+            file.write(HEADER.pack(MAGIC, *header))
+            for sectionOffset, section in zip(header[::2], sections):
+                file.write(b"\0" * (sectionOffset - file.tell()))
+                file.write(section)
+        os.replace(path + ".tmp", path)
+
+
+class SearchIndex:
+    """
+    A search index file, memory mapped: opening it only reads its header, and
+    queries only touch the pages of the trigrams and entries they need.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        path = path if path is not None else config.SEARCH_INDEX_FILE_NAME
+        with open(path, "rb") as file:
+            self.buffer: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *header = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            self.buffer.close()
+            raise ValueError(f"{path} is not a search index of this version")
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset)
+            for (name, dtype), offset, count in zip(SECTIONS, header[::2], header[1::2])
+        }
+
+    def __len__(self) -> int:
+        return len(self.arrays["entryFields"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmaps the index file.
+
+        @return: None
+        """
+        self.arrays = {}
+        self.buffer.close()
+
+    def getString(self, starts: np.ndarray, index: int) -> str:
+        """
+        Decodes a text of the "strings" section.
+
+        @param starts: The starts array of the text, "entryTextStarts" or "courseTextStarts".
+        @param index: Index of the text in the starts array.
+
+        @return: str The text.
+        """
+        return self.arrays["strings"][starts[index]:starts[index + 1]].tobytes().decode("utf-8")
+
+    def search(self, query: str, field: Optional[str] = None, limit: int = 10, minScore: float = 0.5) -> List[SearchResult]:
+        """
+        Finds the names and instructors similar to a query.
+
+        A text matches if it contains at least `minScore` of the query's
+        trigrams (the last word of the query may be incomplete), so partial and
+        misspelled queries match too. Results are ranked by that fraction, then
+        by the trigram similarity of the whole text, so shorter texts come first.
+
+        @param query: The searched text.
+        @param field: "Name" or "Instructor" to search a single field, both if None.
+        @param limit: Maximal number of results.
+        @param minScore: Minimal fraction of the query's trigrams a result must contain.
+
+        @return: List[SearchResult] The best matching texts, best first.
+        """
+        codes: np.ndarray = np.array(sorted(trigrams(query, prefix=True)), dtype=np.uint64)
+        indexTrigrams: np.ndarray = self.arrays["trigrams"]
+        if len(codes) == 0 or len(indexTrigrams) == 0:
+            return []
+        positions: np.ndarray = np.minimum(np.searchsorted(indexTrigrams, codes), len(indexTrigrams) - 1)
+        positions = positions[indexTrigrams[positions] == codes]
+        postingStarts: np.ndarray = self.arrays["postingStarts"]
+        postings: List[np.ndarray] = [self.arrays["postings"][postingStarts[position]:postingStarts[position + 1]]
+                                      for position in positions]
+        if not postings:
+            return []
+
+        entries, matches = np.unique(np.concatenate(postings), return_counts=True)
+        if field is not None:
+            selected: np.ndarray = self.arrays["entryFields"][entries] == FIELDS.index(field)
+            entries, matches = entries[selected], matches[selected]
+        scores: np.ndarray = matches / len(codes)
+        similarities: np.ndarray = matches / (len(codes) + self.arrays["entryTrigramCounts"][entries] - matches)
+        order: np.ndarray = np.lexsort((-similarities, -scores))
+        order = order[scores[order] >= minScore][:limit]
+
+        entryTextStarts: np.ndarray = self.arrays["entryTextStarts"]
+        entryCourseStarts: np.ndarray = self.arrays["entryCourseStarts"]
+        results: List[SearchResult] = []
+        for entry, score in zip(entries[order], scores[order]):
+            courses: np.ndarray = self.arrays["entryCourses"][entryCourseStarts[entry]:entryCourseStarts[entry + 1]]
+            results.append(SearchResult(
+                float(score), FIELDS[self.arrays["entryFields"][entry]], self.getString(entryTextStarts, entry),
+                [tuple(self.getString(self.arrays["courseTextStarts"], course).split("\t")) for course in courses],
+            ))
+        return results
@@ -0,0 +1,274 @@
+"""Module for parsing saved pages in a single streaming pass, a faster equivalent of the tree based parser in `parse_pages`."""
+
+import config, page_store, parse_pages
+from course_data import CourseData
+from page_store import PageStore
+
+import logging, os, re, tempfile
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Optional, Set, Tuple
+
+from lxml import etree
+from lxml.etree import _Element as Element
+
+CHUNK_SIZE: int = 64 * 1024  # Number of characters fed to the parser at once
+
+TEXT_CONTENT = etree.XPath("string()")  # Same text extraction as `HtmlElement.text_content`
+IS_COURSE_ROW = etree.XPath(
+    f"boolean(self::tr[{config.COURSE_BOLD_ROW_CLASS_XPATH} or {config.COURSE_FACULTY_ROW_CLASS_XPATH} or "
+    f"{config.COURSE_DATA_ROW_STYLE_XPATH} or {config.COURSE_METADATA_ROW_STYLE_XPATH}])"
+)  # The row filter of `config.COURSE_DATA_XPATH`
+COURSE_NUMBER_REGEX = re.compile(r"\d{4}-\d{4}")
+COURSE_GROUP_REGEX = re.compile(r"קב':\s*(\d+)")
+COURSES_BODY_INDEX: int = 1  # Index of the <tbody> holding the courses, see `parse_pages.getCoursesData`
+
+logger = logging.getLogger(__name__)
+
+
+def getText(element: Element) -> str:
+    """
+    Returns the stripped text content of an element.
+
+    @param element: The element.
+
+    @return: str The element's text, without surrounding whitespace.
+    """
+    if len(element) == 0:  # Most cells hold plain text, skip the XPath evaluation for them
+        return (element.text or "").strip()
+    return TEXT_CONTENT(element).strip()
+
+
+def getCells(row: Element) -> List[Element]:
+    """
+    Returns the <td> children of a row.
+
+    @param row: The <tr> element.
+
+    @return: List[Element] The row's cells.
+    """
+    return list(row.iterchildren("td"))
+
+
+def parseBoldRow(boldRow: Element) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Parses a course bold row, see `parse_pages.parseBoldRow`.
+
+    @param boldRow: The <tr> bold row.
+
+    @return: Tuple of three option strings:
+            (course_code, section_number, course_name)
+    """
+    tds: List[Element] = getCells(boldRow)
+    if len(tds) < 2:
+        return None, None, None
+
+    firstText: str = getText(tds[0])
+    codeMatch = COURSE_NUMBER_REGEX.search(firstText)
+    sectionMatch = COURSE_GROUP_REGEX.search(firstText)
+    courseName: str = getText(tds[1])
+    return (codeMatch.group(0) if codeMatch else None,
+            sectionMatch.group(1) if sectionMatch else None,
+            courseName if courseName else None)
+
+
+def parseFacultyRow(facultyRow: Element) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Parses a faculty row, see `parse_pages.parseFacultyRow`.
+
+    @param facultyRow: The <tr> faculty row.
+
+    @return: Tuple of two option strings:
+            (school_name, faculty_name)
+    """
+    tds: List[Element] = getCells(facultyRow)
+    if not tds:
+        return None, None
+
+    school_name, faculty_name = getText(tds[-1]).split("/", 1)
+    return school_name, faculty_name
+
+
+def parseCourse(courseRows: List[Element], year: str) -> CourseData:
+    """
+    Parses the rows of a single course, see `parse_pages.parseCourses`.
+
+    The first row is the bold row, the second the faculty row, and the rows up
+    to the last one (excluded) are data rows, parsed until the first row with
+    fewer than 7 cells. The last row is the metadata row, holding the syllabus
+    and exam links.
+
+    @param courseRows: The <tr> rows of the course.
+    @param year: The academic year of the course.
+
+    @return: CourseData The parsed course.
+    """
+    number, group, name = parseBoldRow(courseRows[0])
+    logger.debug("Parsed course %s %s %s", number, group, name)
+    school, faculty = parseFacultyRow(courseRows[1])
+    courseData = CourseData(number=number, group=group, name=name, faculty=faculty, school=school, year=year)
+
+    for dataRow in courseRows[2:-1]:
+        tds: List[Element] = getCells(dataRow)
+        if len(tds) < 7:
+            break
+        courseData.Instructor.append(getText(tds[0]).replace(u"\xa0", " "))
+        courseData.Method.append(getText(tds[1]))
+        courseData.Building.append(getText(tds[2]))
+        courseData.Room.append(getText(tds[3]))
+        courseData.Day.append(getText(tds[4]))
+        courseData.Hour.append(getText(tds[5]))
+        courseData.Semester.append(getText(tds[6]))
+    if len(courseRows) > 2:
+        courseData.Syllabus, courseData.Exams = parse_pages.parseMetadataRow(courseRows[-1])
+    return courseData
+
+
+def iterCourseRows(chunks: Iterable[str]) -> Iterator[Element]:
+    """
+    Streams the course rows of a page, in document order.
+
+    The page is fed to an HTML pull parser chunk by chunk. Rows matching the
+    filter of `config.COURSE_DATA_XPATH` inside the courses <tbody> are
+    yielded as soon as they are complete, parsing stops at the end of that
+    <tbody>. Other <tbody> elements are cleared once complete to free memory.
+
+    @param chunks: The page's HTML source, in chunks.
+
+    @yield: Element Each complete course row.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end"), tag=("tbody", "tr"))
+    bodiesCount: int = 0
+    coursesBody: Optional[Element] = None
+    pendingRows: Deque[Element] = deque()
+    endedRows: Set[Element] = set()
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if element.tag == "tbody":
+                if event == "start":
+                    if bodiesCount == COURSES_BODY_INDEX:
+                        coursesBody = element
+                    bodiesCount += 1
+                elif element is coursesBody:
+                    yield from pendingRows
+                    return
+                elif coursesBody is None:
+                    element.clear()
+
+            elif element.tag == "tr" and coursesBody is not None:
+                if event == "start":
+                    if IS_COURSE_ROW(element):
+                        pendingRows.append(element)
+                elif pendingRows:
+                    endedRows.add(element)
+                    while pendingRows and pendingRows[0] in endedRows:
+                        endedRows.discard(pendingRows[0])
+                        yield pendingRows.popleft()
+    parser.close()
+    yield from pendingRows
+
+
+def parseChunks(chunks: Iterable[str], filename: str) -> List[CourseData]:
+    """
+    Parses a page given in chunks into CourseData objects.
+
+    Rows are grouped into courses on the fly, a new course starts at every row
+    with the class `config.COURSE_BOLD_ROW_CLASS`, like `parse_pages.separateCourses`.
+
+    @param chunks: The page's HTML source, in chunks.
+    @param filename: Name of the page's file (used to derive the year).
+
+    @return: List of CourseData objects found on the page.
+    """
+    year: str = parse_pages.parseYear(filename)
+    courses: List[CourseData] = []
+    courseRows: List[Element] = []
+
+    for row in iterCourseRows(chunks):
+        if config.COURSE_BOLD_ROW_CLASS in (row.get("class") or "") and courseRows:
+            courses.append(parseCourse(courseRows, year))
+            courseRows = []
+        courseRows.append(row)
+
+    if courseRows:
+        courses.append(parseCourse(courseRows, year))
+    return courses
+
+
+def parseHTML(pageSource: str, filename: str) -> List[CourseData]:
+    """
+    Parses the HTML source of a single page into CourseData objects.
+
+    @param pageSource: HTML source of the page.
+    @param filename: Name of the page's file (used to derive the year).
+
+    @return: List of CourseData objects found on the page.
+    """
+    return parseChunks((pageSource[i:i + CHUNK_SIZE] for i in range(0, len(pageSource), CHUNK_SIZE)), filename)
+
+
+def parseFile(store: PageStore, filename: str) -> List[CourseData]:
+    """
+    Reads and parses a single saved HTML page, reading it in chunks.
+
+    @param store: Page store holding the page.
+    @param filename: Name of the page.
+
+    @return: List of CourseData objects found on the page.
+    """
+    with store.open(filename) as file:
+        return parseChunks(iter(lambda: file.read(CHUNK_SIZE), ""), filename)
+
+
+def compareEngines(folder: Optional[str] = None, store: Optional[PageStore] = None) -> List[str]:
+    """
+    Differential check of this engine against the tree based parser of `parse_pages`.
+
+    Parses every saved page of the folder with both engines and compares the
+    resulting courses field by field.
+
+    @param folder: Folder containing the pages, defaults to `config.TMP_FOLDER_NAME`.
+    @param store: Page store to read the pages from instead of the folder's.
+
+    @return: List[str] Filenames of the pages whose results differ, empty if the engines agree.
+    """
+    store = store if store is not None else page_store.getPageStore(folder)
+    mismatches: List[str] = []
+    for filename in store.names():
+        expected: List[CourseData] = parse_pages.parseFile(store, filename, "classic")
+        actual: List[CourseData] = parseFile(store, filename)
+        if [course.toDict() for course in expected] != [course.toDict() for course in actual]:
+            mismatches.append(filename)
+    return mismatches
+
+
+def compareGeneratedPages(seeds: Iterable[int] = range(3), pagesPerYear: int = 5) -> List[str]:
+    """
+    Runs `compareEngines` on pages generated by `benchmark.generatePages`, so the
+    check needs no scraped pages.
+
+    @param seeds: Seeds of the generated pages, every seed generates a new set of pages.
+    @param pagesPerYear: Number of pages generated per year and seed.
+
+    @return: List[str] "{seed}/{filename}" of the pages whose results differ, empty if the engines agree.
+    """
+    import benchmark
+
+    mismatches: List[str] = []
+    for seed in seeds:
+        with tempfile.TemporaryDirectory() as folder:
+            store = PageStore(folder)
+            benchmark.generatePages(store, pagesPerYear=pagesPerYear, seed=seed)
+            mismatches.extend(f"{seed}/{filename}" for filename in compareEngines(store=store))
+    return mismatches
+
+
+if __name__ == "__main__":
+    mismatchedFiles: List[str]
+    if os.path.isdir(config.TMP_FOLDER_NAME) and page_store.getPageStore().names():
+        mismatchedFiles = compareEngines()
+    else:
+        print(f"No saved pages in {config.TMP_FOLDER_NAME}, comparing the engines on generated pages")
+        mismatchedFiles = compareGeneratedPages()
+    print(f"{len(mismatchedFiles)} pages differ between the parsing engines: {mismatchedFiles}")
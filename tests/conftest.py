@@ -0,0 +1,28 @@
+"""Shared fixtures of the tests, run them with `python -m pytest tests` from the project's folder."""
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+import pytest
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """
+    Points every file and folder setting of `config` into a temporary folder,
+    so a test never touches the outputs of the working directory.
+
+    @return: The `pytest.MonkeyPatch` instance, to override more settings.
+    """
+    for name in dir(config):
+        if name.endswith(("_FILE_NAME", "_FOLDER_NAME")) and name != "MANIFEST_FILE_NAME" and isinstance(getattr(config, name), str):
+            monkeypatch.setattr(config, name, str(tmp_path / getattr(config, name)))
+    monkeypatch.setattr(config, "METRICS_REPORT_FILE_NAME", None)
+    monkeypatch.setattr(config, "PARSE_CACHE_FILE_NAME", None)
+    monkeypatch.setattr(config, "PAGE_STORE", "files")
+    monkeypatch.setattr(config, "KEEP_TMP_FOLDER", True)
+    os.makedirs(config.TMP_FOLDER_NAME)
+    return monkeypatch
@@ -0,0 +1,165 @@
+"""A minimal local stand-in of the courses search site, to run the scrapers against.
+
+It replays the site's ASP.NET postbacks: the year dropdown posts back when it
+changes, the search button shows the first results page of the selected year
+and the next page button the following one. The state of the form (the year
+and the page shown) only travels in the hidden __VIEWSTATE field, together
+with a counter of the responses, so it changes on every postback like on the
+real site, and a postback without it is refused. The results are generated by
+`benchmark.generatePage`, inside tables without <tbody> like the raw HTML of
+the site.
+"""
+
+import config
+from benchmark import generatePage
+
+import threading, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+DEPARTMENT_OPTIONS: Tuple[Tuple[str, str], ...] = (("", "בחר"), ("all", "הכל"), ("0321", "מדעי המחשב"), ("0366", "מתמטיקה"))
+
+
+class FakeSite:
+    """
+    The stand-in site, served on a free local port until `close`.
+
+    @param years: Names of the academic years of the year dropdown, in its order.
+    @param pagesPerYear: Number of results pages of every year.
+    @param coursesPerPage: Number of courses on every results page.
+    @param failures: Number of times the request of a (year, pageNumber) results page fails with a 500 error
+                     before it succeeds.
+    """
+
+    def __init__(self, years: Tuple[str, ...] = ("2024", "2025"), pagesPerYear: int = 3, coursesPerPage: int = 4,
+                 failures: Optional[Dict[Tuple[str, int], int]] = None):
+        self.years: Tuple[str, ...] = years
+        self.pagesPerYear: int = pagesPerYear
+        self.coursesPerPage: int = coursesPerPage
+        self.failures: Dict[Tuple[str, int], int] = dict(failures or {})
+        self.postbacks: List[Dict[str, str]] = []  # The fields of every POST request, in order
+        self.responsesCount: int = 0
+        self.lock = threading.Lock()
+
+        site: FakeSite = self
+
+        class Handler(SiteHandler):
+            fakeSite = site
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/tal/kr/Search_P.aspx"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeSite":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def resultsRows(self, yearName: str, pageNumber: int) -> str:
+        """
+        Returns the course rows of a results page, as generated by `benchmark.generatePage`.
+
+        @param yearName: Name of the academic year.
+        @param pageNumber: Index of the page inside the year's results.
+
+        @return: str The rows' HTML.
+        """
+        source: str = generatePage(yearName, pageNumber, self.coursesPerPage)
+        return source.split("<table><tbody>")[2].split("</tbody></table>")[0]
+
+    def page(self, yearName: str, pageNumber: Optional[int]) -> str:
+        """
+        Renders the search form, followed by a results page if a page number is given.
+
+        @param yearName: Name of the academic year selected in the year dropdown.
+        @param pageNumber: Index of the results page shown, None for the search page.
+
+        @return: str The page's HTML.
+        """
+        with self.lock:
+            self.responsesCount += 1
+            viewState: str = f"{yearName}|{'' if pageNumber is None else pageNumber}|{self.responsesCount}"
+        yearOptions: str = "".join(
+            f"<option value=\"{year}\"{' selected' if year == yearName else ''}>{int(year) - 1}/{year}</option>"
+            for year in self.years)
+        departmentOptions: str = "".join(f"<option value=\"{value}\">{text}</option>" for value, text in DEPARTMENT_OPTIONS)
+        results: str = ""
+        if pageNumber is not None:
+            results = f"<table>{self.resultsRows(yearName, pageNumber)}</table>"
+            if pageNumber < self.pagesPerYear - 1:
+                results += f"<input type=\"submit\" id=\"{config.NEXT_PAGE_BUTTON_ID}\" name=\"{config.NEXT_PAGE_BUTTON_ID}\" value=\"הבא\">"
+        return ("<html dir=\"rtl\"><head><meta charset=\"utf-8\"></head><body>"
+                "<form method=\"post\" action=\"./Search_P.aspx\" id=\"form1\">"
+                f"<input type=\"hidden\" name=\"__VIEWSTATE\" id=\"__VIEWSTATE\" value=\"{viewState}\">"
+                "<input type=\"hidden\" name=\"__EVENTTARGET\" id=\"__EVENTTARGET\" value=\"\">"
+                "<input type=\"hidden\" name=\"__EVENTARGUMENT\" id=\"__EVENTARGUMENT\" value=\"\">"
+                f"<table><tr><td><select name=\"{config.YEAR_DROPDOWN_ID}\" id=\"{config.YEAR_DROPDOWN_ID}\" "
+                f"onchange=\"__doPostBack('{config.YEAR_DROPDOWN_ID}','')\">{yearOptions}</select></td>"
+                f"<td><select name=\"{config.DEPARTMENT_DROPDOWN_ID}\" id=\"{config.DEPARTMENT_DROPDOWN_ID}\">{departmentOptions}</select></td>"
+                f"<td><input type=\"submit\" id=\"{config.SEARCH_BUTTON_ID}\" name=\"{config.SEARCH_BUTTON_ID}\" value=\"חפש\"></td></tr></table>"
+                f"{results}</form></body></html>")
+
+    def respond(self, fields: Dict[str, str]) -> Tuple[int, str]:
+        """
+        Answers a postback of the form.
+
+        @param fields: The posted fields.
+
+        @return: Tuple of (status, html).
+        """
+        with self.lock:
+            self.postbacks.append(fields)
+        stateYear, _, statePage = fields.get("__VIEWSTATE", "").partition("|")
+        statePage = statePage.partition("|")[0]
+        if stateYear not in self.years:
+            return 400, "The form state is missing"
+
+        if fields.get("__EVENTTARGET") == config.YEAR_DROPDOWN_ID:
+            return 200, self.page(fields.get(config.YEAR_DROPDOWN_ID, stateYear), None)
+        if config.SEARCH_BUTTON_ID in fields:
+            yearName, pageNumber = fields.get(config.YEAR_DROPDOWN_ID, stateYear), 0
+            if fields.get(config.DEPARTMENT_DROPDOWN_ID) != DEPARTMENT_OPTIONS[config.DEPARTMENT_DROPDOWN_WANTED_OPTION_INDEX][0]:
+                return 400, "Select a department"
+        elif config.NEXT_PAGE_BUTTON_ID in fields and statePage.isdigit():
+            yearName, pageNumber = stateYear, int(statePage) + 1
+        else:
+            return 400, "Unknown postback"
+
+        with self.lock:
+            if self.failures.get((yearName, pageNumber), 0) > 0:
+                self.failures[(yearName, pageNumber)] -= 1
+                return 500, "Server error"
+        return 200, self.page(yearName, pageNumber)
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """Serves the pages of a `FakeSite`."""
+
+    fakeSite: FakeSite
+
+    def do_GET(self) -> None:
+        self.send(200, self.fakeSite.page(self.fakeSite.years[-1], None))
+
+    def do_POST(self) -> None:
+        body: str = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        self.send(*self.fakeSite.respond(dict(urllib.parse.parse_qsl(body, keep_blank_values=True))))
+
+    def send(self, status: int, body: str) -> None:
+        data: bytes = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
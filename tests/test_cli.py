@@ -0,0 +1,16 @@
+"""Tests of the command line interface."""
+
+import cli, config, page_store
+from benchmark import generatePages
+
+
+def test_parse_removes_pages_only_when_asked(settings):
+    settings.setattr(config, "KEEP_TMP_FOLDER", False)
+    names = generatePages(page_store.getPageStore(), yearsCount=1, pagesPerYear=2, coursesPerPage=3)
+
+    assert cli.main(["parse", "--formats", "csv", "--workers", "1"]) == 0
+    assert page_store.getPageStore().names() == names
+    assert config.KEEP_TMP_FOLDER is False  # The command does not leak its choice into the settings
+
+    assert cli.main(["parse", "--formats", "csv", "--workers", "1", "--remove-pages"]) == 0
+    assert page_store.getPageStore().names() == []
@@ -0,0 +1,103 @@
+"""Tests of the course documents downloader against a local HTTP server."""
+
+import link_fetcher
+
+import os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+import pytest
+
+pytestmark = pytest.mark.skipif(link_fetcher.aiohttp is None, reason="the links output requires aiohttp")
+
+
+class DocumentsServer:
+    """Serves documents with an ETag, answering 304 Not Modified to a request carrying the current one."""
+
+    def __init__(self, documents: Dict[str, bytes]):
+        self.documents: Dict[str, bytes] = documents
+        self.versions: Dict[str, int] = {path: 1 for path in documents}
+        self.requests: List[Tuple[str, str]] = []  # The (path, If-None-Match) of every request
+
+        server: DocumentsServer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests.append((self.path, self.headers.get("If-None-Match", "")))
+                if self.path not in server.documents:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag: str = f'"v{server.versions[self.path]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(server.documents[self.path])))
+                self.end_headers()
+                self.wfile.write(server.documents[self.path])
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def update(self, path: str, content: bytes) -> None:
+        self.documents[path] = content
+        self.versions[path] += 1
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def documentsServer():
+    server = DocumentsServer({"/syllabus/0321-1100.pdf": b"syllabus", "/exams/0321-1100/a.pdf": b"exam a"})
+    yield server
+    server.close()
+
+
+def storedContent(folder: str, url: str) -> bytes:
+    with open(os.path.join(folder, link_fetcher.DocumentCache.fileName(url)), "rb") as file:
+        return file.read()
+
+
+def test_downloads_then_revalidates_with_etag(documentsServer, tmp_path):
+    folder: str = str(tmp_path / "documents")
+    syllabusUrl: str = documentsServer.url("/syllabus/0321-1100.pdf")
+    examUrl: str = documentsServer.url("/exams/0321-1100/a.pdf")
+    urls: List[str] = [syllabusUrl, examUrl, syllabusUrl]
+
+    assert link_fetcher.fetchLinks(urls, folder, connections=2, perHostRate=0) == {"downloaded": 2, "unchanged": 0, "failed": 0}
+    assert storedContent(folder, syllabusUrl) == b"syllabus"
+    assert len(documentsServer.requests) == 2  # Duplicate URLs are downloaded once
+
+    documentsServer.requests.clear()
+    assert link_fetcher.fetchLinks(urls, folder, connections=2, perHostRate=0) == {"downloaded": 0, "unchanged": 2, "failed": 0}
+    assert sorted(etag for _, etag in documentsServer.requests) == ['"v1"', '"v1"']
+
+    documentsServer.update("/exams/0321-1100/a.pdf", b"exam a, fixed")
+    assert link_fetcher.fetchLinks(urls, folder, connections=2, perHostRate=0) == {"downloaded": 1, "unchanged": 1, "failed": 0}
+    assert storedContent(folder, examUrl) == b"exam a, fixed"
+    assert link_fetcher.DocumentCache(folder).conditionalHeaders(examUrl) == {"If-None-Match": '"v2"'}
+
+
+def test_failed_download_keeps_cached_copy(documentsServer, tmp_path):
+    folder: str = str(tmp_path / "documents")
+    syllabusUrl: str = documentsServer.url("/syllabus/0321-1100.pdf")
+    link_fetcher.fetchLinks([syllabusUrl], folder, perHostRate=0)
+
+    del documentsServer.documents["/syllabus/0321-1100.pdf"]
+    missingUrl: str = documentsServer.url("/missing.pdf")
+    assert link_fetcher.fetchLinks([syllabusUrl, missingUrl], folder, perHostRate=0) == {"downloaded": 0, "unchanged": 0, "failed": 2}
+    assert storedContent(folder, syllabusUrl) == b"syllabus"
+    assert link_fetcher.DocumentCache(folder).conditionalHeaders(missingUrl) == {}
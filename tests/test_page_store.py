@@ -0,0 +1,49 @@
+"""Tests of the compressed page store."""
+
+import page_store
+from benchmark import generatePage
+from fake_site import FakeSite
+from page_store import CompressedPageStore
+
+import os, threading, time
+
+
+def test_same_results_share_a_blob_across_scrapes(tmp_path):
+    site = FakeSite(pagesPerYear=2)
+    try:
+        first, second = site.page("2025", 0), site.page("2025", 0)  # The __VIEWSTATE of every response differs
+    finally:
+        site.close()
+    assert first != second
+
+    store = CompressedPageStore(str(tmp_path), compression="gzip")
+    store.save(page_store.pageName("2025", 0), first)
+    store.save(page_store.shardName("2025", 2) + "-0.html", second)
+    assert store.digest(page_store.pageName("2025", 0)) == page_store.pageHash(second)
+    assert len(os.listdir(tmp_path / CompressedPageStore.BLOBS_FOLDER_NAME)) == 1
+
+    store.remove(page_store.pageName("2025", 0))
+    assert store.read(page_store.shardName("2025", 2) + "-0.html") == first
+    store.remove(page_store.shardName("2025", 2) + "-0.html")
+    assert not any(files for _, _, files in os.walk(tmp_path / CompressedPageStore.BLOBS_FOLDER_NAME))
+
+
+def test_concurrent_saver_of_a_blob_waits_for_it(tmp_path, monkeypatch):
+    html: str = generatePage("2025", 0, 4)
+    store = CompressedPageStore(str(tmp_path), compression="gzip")
+    writing = threading.Event()
+    writeBlob = store.writeBlob
+
+    def slowWriteBlob(path: str, data: bytes) -> None:
+        writing.set()
+        time.sleep(0.2)
+        writeBlob(path, data)
+
+    monkeypatch.setattr(store, "writeBlob", slowWriteBlob)
+    firstSaver = threading.Thread(target=store.save, args=(page_store.pageName("2025", 0), html))
+    firstSaver.start()
+    writing.wait()
+    store.save(page_store.pageName("2025", 1), html)  # Returns only once the shared blob was written
+    assert os.path.exists(store.blobPath(store.digest(page_store.pageName("2025", 1))))
+    firstSaver.join()
+    assert store.read(page_store.pageName("2025", 0)) == html
@@ -0,0 +1,38 @@
+"""Tests of the parse cache across scraping runs, against the local stand-in of the site, see `fake_site`."""
+
+import config, metrics, parse_pages, scrape_http
+from course_data import CourseData
+from fake_site import FakeSite
+from pipeline import ParsePipeline
+
+from typing import List
+
+import pytest
+
+
+def scrapeWithPipeline(site: FakeSite, workers: int) -> List[CourseData]:
+    coursesData: List[CourseData] = []
+    with ParsePipeline(coursesData.extend, workers=workers) as pipeline:
+        scrape_http.scrapingHandler(site.url, None, pipeline)
+    return coursesData
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pages_scraped_again_hit_the_cache(settings, tmp_path, workers):
+    settings.setattr(config, "PARSE_CACHE_FILE_NAME", str(tmp_path / "parse_cache.sqlite"))
+    with FakeSite(pagesPerYear=2, coursesPerPage=3) as site:
+        runMetrics: metrics.RunMetrics = metrics.resetRunMetrics()
+        firstCourses: List[CourseData] = scrapeWithPipeline(site, workers)
+        assert runMetrics.parseCacheHitRate() == 0
+
+        runMetrics = metrics.resetRunMetrics()  # The second scrape gets other __VIEWSTATE values
+        secondCourses: List[CourseData] = scrapeWithPipeline(site, workers)
+        assert runMetrics.parseCacheHitRate() == 1
+    assert [course.toDict() for course in secondCourses] == [course.toDict() for course in firstCourses]
+    assert len(firstCourses) == 2 * 2 * 3
+
+    runMetrics = metrics.resetRunMetrics()  # Parsing the saved pages again uses the same cache
+    savedCourses: List[CourseData] = []
+    parse_pages.fileHandler(savedCourses.extend, workers=workers)
+    assert runMetrics.parseCacheHitRate() == 1
+    assert [course.toDict() for course in savedCourses] == [course.toDict() for course in firstCourses]
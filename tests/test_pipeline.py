@@ -0,0 +1,29 @@
+"""Tests of the parsing pipeline fed by the HTTP scraping engine, see `fake_site`."""
+
+import config, scrape_http
+from course_data import CourseData
+from fake_site import FakeSite
+from pipeline import ParsePipeline
+from scrape_manifest import ScrapeManifest
+
+from typing import List
+
+import pytest
+
+
+@pytest.mark.parametrize("keepTmpFolder", [True, False])
+def test_retried_unit_parses_every_page_once(settings, keepTmpFolder):
+    settings.setattr(config, "KEEP_TMP_FOLDER", keepTmpFolder)
+    settings.setattr(config, "YEARS_TO_SCRAPE", ["2025"])
+    settings.setattr(config, "SCRAPE_RETRIES", 1)
+    coursesData: List[CourseData] = []
+    with FakeSite(pagesPerYear=3, coursesPerPage=4, failures={("2025", 2): 1}) as site:
+        with ParsePipeline(coursesData.extend, workers=1) as pipeline:
+            scrape_http.scrapingHandler(site.url, ScrapeManifest(), pipeline)
+
+    assert site.failures[("2025", 2)] == 0
+    assert len(coursesData) == 3 * 4
+    assert [course.Number for course in coursesData] == [
+        row.split("<td>")[1].split("&nbsp;")[0] for pageNumber in range(3)
+        for row in site.resultsRows("2025", pageNumber).split("</tr>") if config.COURSE_BOLD_ROW_CLASS in row
+    ]
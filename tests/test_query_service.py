@@ -0,0 +1,74 @@
+"""Tests of the query service, over a small CSV output."""
+
+import config, query_service, writers
+from course_data import CourseData
+
+import http.client, json, threading
+from typing import Dict, Tuple
+
+import pytest
+
+
+@pytest.fixture
+def queryServer(settings):
+    courses = [CourseData(number=f"0321-{1000 + i}", group="01", name=f"Course {i}", year="2025", faculty="מדעים מדויקים",
+                          building=["דן דוד", "שרייבר"], room=[f"00{i % 3}", "006"]) for i in range(9)]
+    with writers.createWriter(["csv"]) as writer:
+        writer.writeCourses(courses)
+    server = query_service.QueryServer("127.0.0.1", 0, config.FINAL_CSV_FILE_NAME, reloadSeconds=60)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server: query_service.QueryServer, path: str, headers: Dict[str, str] = None) -> Tuple[int, Dict[str, str], bytes]:
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    try:
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_lookups_and_paging(queryServer):
+    status, _, body = get(queryServer, "/courses?building=%D7%93%D7%9F%20%D7%93%D7%95%D7%93&room=001")
+    assert status == 200
+    assert [course["Number"] for course in json.loads(body)["courses"]] == ["0321-1001", "0321-1004", "0321-1007"]
+
+    status, _, body = get(queryServer, "/courses?year=2025&offset=2&limit=3")
+    result = json.loads(body)
+    assert (result["total"], [course["Number"] for course in result["courses"]]) == (9, ["0321-1002", "0321-1003", "0321-1004"])
+
+
+def test_revalidation_and_invalid_queries(queryServer):
+    status, headers, _ = get(queryServer, "/courses?number=0321-1003")
+    assert status == 200
+    status, _, body = get(queryServer, "/courses?number=0321-1003", {"If-None-Match": headers["ETag"]})
+    assert (status, body) == (304, b"")
+
+    status, _, body = get(queryServer, "/courses?room=001", {"If-None-Match": "*"})
+    assert status == 400 and "building" in json.loads(body)["error"]
+    assert get(queryServer, "/courses?color=red")[0] == 400
+
+
+def test_etag_ignores_surrounding_whitespace_of_filters(queryServer):
+    status, headers, body = get(queryServer, "/courses?number=0321-1003")
+    spacedStatus, spacedHeaders, spacedBody = get(queryServer, "/courses?number=%200321-1003%20")
+    assert (spacedStatus, spacedBody) == (status, body)
+    assert spacedHeaders["ETag"] == headers["ETag"]
+
+
+def test_failed_reload_keeps_the_snapshot(queryServer, monkeypatch):
+    snapshot: query_service.Snapshot = queryServer.snapshot
+
+    def brokenLoadSnapshot(path: str) -> query_service.Snapshot:
+        raise KeyError("Number")
+
+    monkeypatch.setattr(query_service, "loadSnapshot", brokenLoadSnapshot)
+    with open(config.FINAL_CSV_FILE_NAME, "a", encoding="utf-8") as file:
+        file.write("\n")
+    assert not queryServer.reload()
+    assert queryServer.snapshot is snapshot
+    assert get(queryServer, "/courses?number=0321-1003")[0] == 200
@@ -0,0 +1,73 @@
+"""Tests of the HTTP scraping engine against the local stand-in of the site, see `fake_site`."""
+
+import config, page_store, parse_pages, scrape_http
+from course_data import CourseData
+from fake_site import FakeSite
+from scrape_manifest import ScrapeManifest
+
+import os, subprocess, sys
+from typing import List
+
+import pytest
+import requests
+
+
+def parseSavedPages() -> List[CourseData]:
+    coursesData: List[CourseData] = []
+    parse_pages.fileHandler(coursesData.extend, workers=1)
+    return coursesData
+
+
+def test_replays_postbacks_and_pages(settings):
+    with FakeSite(pagesPerYear=3, coursesPerPage=4) as site:
+        scrape_http.scrapingHandler(site.url)
+
+    assert page_store.getPageStore().names() == [page_store.pageName(year, pageNumber)
+                                                  for year in ("2024", "2025") for pageNumber in range(3)]
+    yearPostbacks = [fields for fields in site.postbacks if fields["__EVENTTARGET"] == config.YEAR_DROPDOWN_ID]
+    assert [fields[config.YEAR_DROPDOWN_ID] for fields in yearPostbacks] == ["2024", "2025"]
+    assert all(fields["__VIEWSTATE"] for fields in site.postbacks)  # The hidden state is posted back every time
+
+    coursesData: List[CourseData] = parseSavedPages()
+    assert len(coursesData) == 2 * 3 * 4
+    expected: List[str] = [row.split("<td>")[1].split("&nbsp;")[0] for year in ("2024", "2025") for pageNumber in range(3)
+                           for row in site.resultsRows(year, pageNumber).split("</tr>") if config.COURSE_BOLD_ROW_CLASS in row]
+    assert [course.Number for course in coursesData] == expected
+    assert {course.Year for course in coursesData} == {"2024", "2025"}
+
+
+def test_retries_failed_year_from_last_saved_page(settings):
+    settings.setattr(config, "YEARS_TO_SCRAPE", ["2025"])
+    settings.setattr(config, "SCRAPE_RETRIES", 1)
+    manifest = ScrapeManifest()
+    with FakeSite(pagesPerYear=4, failures={("2025", 2): 1}) as site:
+        scrape_http.scrapingHandler(site.url, manifest)
+
+    assert site.failures[("2025", 2)] == 0
+    assert page_store.getPageStore().names() == [page_store.pageName("2025", pageNumber) for pageNumber in range(4)]
+    assert manifest.isYearComplete("2025")
+    assert len(parseSavedPages()) == 4 * 4
+
+
+def test_raises_once_retries_are_exhausted(settings):
+    settings.setattr(config, "YEARS_TO_SCRAPE", ["2025"])
+    settings.setattr(config, "SCRAPE_RETRIES", 1)
+    manifest = ScrapeManifest()
+    with FakeSite(pagesPerYear=3, failures={("2025", 1): 2}) as site, pytest.raises(requests.HTTPError):
+        scrape_http.scrapingHandler(site.url, manifest)
+
+    assert not manifest.isYearComplete("2025")
+    assert manifest.savedPages("2025") == 1
+
+
+def test_http_engine_runs_without_selenium(settings):
+    code: str = ("import sys, config, main\n"
+                 "config.SITE_URL, config.TMP_FOLDER_NAME = {siteUrl!r}, {folder!r}\n"
+                 "config.SCRAPING_ENGINE, config.YEARS_TO_SCRAPE = 'http', ['2025']\n"
+                 "main.scrapeSite()\n"
+                 "print(sorted(name for name in sys.modules if name.split('.')[0] in ('selenium', 'scrape_data')))\n")
+    with FakeSite(pagesPerYear=2) as site:
+        result = subprocess.run([sys.executable, "-c", code.format(siteUrl=site.url, folder=config.TMP_FOLDER_NAME)],
+                                cwd=os.path.dirname(os.path.dirname(__file__)), capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+    assert page_store.getPageStore().names() == [page_store.pageName("2025", pageNumber) for pageNumber in range(2)]
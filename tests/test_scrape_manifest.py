@@ -0,0 +1,60 @@
+"""Tests of the scraping manifest across runs, against the local stand-in of the site, see `fake_site`."""
+
+import cli, config, page_store, parse_pages, scrape_http
+from course_data import CourseData
+from fake_site import FakeSite
+from scrape_manifest import ScrapeManifest
+
+from typing import List
+
+
+def parseSavedPages() -> List[CourseData]:
+    coursesData: List[CourseData] = []
+    parse_pages.fileHandler(coursesData.extend, workers=1)
+    return coursesData
+
+
+def test_rescraped_year_drops_its_old_pages(settings):
+    with FakeSite(pagesPerYear=3, coursesPerPage=4) as site:
+        scrape_http.scrapingHandler(site.url, ScrapeManifest())
+    ScrapeManifest().finishRun()
+
+    with FakeSite(pagesPerYear=2, coursesPerPage=4) as site:  # The newest year lost a page on the site
+        manifest = ScrapeManifest()
+        scrape_http.scrapingHandler(site.url, manifest)
+
+    assert page_store.getPageStore().names() == [page_store.pageName("2024", pageNumber) for pageNumber in range(3)] + \
+                                                 [page_store.pageName("2025", pageNumber) for pageNumber in range(2)]
+    assert manifest.isYearComplete("2024") and manifest.isYearComplete("2025")
+    assert len(parseSavedPages()) == (3 + 2) * 4
+
+
+def test_invalidate_command(settings):
+    with FakeSite(pagesPerYear=2, coursesPerPage=4) as site:
+        scrape_http.scrapingHandler(site.url, ScrapeManifest())
+
+    assert cli.main(["invalidate", "2024"]) == 0
+    manifest = ScrapeManifest()
+    assert not manifest.isYearComplete("2024") and manifest.savedPages("2024") == 0
+    assert manifest.isYearComplete("2025")
+    assert page_store.getPageStore().names() == [page_store.pageName("2025", pageNumber) for pageNumber in range(2)]
+
+
+def test_manifest_log_is_appended_and_compacted_on_load(settings):
+    manifest = ScrapeManifest()
+    manifest.startRun(["2024", "2025"])
+    for pageNumber in range(5):
+        manifest.pageSaved("2025", pageNumber)
+    manifest.yearFinished("2025", 5)
+    with open(manifest.path, "a", encoding="utf-8") as file:  # A run killed while appending an entry
+        file.write('{"type": "pa')
+
+    with open(manifest.path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 1 + 5 + 1 + 1
+
+    reopened = ScrapeManifest()
+    assert reopened.years == manifest.years and not reopened.runFinished
+    with open(manifest.path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 1
+    reopened.finishRun()
+    assert ScrapeManifest().runFinished
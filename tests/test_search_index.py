@@ -0,0 +1,31 @@
+"""Tests of the trigram search index, built through the "search" output."""
+
+import config, search_index, writers
+from course_data import CourseData
+
+
+def test_search_index_queries(settings):
+    with writers.createWriter(["search"]) as writer:
+        writer.writeCourses([
+            CourseData(number="0368-1105", group="01", name="מבוא למדעי המחשב", year="2025",
+                       instructor=["פרופ' כהן דנה", "גב' לוי נועה"]),
+            CourseData(number="0368-1105", group="02", name="מבוא למדעי המחשב", year="2025", instructor=["גב' לוי נועה"]),
+            CourseData(number="0366-2102", group="01", name="תכנון אלגוריתמים", year="2025", instructor=["ד\"ר שטרן"]),
+            CourseData(number="0411-3050", group="01", name="סמינר: כהן והפילוסופיה", year="2025"),
+        ])
+
+    with search_index.SearchIndex(config.SEARCH_INDEX_FILE_NAME) as index:  # Reopened through the memory map
+        assert len(index) == 6
+
+        best = index.search("מבו")[0]  # A prefix of a word, as typed so far
+        assert (best.field, best.text) == ("Name", "מבוא למדעי המחשב")
+        assert best.courses == [("2025", "0368-1105", "01"), ("2025", "0368-1105", "02")]
+
+        assert index.search("תכנונ")[0].text == "תכנון אלגוריתמים"  # Final letters typed as regular ones
+        assert index.search("אלגוריתמימ")[0].text == "תכנון אלגוריתמים"
+
+        assert {result.field for result in index.search("כהן")} == {"Name", "Instructor"}
+        instructors = index.search("כהן", field="Instructor")
+        assert [(result.text, result.courses) for result in instructors] == [("פרופ' כהן דנה", [("2025", "0368-1105", "01")])]
+        assert [result.text for result in index.search("כהן", field="Name")] == ["סמינר: כהן והפילוסופיה"]
+        assert index.search("כימיה") == []
@@ -0,0 +1,31 @@
+"""Differential test of the streaming parser against the tree based one, on generated pages and on a saved page."""
+
+import parse_pages, stream_parse
+from course_data import CourseData
+
+import os
+
+SAVED_PAGE_PATH: str = os.path.join(os.path.dirname(__file__), "fixtures", "2025-0.html")  # A results page as saved by the browser
+
+
+def test_engines_agree_on_generated_pages():
+    assert stream_parse.compareGeneratedPages(seeds=range(5)) == []
+
+
+def test_engines_agree_on_a_saved_page():
+    with open(SAVED_PAGE_PATH, "r", encoding="utf-8") as file:
+        pageSource: str = file.read()
+    classicRows = [course.toRow() for course in parse_pages.parseHTML(pageSource, "2025-0.html", "classic")]
+    streamRows = [course.toRow() for course in parse_pages.parseHTML(pageSource, "2025-0.html", "stream")]
+    assert streamRows == classicRows
+
+    courses = {row[0]: dict(zip(CourseData.COLUMNS, row)) for row in classicRows}
+    assert len(courses) == 4
+    assert courses["0368-1105"]["Day"] == "ב\nד\nה"  # A course with several sessions
+    assert courses["0368-1105"]["Building"] == "שרייבר\nשרייבר\nדן דוד"
+    assert courses["0368-1105"]["Exams"].count("\n") == 1  # The javascript: link is not an exam
+    assert courses["0366-2102"]["Room"] == "\n"  # Empty cells keep their session's place
+    assert courses["0366-2102"]["Syllabus"] is None
+    assert courses["0411-3050"]["Name"] == "סמינר: ‏AI ואתיקה‏ – \"מי אחראי?\""
+    assert courses["0411-3050"]["Day"] == ""  # Parsing the sessions stops at the row with fewer than 7 cells
+    assert courses["0321-4000"]["Name"] is None
@@ -0,0 +1,36 @@
+"""Tests of the timetable conflicts."""
+
+from course_data import CourseData
+from timetable import Timetable
+
+from typing import Set, Tuple
+
+
+def makeGroup(number: str, hour: str, room: str = "001") -> dict:
+    return CourseData(number=number, group="01", name=f"Course {number}", year="2025", method=["שיעור"],
+                      building=["דן דוד"], room=[room], day=["ב"], hour=[hour], semester=["א'"]).toDict()
+
+
+def conflictingPairs(timetable: Timetable, includeShared: bool) -> Set[Tuple[str, str]]:
+    return {tuple(sorted((conflict.first.number, conflict.second.number)))
+            for conflict in timetable.roomConflicts("2025", includeShared=includeShared)}
+
+
+def test_room_conflicts_leave_out_shared_sessions_unless_asked():
+    timetable = Timetable([
+        makeGroup("0321-1000", "10:00-12:00"),
+        makeGroup("0321-1001", "11:00-13:00"),  # Overlaps the first one
+        makeGroup("0321-1002", "10:00-12:00"),  # The same session as the first one, under another course
+        makeGroup("0321-1003", "10:00-12:00", room="002"),  # Another room
+        makeGroup("0321-1004", "12:00-14:00", room="002"),  # Starts when the previous session of the room ends
+    ])
+
+    assert conflictingPairs(timetable, includeShared=False) == {("0321-1000", "0321-1001"), ("0321-1001", "0321-1002")}
+    assert conflictingPairs(timetable, includeShared=True) == {("0321-1000", "0321-1001"), ("0321-1001", "0321-1002"),
+                                                               ("0321-1000", "0321-1002")}
+    conflict = timetable.roomConflicts("2025")[0]
+    assert (conflict.building, conflict.room, conflict.semester) == ("דן דוד", "001", "א'")
+    assert timetable.roomConflicts("2024") == []
+
+    assert timetable.clashes(0, 1) and timetable.clashes(0, 2)
+    assert not timetable.clashes(3, 4)
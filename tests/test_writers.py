@@ -0,0 +1,138 @@
+"""Tests of the output writers."""
+
+import config, course_db, writers
+from course_data import CourseData
+
+import csv, json, os
+from typing import List
+
+import pytest
+
+
+def makeCourses(count: int) -> List[CourseData]:
+    return [CourseData(number=f"0321-{1000 + i}", group="01", name=f"Course {i}", year=str(2024 + i % 2),
+                       day=["ב", "ד"], hour=["10:00-12:00", "14:00-16:00"]) for i in range(count)]
+
+
+def test_parquet_and_feather_outputs_keep_their_own_files(settings):
+    pytest.importorskip("pyarrow")
+    with writers.createWriter(["parquet", "feather"]) as writer:
+        writer.writeCourses(makeCourses(10))
+
+    for fileFormat in ("parquet", "feather"):
+        table = writers.readColumnar(fileFormat=fileFormat)
+        assert table.num_rows == 10
+        assert table.column("Day").to_pylist()[0] == ["ב", "ד"]
+    assert writers.readColumnar(years=["2025"], columns=["Number"], fileFormat="feather").num_rows == 5
+
+    with writers.createWriter(["feather"]) as writer:  # Writing one format again leaves the other untouched
+        writer.writeCourses(makeCourses(4))
+    assert writers.readColumnar(fileFormat="feather").num_rows == 4
+    assert writers.readColumnar(fileFormat="parquet").num_rows == 10
+
+
+def test_sqlite_output_keeps_courses_without_number_or_group(settings):
+    courses: List[CourseData] = makeCourses(3)
+    courses[0].Number = None
+    courses[1].Group = None
+    courses.append(CourseData(number=None, group=None, name="No number", year="2024", day=["ג"]))
+    with writers.createWriter(["sqlite"]) as writer:
+        writer.writeCourses(courses)
+
+    connection = course_db.connect()
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 4
+        assert [tuple(row) for row in connection.execute(
+            "SELECT Name, Occurrence FROM courses WHERE Number = '' ORDER BY Name")] == [("Course 0", 0), ("No number", 0)]
+        assert len(course_db.findSessions(connection, year="2024", day="ג")) == 1
+    finally:
+        connection.close()
+
+
+def test_failed_run_keeps_previous_csv(settings):
+    with writers.createWriter(["csv"]) as writer:
+        writer.writeCourses(makeCourses(2))
+    with open(config.FINAL_CSV_FILE_NAME, "rb") as file:
+        previousContent: bytes = file.read()
+
+    with pytest.raises(RuntimeError), writers.createWriter(["csv"]) as writer:
+        writer.writeCourses(makeCourses(5))
+        raise RuntimeError("the scraping failed")
+
+    with open(config.FINAL_CSV_FILE_NAME, "rb") as file:
+        assert file.read() == previousContent
+    assert not os.path.exists(config.FINAL_CSV_FILE_NAME + ".tmp")
+
+
+def test_failed_run_keeps_previous_columnar_datasets(settings):
+    pytest.importorskip("pyarrow")
+    with writers.createWriter(["parquet", "feather"]) as writer:
+        writer.writeCourses(makeCourses(6))
+
+    with pytest.raises(RuntimeError), writers.createWriter(["parquet", "feather"]) as writer:
+        writer.writeCourses(makeCourses(3))
+        raise RuntimeError("the scraping failed")
+
+    for fileFormat in ("parquet", "feather"):
+        assert writers.readColumnar(fileFormat=fileFormat).num_rows == 6
+    assert not os.path.exists(config.PARQUET_FOLDER_NAME + ".tmp")
+    assert not os.path.exists(config.FEATHER_FOLDER_NAME + ".tmp")
+
+
+def test_failed_run_keeps_previous_sqlite_database(settings):
+    with writers.createWriter(["sqlite"]) as writer:
+        writer.writeCourses(makeCourses(4))
+
+    with pytest.raises(RuntimeError), writers.createWriter(["sqlite"]) as writer:
+        writer.writeCourses(makeCourses(2))
+        raise RuntimeError("the scraping failed")
+
+    connection = course_db.connect()
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 4
+    finally:
+        connection.close()
+    assert not os.path.exists(config.SQLITE_FILE_NAME + ".tmp")
+
+
+def test_multi_writer_closes_every_writer_when_one_fails(settings):
+    class FailingWriter(writers.CourseWriter):
+        def writeCourses(self, coursesData: List[CourseData]) -> None:
+            pass
+
+        def close(self) -> None:
+            raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        with writers.MultiCourseWriter([FailingWriter(), writers.CSVCourseWriter()]) as writer:
+            writer.writeCourses(makeCourses(3))
+
+    with open(config.FINAL_CSV_FILE_NAME, encoding="utf-8", newline="") as file:
+        assert len(list(csv.reader(file))) == 1 + 3
+
+
+def readChanges() -> List[dict]:
+    with open(config.DELTA_CHANGESET_FILE_NAME, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_delta_output_lists_added_removed_and_modified_courses(settings):
+    courses: List[CourseData] = makeCourses(4)
+    with writers.createWriter(["delta"]) as writer:
+        writer.writeCourses(courses)
+    assert [change["change"] for change in readChanges()] == ["added"] * 4
+
+    courses[1].Room = ["101", "102"]  # Modified
+    del courses[2]  # Removed
+    courses.append(CourseData(number="0321-2000", group="02", name="New course", year="2024"))  # Added
+    with writers.createWriter(["delta"]) as writer:
+        writer.writeCourses(courses)
+
+    changes: dict = {(change["change"], change["Number"]): change for change in readChanges()}
+    assert sorted(changes) == [("added", "0321-2000"), ("modified", "0321-1001"), ("removed", "0321-1002")]
+    assert changes[("modified", "0321-1001")]["changedFields"] == {"Room": {"old": "", "new": "101\n102"}}
+    assert changes[("removed", "0321-1002")]["record"]["Name"] == "Course 2"
+
+    with writers.createWriter(["delta"]) as writer:  # Nothing changed since the previous run
+        writer.writeCourses(courses)
+    assert readChanges() == []
@@ -0,0 +1,290 @@
+"""Module for finding timetable conflicts in the scraped courses: room double bookings and clashes between course groups."""
+
+import config
+
+import csv, re, time
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+DAYS: Tuple[str, ...] = ("א", "ב", "ג", "ד", "ה", "ו")  # The values of the "Day" column, from Sunday
+SEMESTERS: Tuple[str, ...] = ("א'", "ב'", "קיץ")  # The semesters, in the order of their bits in the semester masks
+SEMESTER_MASKS: Dict[str, int] = {"א'": 0b001, "ב'": 0b010, "קיץ": 0b100, "שנתי": 0b011}  # A yearly course takes both semesters
+SLOT_MINUTES: int = 10  # Resolution of the week slots, the site's hours are multiples of 10 minutes
+DAY_SLOTS: int = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS: int = len(DAYS) * DAY_SLOTS
+HOUR_REGEX = re.compile(r"(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})")
+
+
+class CourseGroup(NamedTuple):
+    """A row of the scraped data, a single group of a course."""
+    year: str
+    number: str
+    group: str
+    kind: str  # The teaching methods of the group, like "שיעור" or "תרגיל", see `Timetable.generateSchedules`
+
+
+class RoomConflict(NamedTuple):
+    """Two sessions held in the same room at overlapping times."""
+    year: str
+    building: str
+    room: str
+    semester: str
+    first: CourseGroup
+    firstTime: str
+    second: CourseGroup
+    secondTime: str
+
+
+def parseSession(day: str, hour: str) -> Optional[Tuple[int, int]]:
+    """
+    Converts the day and hour of a session to an interval of week slots.
+
+    @param day: The day of the session, one of `DAYS`.
+    @param hour: The hours of the session, like "10:00-12:00".
+
+    @return: Tuple of (start, end) week slots, end excluded, or None if the session has no valid time.
+    """
+    match = HOUR_REGEX.fullmatch(hour.strip())
+    if match is None or day.strip() not in DAYS:
+        return None
+    startHours, startMinutes, endHours, endMinutes = (int(value) for value in match.groups())
+    dayStart: int = DAYS.index(day.strip()) * DAY_SLOTS
+    start: int = dayStart + (startHours * 60 + startMinutes) // SLOT_MINUTES
+    end: int = dayStart + -(-(endHours * 60 + endMinutes) // SLOT_MINUTES)
+    return (start, end) if start < end else None
+
+
+def formatSlot(slot: int) -> str:
+    """
+    Formats a week slot as a day and time, like "ג 10:00".
+
+    @param slot: The week slot.
+
+    @return: str The slot's day and time.
+    """
+    day, daySlot = divmod(int(slot), DAY_SLOTS)
+    hours, minutes = divmod(daySlot * SLOT_MINUTES, 60)
+    return f"{DAYS[day]} {hours:02d}:{minutes:02d}"
+
+
+class Timetable:
+    """
+    The sessions of the scraped courses as numeric week intervals.
+
+    Every session with a valid day and hour becomes an interval of week slots
+    (`SLOT_MINUTES` minutes each, counted from Sunday 00:00) with a bitmask of
+    the semesters it takes place in, stored in NumPy arrays with one element
+    per session. Every course group also gets a bitset of all the (semester,
+    slot) pairs it occupies, so two groups clash if their bitsets intersect.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Optional[str]]]):
+        """
+        @param records: The courses as dicts of the columns of `CourseData.COLUMNS`, session fields joined by new lines,
+                        like the rows of the CSV output or `CourseData.toDict()`.
+        """
+        self.groups: List[CourseGroup] = []
+        self.bitsets: List[int] = []
+        self.rooms: List[Tuple[str, str]] = []
+        roomIndices: Dict[Tuple[str, str], int] = {}
+        sessionGroups: List[int] = []
+        sessionMasks: List[int] = []
+        sessionStarts: List[int] = []
+        sessionEnds: List[int] = []
+        sessionRooms: List[int] = []
+
+        for record in records:
+            def field(column: str) -> List[str]:
+                return (record.get(column) or "").split("\n")
+
+            methods: List[str] = field("Method")
+            groupIndex: int = len(self.groups)
+            self.groups.append(CourseGroup(record.get("Year") or "", record.get("Number") or "",
+                                           record.get("Group") or "", "+".join(sorted(set(filter(None, methods))))))
+            bitset: int = 0
+            for day, hour, semester, building, room in zip(field("Day"), field("Hour"), field("Semester"),
+                                                           field("Building"), field("Room")):
+                interval: Optional[Tuple[int, int]] = parseSession(day, hour)
+                mask: int = SEMESTER_MASKS.get(semester.strip(), 0)
+                if interval is None or mask == 0:
+                    continue
+                start, end = interval
+                for bit in range(len(SEMESTERS)):
+                    if mask >> bit & 1:
+                        bitset |= ((1 << (end - start)) - 1) << (bit * WEEK_SLOTS + start)
+
+                roomKey: Tuple[str, str] = (building.strip(), room.strip())
+                roomIndex: int = -1
+                if all(roomKey):
+                    roomIndex = roomIndices.setdefault(roomKey, len(roomIndices))
+                    if roomIndex == len(self.rooms):
+                        self.rooms.append(roomKey)
+                sessionGroups.append(groupIndex)
+                sessionMasks.append(mask)
+                sessionStarts.append(start)
+                sessionEnds.append(end)
+                sessionRooms.append(roomIndex)
+            self.bitsets.append(bitset)
+
+        self.years: List[str] = sorted({group.year for group in self.groups})
+        groupYears: np.ndarray = np.searchsorted(self.years, [group.year for group in self.groups]).astype(np.int32)
+        self.sessionGroups: np.ndarray = np.array(sessionGroups, dtype=np.int32)
+        self.sessionYears: np.ndarray = groupYears[self.sessionGroups] if sessionGroups else np.zeros(0, np.int32)
+        self.sessionMasks: np.ndarray = np.array(sessionMasks, dtype=np.uint8)
+        self.sessionStarts: np.ndarray = np.array(sessionStarts, dtype=np.int32)
+        self.sessionEnds: np.ndarray = np.array(sessionEnds, dtype=np.int32)
+        self.sessionRooms: np.ndarray = np.array(sessionRooms, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.sessionGroups)
+
+    def clashes(self, first: int, second: int) -> bool:
+        """
+        Checks whether two course groups have sessions at overlapping times in the same semester.
+
+        @param first: Index of the first group in `self.groups`.
+        @param second: Index of the second group in `self.groups`.
+
+        @return: bool True if the groups clash.
+        """
+        return self.bitsets[first] & self.bitsets[second] != 0
+
+    def roomConflicts(self, year: Optional[str] = None, includeShared: bool = False) -> List[RoomConflict]:
+        """
+        Finds the sessions held in the same room at overlapping times.
+
+        The sessions are sorted by (year, semester, room, start) and swept once
+        with a running maximum of the end slots: a session starting before the
+        latest end of the previous sessions of its room overlaps one of them.
+        Sessions of the same course group are never reported against each other.
+
+        @param year: Name of the academic year to check, all the years if None.
+        @param includeShared: Whether to report sessions with the exact same hours, which are usually a single
+                              session listed under several groups or under several cross listed courses.
+
+        @return: List[RoomConflict] The conflicting pairs of sessions, a pair is
+                 reported once for every semester it conflicts in.
+        """
+        keys: List[np.ndarray] = []
+        indices: List[np.ndarray] = []
+        roomsCount: int = max(len(self.rooms), 1)
+        for bit in range(len(SEMESTERS)):
+            selected: np.ndarray = (self.sessionMasks >> bit & 1).astype(bool) & (self.sessionRooms >= 0)
+            if year is not None:
+                selected &= self.sessionYears == (self.years.index(year) if year in self.years else -1)
+            sessionIndices: np.ndarray = np.flatnonzero(selected)
+            indices.append(sessionIndices)
+            keys.append((self.sessionYears[sessionIndices].astype(np.int64) * len(SEMESTERS) + bit) * roomsCount
+                        + self.sessionRooms[sessionIndices])
+        key: np.ndarray = np.concatenate(keys)
+        sessions: np.ndarray = np.concatenate(indices)
+        order: np.ndarray = np.lexsort((self.sessionStarts[sessions], key))
+        key, sessions = key[order], sessions[order]
+        starts: np.ndarray = self.sessionStarts[sessions] + key * (WEEK_SLOTS + 1)
+        ends: np.ndarray = self.sessionEnds[sessions] + key * (WEEK_SLOTS + 1)
+
+        # Offsetting by the key makes the running maximum restart at every room
+        previousEnds: np.ndarray = np.concatenate(([-1], np.maximum.accumulate(ends)[:-1])) if len(ends) else ends
+        conflicts: List[RoomConflict] = []
+        for position in np.flatnonzero(starts < previousEnds):
+            roomStart: int = int(np.searchsorted(key, key[position]))
+            for other in roomStart + np.flatnonzero(ends[roomStart:position] > starts[position]):
+                first, second = int(sessions[other]), int(sessions[position])
+                if self.sessionGroups[first] == self.sessionGroups[second] or (
+                        not includeShared and starts[other] == starts[position] and ends[other] == ends[position]):
+                    continue
+                building, room = self.rooms[self.sessionRooms[first]]
+                conflicts.append(RoomConflict(
+                    self.years[self.sessionYears[first]], building, room,
+                    SEMESTERS[int(key[position]) // roomsCount % len(SEMESTERS)],
+                    self.groups[self.sessionGroups[first]], self.formatSession(first),
+                    self.groups[self.sessionGroups[second]], self.formatSession(second),
+                ))
+        return conflicts
+
+    def formatSession(self, session: int) -> str:
+        """
+        Formats the time of a session, like "ג 10:00-12:00".
+
+        @param session: Index of the session.
+
+        @return: str The session's day and hours.
+        """
+        return f"{formatSlot(self.sessionStarts[session])}-{formatSlot(self.sessionEnds[session]).split()[1]}"
+
+    def generateSchedules(self, year: str, numbers: List[str], limit: Optional[int] = None) -> Iterator[List[CourseGroup]]:
+        """
+        Enumerates the clash free choices of groups for a list of courses.
+
+        A course may have groups of several kinds, like lectures and exercises,
+        so one group of every (course number, kind) is chosen. The search is a
+        backtracking over the kinds with the fewest groups first, pruned as soon
+        as a remaining kind has no group left that fits the chosen ones.
+
+        @param year: Name of the academic year.
+        @param numbers: The course numbers, like "0321-1100".
+        @param limit: Maximal number of schedules to generate, all of them if None.
+
+        @return: Iterator of schedules, each a list of the chosen groups.
+        """
+        options: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        wanted = set(numbers)
+        for index, group in enumerate(self.groups):
+            if group.year == year and group.number in wanted:
+                options[(group.number, group.kind)].append(index)
+        missingNumbers: List[str] = sorted(wanted - {number for number, _ in options})
+        if missingNumbers:
+            raise ValueError(f"Courses {missingNumbers} have no groups in {year}")
+
+        kinds: List[List[int]] = sorted(options.values(), key=len)
+        chosen: List[int] = []
+        generated: int = 0
+
+        def search(depth: int, occupied: int) -> Iterator[List[CourseGroup]]:
+            nonlocal generated
+            if depth == len(kinds):
+                generated += 1
+                yield [self.groups[index] for index in chosen]
+                return
+            for index in kinds[depth]:
+                if limit is not None and generated >= limit:
+                    return
+                bitset: int = self.bitsets[index]
+                if bitset & occupied:
+                    continue
+                occupiedAfter: int = occupied | bitset
+                if not all(any(not self.bitsets[other] & occupiedAfter for other in kind) for kind in kinds[depth + 1:]):
+                    continue
+                chosen.append(index)
+                yield from search(depth + 1, occupiedAfter)
+                chosen.pop()
+
+        return search(0, 0)
+
+
+def loadTimetable(path: Optional[str] = None) -> Timetable:
+    """
+    Builds the timetable of the courses in the CSV output.
+
+    @param path: Path of the CSV file, defaults to `config.FINAL_CSV_FILE_NAME`.
+
+    @return: Timetable The timetable of all the courses in the file.
+    """
+    path = path if path is not None else config.FINAL_CSV_FILE_NAME
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return Timetable(csv.DictReader(file))
+
+
+if __name__ == "__main__":
+    startTime: float = time.perf_counter()
+    timetable: Timetable = loadTimetable()
+    loadedTime: float = time.perf_counter()
+    roomConflicts: List[RoomConflict] = timetable.roomConflicts()
+    print(f"{len(timetable)} sessions of {len(timetable.groups)} course groups loaded in {loadedTime - startTime:.3f}s, "
+          f"{len(roomConflicts)} room conflicts found in {time.perf_counter() - loadedTime:.3f}s")
+    for conflict in roomConflicts:
+        print(f"{conflict.year} {conflict.semester} {conflict.building} {conflict.room}: "
+              f"{conflict.first.number}/{conflict.first.group} {conflict.firstTime} - "
+              f"{conflict.second.number}/{conflict.second.group} {conflict.secondTime}")
@@ -0,0 +1,781 @@
+"""Module for streaming parsed course data into the final output files."""
+
+import config, course_db
+from course_data import CourseData
+
+import csv, hashlib, json, os, shutil, sqlite3
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple, Type, TextIO
+
+pa = feather = pq = None  # pyarrow is imported on first use by `importPyarrow`
+
+
+def importPyarrow() -> bool:
+    """
+    Imports pyarrow, which only the columnar output formats need.
+
+    @return: bool False if pyarrow is not installed.
+    """
+    global pa, feather, pq
+    if pa is None:
+        try:
+            import pyarrow, pyarrow.feather, pyarrow.parquet
+        except ImportError:  # The columnar output formats are optional
+            return False
+        pa, feather, pq = pyarrow, pyarrow.feather, pyarrow.parquet
+    return True
+
+
+class CourseWriter:
+    """
+    Base class of the output sinks.
+
+    A writer receives the parsed courses page by page through `writeCourses`
+    and is expected to push them to its output right away instead of holding
+    them in memory. Writers are context managers, the output is finalized by
+    `close`.
+    """
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        """
+        Writes the courses of a single page to the output.
+
+        @param coursesData: List of CourseData objects to write.
+
+        @return: None
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Flushes and closes the output.
+
+        @return: None
+        """
+
+    def __enter__(self) -> "CourseWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class CSVCourseWriter(CourseWriter):
+    """
+    Writes courses as CSV rows, matching the format of `pd.DataFrame.to_csv(index=False)`
+    byte for byte (UTF-8, minimal quoting, `os.linesep` line endings).
+
+    The rows are written to a temporary file that replaces the previous output
+    when the writer is closed, so readers (like the query service) never see a
+    partly written file. If the run fails, the previous output is kept.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path: str = path if path is not None else config.FINAL_CSV_FILE_NAME
+        self.file: TextIO = open(self.path + ".tmp", "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file, lineterminator=os.linesep, quoting=csv.QUOTE_MINIMAL)
+        self.writer.writerow(CourseData.COLUMNS)
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        self.writer.writerows(course.toRow() for course in coursesData)
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+            os.replace(self.path + ".tmp", self.path)
+
+    def discard(self) -> None:
+        """
+        Drops the rows written so far, keeping the previous run's file.
+
+        @return: None
+        """
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.path + ".tmp")
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class MultiCourseWriter(CourseWriter):
+    """
+    Fans out every page of courses to several writers.
+    """
+
+    def __init__(self, writers: List[CourseWriter]):
+        self.writers: List[CourseWriter] = writers
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        for writer in self.writers:
+            writer.writeCourses(coursesData)
+
+    def close(self) -> None:
+        self.__exit__(None, None, None)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        firstError: Optional[BaseException] = None
+        for writer in self.writers:  # A writer failing to close must not leave the others open
+            try:
+                writer.__exit__(exc_type, exc_value, traceback)
+            except BaseException as e:
+                if firstError is None:
+                    firstError = e
+        if firstError is not None:
+            raise firstError
+
+
+class DedupeCourseWriter(CourseWriter):
+    """
+    Passes the courses on to another writer, leaving out the courses identical
+    in all their fields to a course already written.
+
+    Only a 16 bytes digest is kept per distinct course.
+    """
+
+    def __init__(self, writer: CourseWriter):
+        self.writer: CourseWriter = writer
+        self.seen: Set[bytes] = set()
+        self.duplicatesCount: int = 0
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        uniqueCourses: List[CourseData] = []
+        for course in coursesData:
+            digest: bytes = hashlib.blake2b(json.dumps(course.toRow(), ensure_ascii=False).encode("utf-8"),
+                                            digest_size=16).digest()
+            if digest in self.seen:
+                self.duplicatesCount += 1
+                continue
+            self.seen.add(digest)
+            uniqueCourses.append(course)
+        self.writer.writeCourses(uniqueCourses)
+
+    def close(self) -> None:
+        self.writer.close()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.writer.__exit__(exc_type, exc_value, traceback)
+
+
+LIST_COLUMNS: Tuple[str, ...] = ("Instructor", "Semester", "Method", "Building", "Room", "Day", "Hour", "Exams")  # One value per session (or exam link) of the course
+CATEGORICAL_COLUMNS: Tuple[str, ...] = ("Year", "School", "Faculty", "Method")  # Few distinct values, stored once per file
+PARTITION_COLUMN: str = "Year"  # Column the columnar output is partitioned by, one sub folder `Year=<year>` per value
+
+
+def columnarSchema() -> "pa.Schema":
+    """
+    Builds the Arrow schema of the columnar output files.
+
+    Session fields are list columns, categorical columns are dictionary
+    encoded. The partition column is not stored inside the files, its value is
+    the name of their folder.
+
+    @return: pa.Schema The schema of the columns stored in the files.
+    """
+    fields: List[pa.Field] = []
+    for column in CourseData.COLUMNS:
+        if column == PARTITION_COLUMN:
+            continue
+        valueType: pa.DataType = pa.dictionary(pa.int32(), pa.string()) if column in CATEGORICAL_COLUMNS else pa.string()
+        fields.append(pa.field(column, pa.list_(valueType) if column in LIST_COLUMNS else valueType))
+    return pa.schema(fields)
+
+
+class ColumnarCourseWriter(CourseWriter):
+    """
+    Base class of the columnar writers, writing the courses with pyarrow into
+    one sub folder per year (`<folder>/Year=<year>/`, Hive partitioning).
+
+    Courses are buffered per year as columns of Python values and converted to
+    Arrow tables when flushed. The partitions are written into `<folder>.tmp`,
+    which replaces the previous output when the writer is closed, so a failed
+    run keeps the previous dataset. Every format has its own folder.
+    """
+
+    extension: str = ""
+    folderSetting: str = ""  # Name of the setting of `config` holding the default folder
+
+    def __init__(self, folder: Optional[str] = None, batchRows: Optional[int] = None):
+        if not importPyarrow():
+            raise ImportError(f"The {type(self).__name__} requires the 'pyarrow' package")
+        self.folder: str = folder if folder is not None else getattr(config, self.folderSetting)
+        self.tmpFolder: str = self.folder + ".tmp"
+        self.batchRows: Optional[int] = batchRows if batchRows is not None else config.COLUMNAR_BATCH_ROWS
+        self.schema: pa.Schema = columnarSchema()
+        self.buffers: Dict[str, Dict[str, list]] = {}
+        self.closed: bool = False
+
+        if os.path.exists(self.tmpFolder):  # Left by a run that crashed
+            shutil.rmtree(self.tmpFolder)
+        os.makedirs(self.tmpFolder)
+
+    def yearFolder(self, yearName: str) -> str:
+        """
+        Returns the partition folder of a year, creating it if needed.
+
+        @param yearName: Name of the academic year.
+
+        @return: str The folder's path.
+        """
+        path: str = os.path.join(self.tmpFolder, f"{PARTITION_COLUMN}={yearName}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        for course in coursesData:
+            buffer: Dict[str, list] = self.buffers.setdefault(course.Year, {name: [] for name in self.schema.names})
+            for name in self.schema.names:
+                buffer[name].append(getattr(course, name))
+            if self.batchRows is not None and len(buffer[self.schema.names[0]]) >= self.batchRows:
+                self.flushYear(course.Year)
+
+    def takeTable(self, yearName: str) -> "pa.Table":
+        """
+        Converts the buffered courses of a year to an Arrow table and empties the buffer.
+
+        @param yearName: Name of the academic year.
+
+        @return: pa.Table The year's buffered courses.
+        """
+        buffer: Dict[str, list] = self.buffers.pop(yearName)
+        return pa.Table.from_arrays([pa.array(buffer[field.name], type=field.type) for field in self.schema],
+                                    schema=self.schema)
+
+    def flushYear(self, yearName: str) -> None:
+        """
+        Writes the buffered courses of a year, called when the buffer reaches
+        `self.batchRows` courses and for every buffered year on `close`.
+
+        @param yearName: Name of the academic year.
+
+        @return: None
+        """
+
+    def closeFiles(self) -> None:
+        """
+        Closes the files still open, once every year was flushed or when the output is discarded.
+
+        @return: None
+        """
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        for yearName in list(self.buffers):
+            self.flushYear(yearName)
+        self.closeFiles()
+        self.closed = True
+
+        previousFolder: str = self.folder + ".old"
+        if os.path.exists(previousFolder):
+            shutil.rmtree(previousFolder)
+        if os.path.exists(self.folder):
+            os.rename(self.folder, previousFolder)
+        os.rename(self.tmpFolder, self.folder)
+        if os.path.exists(previousFolder):
+            shutil.rmtree(previousFolder)
+
+    def discard(self) -> None:
+        """
+        Drops the partitions written so far, keeping the previous run's dataset.
+
+        @return: None
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.closeFiles()
+        finally:
+            shutil.rmtree(self.tmpFolder, ignore_errors=True)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ParquetCourseWriter(ColumnarCourseWriter):
+    """
+    Writes courses as Parquet files, `<folder>/Year=<year>/part-0.parquet`.
+
+    Every `config.COLUMNAR_BATCH_ROWS` courses of a year are written as a row
+    group, so at most that many courses per year are held in memory.
+    """
+
+    extension: str = "parquet"
+    folderSetting: str = "PARQUET_FOLDER_NAME"
+
+    def __init__(self, folder: Optional[str] = None, batchRows: Optional[int] = None):
+        super().__init__(folder, batchRows)
+        self.fileWriters: Dict[str, pq.ParquetWriter] = {}
+
+    def flushYear(self, yearName: str) -> None:
+        if yearName not in self.fileWriters:
+            self.fileWriters[yearName] = pq.ParquetWriter(
+                os.path.join(self.yearFolder(yearName), f"part-0.{self.extension}"), self.schema)
+        self.fileWriters[yearName].write_table(self.takeTable(yearName))
+
+    def closeFiles(self) -> None:
+        for fileWriter in self.fileWriters.values():
+            fileWriter.close()
+        self.fileWriters = {}
+
+
+class FeatherCourseWriter(ColumnarCourseWriter):
+    """
+    Writes courses as uncompressed Feather (Arrow IPC) files, `<folder>/Year=<year>/part-0.feather`,
+    which can be memory mapped and read without copying.
+
+    The dictionaries of an Arrow IPC file cannot change between its batches, so
+    each year is buffered whole and written on `close`.
+    """
+
+    extension: str = "feather"
+    folderSetting: str = "FEATHER_FOLDER_NAME"
+
+    def __init__(self, folder: Optional[str] = None):
+        super().__init__(folder)
+        self.batchRows = None
+
+    def flushYear(self, yearName: str) -> None:
+        feather.write_feather(self.takeTable(yearName),
+                              os.path.join(self.yearFolder(yearName), f"part-0.{self.extension}"),
+                              compression="uncompressed")
+
+
+COLUMNAR_WRITERS: Dict[str, Type[ColumnarCourseWriter]] = {
+    "parquet": ParquetCourseWriter,
+    "feather": FeatherCourseWriter,
+}  # The columnar writers, by output format
+
+
+def readColumnar(folder: Optional[str] = None, columns: Optional[List[str]] = None,
+                 years: Optional[List[str]] = None, fileFormat: str = "parquet") -> "pa.Table":
+    """
+    Reads courses written by a columnar writer, loading only the wanted columns and years.
+
+    Files are memory mapped, uncompressed Feather files are read without
+    copying. The partition column is added back as a categorical column.
+    Use `.to_pandas()` on the result for a DataFrame with categorical columns
+    and list columns as arrays.
+
+    @param folder: Folder of the columnar output, defaults to the folder of the format
+                   (`config.PARQUET_FOLDER_NAME` or `config.FEATHER_FOLDER_NAME`).
+    @param columns: Names of the wanted columns, all of them if None.
+    @param years: Names of the wanted years, all of them if None.
+    @param fileFormat: The columnar output to read, "parquet" or "feather", only its files are read.
+
+    @return: pa.Table The courses, ordered by year.
+    """
+    if not importPyarrow():
+        raise ImportError("Reading the columnar output requires the 'pyarrow' package")
+    if fileFormat not in COLUMNAR_WRITERS:
+        raise ValueError(f"Unknown columnar format {fileFormat}, available formats are {list(COLUMNAR_WRITERS)}")
+    writerClass: Type[ColumnarCourseWriter] = COLUMNAR_WRITERS[fileFormat]
+    folder = folder if folder is not None else getattr(config, writerClass.folderSetting)
+    fileColumns: Optional[List[str]] = [column for column in columns if column != PARTITION_COLUMN] if columns is not None else None
+    tables: List[pa.Table] = []
+
+    for yearFolder in sorted(os.listdir(folder)):
+        prefix: str = f"{PARTITION_COLUMN}="
+        if not yearFolder.startswith(prefix) or (years is not None and yearFolder[len(prefix):] not in years):
+            continue
+        for filename in sorted(os.listdir(os.path.join(folder, yearFolder))):
+            if not filename.endswith(f".{writerClass.extension}"):
+                continue
+            path: str = os.path.join(folder, yearFolder, filename)
+            if writerClass is ParquetCourseWriter:
+                table: pa.Table = pq.read_table(path, columns=fileColumns, memory_map=True)
+            else:
+                table: pa.Table = feather.read_table(path, columns=fileColumns, memory_map=True)
+
+            if columns is None or PARTITION_COLUMN in columns:
+                yearColumn: pa.Array = pa.array([yearFolder[len(prefix):]] * table.num_rows).dictionary_encode()
+                table = table.append_column(PARTITION_COLUMN, yearColumn)
+            tables.append(table.select(columns if columns is not None else list(CourseData.COLUMNS)))
+
+    if not tables:
+        emptyTable: pa.Table = columnarSchema().empty_table()
+        emptyTable = emptyTable.append_column(PARTITION_COLUMN, pa.array([], type=pa.dictionary(pa.int32(), pa.string())))
+        return emptyTable.select(columns if columns is not None else list(CourseData.COLUMNS))
+    return pa.concat_tables(tables)
+
+
+class DeltaCourseWriter(CourseWriter):
+    """
+    Writes only the courses that changed since the previous run, as a changeset file.
+
+    Courses are keyed by (Year, Number, Group), plus the occurrence of the key
+    on the site, since a few courses share the same key. The previous run's
+    courses are kept in a fingerprint index (JSON lines with the key, a hash of
+    the course and the course itself). Every written course is looked up in it
+    right away, so the delta costs a single pass over both snapshots.
+
+    Each line of the changeset is a JSON object with the "change" ("added",
+    "removed" or "modified"), the key fields, the "occurrence", the "record"
+    (the new course, or the old one if removed) and for modified courses the
+    "changedFields", mapping each changed field to its "old" and "new" values.
+
+    Courses of years that were not scraped by this run are kept as is, they are
+    not reported as removed. Both files are replaced only when the writer is
+    closed without an error.
+    """
+
+    KEY_COLUMNS: Tuple[str, ...] = ("Year", "Number", "Group")
+
+    def __init__(self, indexPath: Optional[str] = None, changesetPath: Optional[str] = None):
+        self.indexPath: str = indexPath if indexPath is not None else config.DELTA_INDEX_FILE_NAME
+        self.changesetPath: str = changesetPath if changesetPath is not None else config.DELTA_CHANGESET_FILE_NAME
+        self.previous: Dict[Tuple, Tuple[str, Dict[str, Optional[str]]]] = self.loadIndex(self.indexPath)
+        self.occurrences: Counter = Counter()
+        self.seenYears: Set[Optional[str]] = set()
+        self.changesCount: Counter = Counter()
+        self.indexFile: TextIO = open(self.indexPath + ".tmp", "w", encoding="utf-8")
+        self.changesetFile: TextIO = open(self.changesetPath + ".tmp", "w", encoding="utf-8")
+
+    @staticmethod
+    def loadIndex(path: str) -> Dict[Tuple, Tuple[str, Dict[str, Optional[str]]]]:
+        """
+        Loads the fingerprint index of the previous run.
+
+        @param path: Path of the index file.
+
+        @return: Dict mapping each course key (Year, Number, Group, occurrence) to its (fingerprint, record),
+                 empty if there is no previous run.
+        """
+        index: Dict[Tuple, Tuple[str, Dict[str, Optional[str]]]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    entry: Dict = json.loads(line)
+                    index[tuple(entry["key"])] = (entry["fingerprint"], entry["record"])
+        return index
+
+    @staticmethod
+    def fingerprint(record: Dict[str, Optional[str]]) -> str:
+        """
+        Hashes the fields of a course.
+
+        @param record: The course, as returned by `CourseData.toDict`.
+
+        @return: str Hex digest of the course's fields.
+        """
+        values: List[Optional[str]] = [record[column] for column in CourseData.COLUMNS]
+        return hashlib.blake2b(json.dumps(values, ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+    def writeIndexEntry(self, key: Tuple, fingerprint: str, record: Dict[str, Optional[str]]) -> None:
+        """
+        Writes a course to the new fingerprint index.
+
+        @param key: The course key (Year, Number, Group, occurrence).
+        @param fingerprint: The course's fingerprint.
+        @param record: The course, as returned by `CourseData.toDict`.
+
+        @return: None
+        """
+        self.indexFile.write(json.dumps({"key": key, "fingerprint": fingerprint, "record": record}, ensure_ascii=False) + "\n")
+
+    def writeChange(self, change: str, key: Tuple, record: Dict[str, Optional[str]],
+                    changedFields: Optional[Dict[str, Dict[str, Optional[str]]]] = None) -> None:
+        """
+        Writes a change to the changeset.
+
+        @param change: "added", "removed" or "modified".
+        @param key: The course key (Year, Number, Group, occurrence).
+        @param record: The course, the old one for removed courses.
+        @param changedFields: The old and new values of the changed fields, for modified courses.
+
+        @return: None
+        """
+        entry: Dict = {"change": change}
+        entry.update(zip(self.KEY_COLUMNS, key))
+        entry["occurrence"] = key[-1]
+        entry["record"] = record
+        if changedFields is not None:
+            entry["changedFields"] = changedFields
+        self.changesetFile.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.changesCount[change] += 1
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        for course in coursesData:
+            record: Dict[str, Optional[str]] = course.toDict()
+            keyFields: Tuple = tuple(record[column] for column in self.KEY_COLUMNS)
+            key: Tuple = keyFields + (self.occurrences[keyFields],)
+            self.occurrences[keyFields] += 1
+            self.seenYears.add(course.Year)
+
+            fingerprint: str = self.fingerprint(record)
+            self.writeIndexEntry(key, fingerprint, record)
+            previous: Optional[Tuple[str, Dict[str, Optional[str]]]] = self.previous.pop(key, None)
+            if previous is None:
+                self.writeChange("added", key, record)
+            elif previous[0] != fingerprint:
+                oldRecord: Dict[str, Optional[str]] = previous[1]
+                self.writeChange("modified", key, record, {
+                    column: {"old": oldRecord.get(column), "new": record[column]}
+                    for column in CourseData.COLUMNS if oldRecord.get(column) != record[column]
+                })
+
+    def close(self) -> None:
+        if self.indexFile.closed:
+            return
+        for key, (fingerprint, record) in self.previous.items():
+            if key[0] in self.seenYears:
+                self.writeChange("removed", key, record)
+            else:
+                self.writeIndexEntry(key, fingerprint, record)
+        self.indexFile.close()
+        self.changesetFile.close()
+        os.replace(self.indexPath + ".tmp", self.indexPath)
+        os.replace(self.changesetPath + ".tmp", self.changesetPath)
+
+    def discard(self) -> None:
+        """
+        Drops the new index and changeset, keeping the previous run's files.
+
+        @return: None
+        """
+        if self.indexFile.closed:
+            return
+        self.indexFile.close()
+        self.changesetFile.close()
+        os.remove(self.indexPath + ".tmp")
+        os.remove(self.changesetPath + ".tmp")
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class SQLiteCourseWriter(CourseWriter):
+    """
+    Writes courses into an SQLite database, see `course_db` for its tables and query helpers.
+
+    The database is rebuilt by every run at `<path>.tmp`, in a single
+    transaction, and its indexes are created once all the courses were
+    inserted. It replaces the previous database only when the run succeeded.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path: str = path if path is not None else config.SQLITE_FILE_NAME
+        self.tmpPath: str = self.path + ".tmp"
+        if os.path.exists(self.tmpPath):  # Left by a run that crashed
+            os.remove(self.tmpPath)
+        self.connection: Optional[sqlite3.Connection] = course_db.connect(self.tmpPath)
+        self.occurrences: Counter = Counter()
+        self.connection.execute("BEGIN")
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        for course in coursesData:
+            keyFields: Tuple = course_db.courseKey(course)
+            course_db.insertCourse(self.connection, course, self.occurrences[keyFields])
+            self.occurrences[keyFields] += 1
+
+    def close(self) -> None:
+        if self.connection is None:
+            return
+        self.connection.commit()
+        course_db.createIndexes(self.connection)
+        self.connection.commit()
+        self.connection.close()
+        self.connection = None
+        os.replace(self.tmpPath, self.path)
+
+    def discard(self) -> None:
+        """
+        Drops the database built so far, keeping the previous run's database.
+
+        @return: None
+        """
+        if self.connection is None:
+            return
+        try:
+            self.connection.rollback()
+            self.connection.close()
+        finally:
+            self.connection = None
+            if os.path.exists(self.tmpPath):
+                os.remove(self.tmpPath)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+XLSX_COLUMN_WIDTHS: Dict[str, float] = {
+    "Number": 10.6, "Group": 8.9, "Name": 41.6, "Instructor": 32.4, "Year": 7.3, "Semester": 14.4, "Method": 14.9,
+    "School": 12.6, "Faculty": 22.6, "Building": 25.9, "Room": 12.7, "Day": 7.1, "Hour": 24.3, "Syllabus": 30.0,
+    "Exams": 30.0,
+}  # Widths of the columns of the "xlsx" output, in characters
+
+
+class XlsxCourseWriter(CourseWriter):
+    """
+    Writes the courses into an Excel workbook, one sheet per year, with openpyxl in write only mode.
+
+    Rows are streamed to the sheets as the pages are parsed, so the memory used
+    does not grow with the number of courses. The sheets are right to left,
+    with the header row frozen and an autofilter over all the rows.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        try:
+            from openpyxl import Workbook
+        except ImportError:  # The xlsx output format is optional
+            raise ImportError(f"The {type(self).__name__} requires the 'openpyxl' package")
+        self.path: str = path if path is not None else config.XLSX_FILE_NAME
+        self.workbook: Optional[Workbook] = Workbook(write_only=True)
+        self.sheets: Dict[str, object] = {}
+        self.rowsCount: Counter = Counter()
+
+    def getSheet(self, yearName: str):
+        """
+        Returns the sheet of a year, creating it with its header row if needed.
+
+        @param yearName: Name of the academic year.
+
+        @return: WriteOnlyWorksheet The year's sheet.
+        """
+        sheet = self.sheets.get(yearName)
+        if sheet is None:
+            from openpyxl.utils import get_column_letter
+
+            sheet = self.workbook.create_sheet(title=yearName[:31])
+            sheet.sheet_view.rightToLeft = True
+            sheet.freeze_panes = "A2"
+            for columnIndex, column in enumerate(CourseData.COLUMNS, 1):
+                sheet.column_dimensions[get_column_letter(columnIndex)].width = XLSX_COLUMN_WIDTHS.get(column, 12.0)
+            sheet.append(CourseData.COLUMNS)
+            self.sheets[yearName] = sheet
+        return sheet
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        for course in coursesData:
+            yearName: str = course.Year or "data"
+            self.getSheet(yearName).append(course.toRow())
+            self.rowsCount[yearName] += 1
+
+    def close(self) -> None:
+        if self.workbook is None:
+            return
+        from openpyxl.utils import get_column_letter
+
+        if not self.sheets:  # A workbook needs a sheet
+            self.getSheet("data")
+        for yearName, sheet in self.sheets.items():
+            sheet.auto_filter.ref = f"A1:{get_column_letter(len(CourseData.COLUMNS))}{self.rowsCount[yearName] + 1}"
+        self.workbook.save(self.path + ".tmp")
+        os.replace(self.path + ".tmp", self.path)
+        self.workbook = None
+
+    def discard(self) -> None:
+        """
+        Drops the workbook, keeping the previous run's file.
+
+        @return: None
+        """
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class SearchIndexCourseWriter(CourseWriter):
+    """
+    Writes the trigram search index of the course names and instructors, see `search_index`.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        import search_index
+
+        self.path: Optional[str] = path
+        self.builder: Optional[search_index.SearchIndexBuilder] = search_index.SearchIndexBuilder()
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        self.builder.addCourses(coursesData)
+
+    def close(self) -> None:
+        if self.builder is None:
+            return
+        self.builder.write(self.path)
+        self.builder = None
+
+
+class LinksCourseWriter(CourseWriter):
+    """
+    Downloads the syllabus and exam documents linked from the courses, see `link_fetcher`.
+
+    The links are collected while the courses are written, and downloaded
+    concurrently once all the pages were parsed.
+    """
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder: Optional[str] = folder
+        self.urls: Optional[Dict[str, None]] = {}  # Ordered set of the links
+
+    def writeCourses(self, coursesData: List[CourseData]) -> None:
+        for course in coursesData:
+            if course.Syllabus:
+                self.urls[course.Syllabus] = None
+            self.urls.update(dict.fromkeys(course.Exams))
+
+    def close(self) -> None:
+        if self.urls is None:
+            return
+        import link_fetcher
+
+        urls: List[str] = list(self.urls)
+        self.urls = None
+        link_fetcher.fetchLinks(urls, self.folder)
+
+
+WRITERS: Dict[str, Type[CourseWriter]] = {
+    "csv": CSVCourseWriter,
+    "parquet": ParquetCourseWriter,
+    "feather": FeatherCourseWriter,
+    "delta": DeltaCourseWriter,
+    "sqlite": SQLiteCourseWriter,
+    "xlsx": XlsxCourseWriter,
+    "search": SearchIndexCourseWriter,
+    "links": LinksCourseWriter,
+}  # The available output formats, by the name used in `config.OUTPUT_FORMATS`
+
+
+def createWriter(formats: Optional[List[str]] = None) -> CourseWriter:
+    """
+    Creates the writer for the configured output formats.
+
+    If `config.SHARD_BY_DEPARTMENT` is True the writer is wrapped in a
+    `DedupeCourseWriter`, since a course listed in several departments is
+    scraped once per department.
+
+    @param formats: Names of the output formats, defaults to `config.OUTPUT_FORMATS`.
+                    Each name must be a key of `WRITERS`.
+
+    @return: CourseWriter A single writer, or a `MultiCourseWriter` if several formats are wanted.
+    """
+    formats = formats if formats is not None else config.OUTPUT_FORMATS
+    unknownFormats: List[str] = [outputFormat for outputFormat in formats if outputFormat not in WRITERS]
+    if unknownFormats:
+        raise ValueError(f"Unknown output formats {unknownFormats}, available formats are {list(WRITERS)}")
+
+    writers: List[CourseWriter] = [WRITERS[outputFormat]() for outputFormat in formats]
+    writer: CourseWriter = writers[0] if len(writers) == 1 else MultiCourseWriter(writers)
+    if config.SHARD_BY_DEPARTMENT:
+        writer = DedupeCourseWriter(writer)
+    return writer